@@ -1,10 +1,25 @@
+import time
+STARTUP_TIME = time.perf_counter()
+
+import argparse
+import json
+import queue
+import threading
 import tkinter as tk
 from tkinter import ttk, font, messagebox
 import cv2
 from PIL import Image, ImageTk
 from detector import RoadSignDetector
-import threading
-from queue import Queue
+from detection_cache import DetectionCache
+from event_log import DetectionLog
+from pipeline import DetectionPipeline
+from tracker import SignTracker
+from sign_state import RoadRules
+from governor import ResolutionGovernor, DEFAULT_SIZES
+from metrics import METRICS, MetricsDumper, MetricsServer
+from sources import CAPTURE_APIS, SessionRecorder, open_source
+from inference_worker import ProcessDetector
+from utils.motion import MotionGate, DEFAULT_SIGN_REGIONS
 from tkinter.font import nametofont
 
 class ModernButton(ttk.Button):
@@ -25,8 +40,38 @@ class ModernButton(ttk.Button):
     def on_leave(self, e):
         self['style'] = self.default_style
 
+class StartupTimer:
+    def __init__(self, origin=STARTUP_TIME):
+        self.origin = origin
+        self.marks = {}
+
+    def mark(self, name):
+        if name not in self.marks:
+            self.marks[name] = time.perf_counter() - self.origin
+
+    def as_dict(self, extra=None):
+        report = dict(sorted(self.marks.items(), key=lambda item: item[1]))
+        if extra:
+            report.update({f"detector_{name}": value for name, value in extra.items()})
+        return report
+
+    def report(self, extra=None):
+        lines = ["Startup timing (seconds):"]
+        lines += [f"  {name:<24} {value:.3f}" for name, value in self.as_dict(extra).items()]
+        return "\n".join(lines)
+
 class RoadSignDetectorApp:
-    def __init__(self, window):
+    def __init__(self, window, backend='ultralytics', model_path=None, lazy=True, report_path=None,
+                 tracking=True, detect_interval=1, gate=None, auto_announce=False, inference_processes=0,
+                 target_fps=None, imgsz_sizes=DEFAULT_SIZES, fallback_model=None, governor_log=None,
+                 metrics_overlay=False, source='0', realtime=True, recorder=None, cache=None,
+                 event_log=None, tiling=None, camera=None, stream=None, road_rules=False):
+        self.startup = StartupTimer()
+        self.startup.mark('imports')
+        self.report_path = report_path
+        self.load_error = None
+        self.auto_announce = auto_announce
+
         self.window = window
         self.window.title("AQROAD: AI Road Sign Detector")
         self.window.geometry("1200x800")
@@ -38,45 +83,128 @@ class RoadSignDetectorApp:
 
         self.configure_styles()
 
-        self.detector = RoadSignDetector()
+        if inference_processes:
+            # the in-process detector only draws and speaks; the model lives in the worker processes
+            if cache is not None:
+                print("The detection cache only works with in-process inference, ignoring --detection-cache")
+            self.detector = RoadSignDetector(backend=backend, model_path=model_path, lazy=True)
+        else:
+            self.detector = RoadSignDetector(backend=backend, model_path=model_path, lazy=lazy, cache=cache)
+            if not lazy:
+                self.startup.mark('model_ready')
 
         try:
-                self.cap = cv2.VideoCapture(0)
+                self.cap = open_source(source, realtime=realtime, camera=camera, stream=stream)
                 if not self.cap.isOpened():
-                    raise ValueError("No camera detected")
+                    raise ValueError(f"Unable to open video source {source}")
                 
                 self.video_width = self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)
                 self.video_height = self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)
                 self.DISPLAY_HEIGHT = int(self.DISPLAY_WIDTH * (self.video_height / self.video_width))
                 
         except Exception as e:
-            messagebox.showerror("Camera Error", "No camera detected or unable to access camera.")
+            messagebox.showerror("Camera Error", f"No camera detected or unable to open video source '{source}'.")
             self.window.quit()
             return
-        
-        self.cap = cv2.VideoCapture(0)
-        self.video_width = self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)
-        self.video_height = self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)
+        self.startup.mark('camera_open')
+
+        # frames stay in the order the source decoded them into; the model input and display adapt instead
+        self.detector.set_input_order(self.cap.color_order)
+        if recorder is not None:
+            recorder.color_order = self.cap.color_order
 
-        self.DISPLAY_HEIGHT = int(self.DISPLAY_WIDTH * (self.video_height / self.video_width))
+        if tiling:
+            if inference_processes:
+                print("Tiled inference only works with in-process inference, ignoring --tile-size")
+            else:
+                self.detector.enable_tiling(**tiling)
+                print(f"Tiled inference: {len(self.detector.tiles((int(self.video_height), int(self.video_width))))} "
+                      f"crops per frame")
+
+        if inference_processes:
+            self.inference = ProcessDetector(self.detector, workers=inference_processes, backend=backend,
+                                             model_path=model_path,
+                                             max_frame_shape=(int(self.video_height), int(self.video_width), 3))
+        else:
+            self.inference = self.detector
+
+        self.governor = None
+        if target_fps and inference_processes:
+            print("The resolution governor only works with in-process inference, ignoring --target-fps")
+        elif target_fps:
+            self.governor = ResolutionGovernor(self.detector, target_fps=target_fps, sizes=imgsz_sizes,
+                                               models=[model_path, fallback_model] if fallback_model else None,
+                                               log_path=governor_log)
         
-        self.frame_queue = Queue(maxsize=1)
+        self.tracker = SignTracker() if tracking else None
+        # tracker events are already confirmed over several frames; raw detections need their own confirmation
+        self.rules = RoadRules(min_hits=1 if tracking else 3, classes=self.detector.classes) if road_rules else None
+        self.pipeline = DetectionPipeline(self.cap, self.inference, tracker=self.tracker,
+                                          detect_interval=detect_interval, gate=gate,
+                                          display_size=(self.DISPLAY_WIDTH, self.DISPLAY_HEIGHT),
+                                          on_output=self.notify_new_frame,
+                                          inference_threads=max(1, inference_processes),
+                                          governor=self.governor, recorder=recorder, event_log=event_log,
+                                          rules=self.rules)
+        self.register_gauges()
+        self.metrics_overlay = metrics_overlay
+        self.overlay_item = None
+        self.overlay_updated = 0.0
+        self.frame_pending = threading.Event()
+        self.shown_state = ()
+        self.tts_enabled = None
+        self.display_stats = {'rendered': 0, 'label_updates': 0, 'label_skips': 0, 'rule_updates': 0}
         self.running = True
         self.frozen = False
         self.frozen_frame = None
         self.frozen_detection = None
 
+        self.current_frame = None
         self.current_detection = None
 
         self.setup_ui()
+        self.window.bind('<<NewFrame>>', self.on_new_frame)
+        self.window.bind('<<ModelLoadFailed>>', self.on_model_error)
+        self.window.update_idletasks()
+        self.startup.mark('window_ready')
 
-        self.video_thread = threading.Thread(target=self.video_loop, daemon=True)
-        self.video_thread.start()
+        # workers post <<NewFrame>> events, so only start them once the main loop is running
+        self.window.after_idle(self.pipeline.start)
 
-        self.update_frame()
+        if not self.inference.ready.is_set():
+            threading.Thread(target=self.load_detector, daemon=True).start()
+        elif self.governor is not None:
+            self.governor.start()
 
         self.window.resizable(False, False)
 
+    def load_detector(self):
+        try:
+            self.inference.load()
+            if self.governor is not None:
+                self.governor.start()
+            self.detector.start_speech()
+            self.startup.mark('model_ready')
+        except Exception as e:
+            self.load_error = e
+            self.post_event('<<ModelLoadFailed>>')
+
+    def post_event(self, name):
+        try:
+            self.window.event_generate(name, when='tail')
+            return True
+        except (RuntimeError, tk.TclError):
+            # the window is not in its main loop yet or is already closing
+            return False
+
+    def notify_new_frame(self):
+        # coalesce notifications: at most one pending redraw, which always shows the newest frame
+        if self.frame_pending.is_set():
+            return
+        self.frame_pending.set()
+        if not self.post_event('<<NewFrame>>'):
+            self.frame_pending.clear()
+
     def setup_fonts(self):
         available_fonts = font.families()
         self.font_family = "Poppins" if "Poppins" in available_fonts else \
@@ -189,6 +317,9 @@ class RoadSignDetectorApp:
         )
         self.canvas.pack()
 
+        self.photo = ImageTk.PhotoImage('RGB', (self.DISPLAY_WIDTH, self.DISPLAY_HEIGHT))
+        self.canvas_image = self.canvas.create_image(0, 0, image=self.photo, anchor=tk.NW)
+
         header_label = ttk.Label(
             left_frame,
             text="AQROAD: AI Road Sign Detector",
@@ -209,6 +340,13 @@ class RoadSignDetectorApp:
         self.confidence_label = ttk.Label(right_frame, text="N/A", style="Modern.TLabel")
         self.confidence_label.pack(anchor='w')
 
+        self.rules_label = None
+        if self.rules is not None:
+            ttk.Label(right_frame, text="ROAD RULES", style="ModernHeader.TLabel").pack(anchor='w')
+            self.rules_label = ttk.Label(right_frame, text=self.rules.describe(), style="Modern.TLabel",
+                                         wraplength=400, justify=tk.LEFT)
+            self.rules_label.pack(anchor='w')
+
         buttons_frame = ttk.Frame(right_frame, style="Modern.TFrame")
         buttons_frame.pack(pady=30, anchor='w')
         
@@ -229,96 +367,339 @@ class RoadSignDetectorApp:
         self.tts_button.pack()
 
         if not self.current_detection and not self.frozen_detection:
-            self.tts_button.state(['disabled'])
+            self.set_tts_enabled(False)
 
     def toggle_capture(self):
         if not self.frozen:
             self.frozen = True
             self.capture_button.configure(text="▶  Resume Live", style="Resume.TButton")
             self.capture_button.default_style = "Resume.TButton"
-            if not self.frame_queue.empty():
-                frame, detection = self.frame_queue.get()
-                self.frozen_frame = frame
-                self.frozen_detection = detection
-                if detection:
-                    self.tts_button.state(['!disabled'])
-                else:
-                    self.tts_button.state(['disabled'])
+            self.pipeline.pause()
+            item = self.pipeline.output_queue.get_nowait()
+            if item is not None:
+                frame, detections = item
+                self.replace_current_frame(frame)
+                self.current_detection = self.best_detection(detections)
+            # the pipeline reuses its display buffers, so keep a private copy while frozen
+            self.frozen_frame = self.current_frame.copy() if self.current_frame is not None else None
+            self.frozen_detection = self.current_detection
+            if self.frozen_frame is not None:
+                self.show_frame(self.frozen_frame)
+            self.show_detection(self.frozen_detection)
+            self.set_tts_enabled(bool(self.frozen_detection))
         else:
             self.frozen = False
             self.capture_button.configure(text="⏸  Capture Frame", style="Capture.TButton")
             self.capture_button.default_style = "Capture.TButton"
             self.frozen_frame = None
             self.frozen_detection = None
-            if self.current_detection:
-                self.tts_button.state(['!disabled'])
-            else:
-                self.tts_button.state(['disabled'])
+            self.pipeline.resume()
+            self.set_tts_enabled(bool(self.current_detection))
 
     def speak_current_detection(self):
         detection = self.frozen_detection if self.frozen else self.current_detection
         if detection:
-            text = f"Detected {detection['name']}. {detection['description']}"
-            self.detector.speak_description(text)
+            self.detector.announce(detection, force=True)
     
-    def video_loop(self):
-        while self.running:
-            if not self.frozen:
-                ret, frame = self.cap.read()
-                if ret:
-                    detections = self.detector.detect_signs(frame)
-                    processed_frame = self.detector.draw_detections(frame, detections)
-                    
-                    if detections:
-                        best_detection = max(detections, key=lambda x: x['confidence'])
-                        self.current_detection = best_detection
-                        self.frame_queue.put((processed_frame, best_detection))
-                    else:
-                        self.current_detection = None
-                        self.frame_queue.put((processed_frame, None))
-    
-    def update_frame(self):
-        try:
-            if self.frozen:
-                frame = self.frozen_frame
-                detection = self.frozen_detection
-            else:
-                frame, detection = self.frame_queue.get_nowait()
-            
-            if frame is not None:
-                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                frame = cv2.resize(frame, (self.DISPLAY_WIDTH, self.DISPLAY_HEIGHT))
-                frame = Image.fromarray(frame)
-                self.photo = ImageTk.PhotoImage(image=frame)
-                self.canvas.delete("all")
-                self.canvas.create_image(0, 0, image=self.photo, anchor=tk.NW)
-            
+    def best_detection(self, detections):
+        if not detections:
+            return None
+        return max(detections, key=lambda x: x['confidence'])
+
+    def report_startup(self):
+        timings = {**self.inference.timings, **self.detector.speech.timings}
+        print(self.startup.report(timings))
+        if self.report_path:
+            with open(self.report_path, 'w') as f:
+                json.dump(self.startup.as_dict(timings), f, indent=2)
+
+    def apply_rule_changes(self):
+        # the label and speech only hear about the rules changing, not about every sighting of the same signs
+        latest = None
+        while True:
+            try:
+                change = self.pipeline.rule_changes.get_nowait()
+            except queue.Empty:
+                break
+            latest = change
+            if self.auto_announce and change['speak']:
+                self.detector.announce_rule(change)
+        if latest is not None:
+            self.rules_label.config(text=self.rules.describe(latest['state']))
+            self.display_stats['rule_updates'] += 1
+
+    def auto_announce_detections(self, detection):
+        if self.tracker is None:
             if detection:
-                self.sign_label.config(text=detection['name'])
-                self.description_label.config(text=detection['description'])
-                self.confidence_label.config(text=f"{detection['confidence']:.2f}")
-                self.tts_button.state(['!disabled'])
-            else:
-                self.sign_label.config(text="No signs detected")
-                self.description_label.config(text="No sign detected")
-                self.confidence_label.config(text="N/A")
-                if not self.frozen:
-                    self.tts_button.state(['disabled'])
-                
-        except:
-            pass
-        
-        self.window.after(33, self.update_frame)
+                self.detector.announce(detection)
+            return
+
+        while True:
+            try:
+                event = self.pipeline.events.get_nowait()
+            except queue.Empty:
+                break
+            self.detector.announce(event)
+
+    def on_model_error(self, event=None):
+        messagebox.showerror("Model Error", f"Unable to load the detection model: {self.load_error}")
+        self.window.quit()
+
+    def on_new_frame(self, event=None):
+        self.frame_pending.clear()
+        if self.frozen:
+            return
+
+        item = self.pipeline.output_queue.get_nowait()
+        if item is None:
+            return
+
+        frame, detections = item
+        detection = self.best_detection(detections)
+        self.replace_current_frame(frame)
+        self.current_detection = detection
+        warming_up = detections is None
+
+        self.show_frame(frame)
+        self.show_detection(detection, warming_up)
+        if self.rules is not None:
+            self.apply_rule_changes()
+        elif self.auto_announce and not warming_up:
+            self.auto_announce_detections(detection)
+
+        self.startup.mark('first_frame')
+        if not warming_up and 'first_detection_frame' not in self.startup.marks:
+            self.startup.mark('first_detection_frame')
+            self.report_startup()
+
+    def replace_current_frame(self, frame):
+        # the previous frame's display buffer goes back to the renderer only now that nothing refers to it
+        previous, self.current_frame = self.current_frame, frame
+        if previous is not None and previous is not frame:
+            self.pipeline.release_frame(previous)
+
+    def show_frame(self, frame):
+        with METRICS.span('blit'):
+            self.photo.paste(Image.fromarray(frame))
+        METRICS.tick('rendered')
+        self.display_stats['rendered'] += 1
+        if self.metrics_overlay:
+            self.update_overlay()
+
+    def register_gauges(self):
+        pipeline = self.pipeline
+        METRICS.gauge('queue_capture', pipeline.capture_queue.qsize)
+        METRICS.gauge('queue_inference', pipeline.inference_queue.qsize)
+        METRICS.gauge('queue_render', pipeline.output_queue.qsize)
+        METRICS.gauge('dropped_frames', lambda: (pipeline.capture_queue.dropped + pipeline.inference_queue.dropped
+                                                 + pipeline.output_queue.dropped))
+
+    def update_overlay(self):
+        # the text only changes a couple of times per second; re-rendering it every frame is wasted work
+        now = time.perf_counter()
+        if now - self.overlay_updated < 0.5:
+            return
+        self.overlay_updated = now
+
+        text = METRICS.overlay_text()
+        if self.overlay_item is None:
+            self.overlay_item = self.canvas.create_text(8, 8, text=text, anchor=tk.NW, fill='#00FF00',
+                                                        font=('Courier', 9))
+        else:
+            self.canvas.itemconfigure(self.overlay_item, text=text)
+
+    def show_detection(self, detection, warming_up=False):
+        if warming_up:
+            state = ("Warming up...", "Loading the detection model, please wait.", "N/A")
+        elif detection:
+            state = (detection['name'], detection['description'], f"{detection['confidence']:.2f}")
+        else:
+            state = ("No signs detected", "No sign detected", "N/A")
+
+        if state != self.shown_state:
+            previous = self.shown_state or (None, None, None)
+            labels = (self.sign_label, self.description_label, self.confidence_label)
+            for label, text, old_text in zip(labels, state, previous):
+                if text != old_text:
+                    label.config(text=text)
+            self.shown_state = state
+            self.display_stats['label_updates'] += 1
+        else:
+            self.display_stats['label_skips'] += 1
+
+        if warming_up:
+            self.set_tts_enabled(False)
+        elif detection:
+            self.set_tts_enabled(True)
+        elif not self.frozen:
+            self.set_tts_enabled(False)
+
+    def set_tts_enabled(self, enabled):
+        if enabled != self.tts_enabled:
+            self.tts_button.state(['!disabled'] if enabled else ['disabled'])
+            self.tts_enabled = enabled
+
+    def get_display_stats(self):
+        return {**self.display_stats, 'skipped': self.pipeline.output_queue.dropped}
     
     def __del__(self):
         self.running = False
+        if hasattr(self, 'pipeline'):
+            self.pipeline.stop()
+        if isinstance(getattr(self, 'inference', None), ProcessDetector):
+            self.inference.close()
         if hasattr(self, 'cap'):
             self.cap.release()
 
 def main():
+    parser = argparse.ArgumentParser(description="AQROAD: AI Road Sign Detector")
+    parser.add_argument('--backend', choices=['ultralytics', 'onnx', 'openvino'], default='ultralytics',
+                        help="Inference backend used by the detector")
+    parser.add_argument('--model', help="Model path for the selected backend")
+    parser.add_argument('--eager', action='store_true',
+                        help="Load the model before showing the window instead of in the background")
+    parser.add_argument('--startup-report', help="Write startup timings to this JSON file")
+    parser.add_argument('--no-tracking', action='store_true', help="Show raw per-frame detections without tracking")
+    parser.add_argument('--detect-interval', type=int, default=1,
+                        help="Run the detector every k-th frame and track in between")
+    parser.add_argument('--motion-gate', choices=['absdiff', 'dhash'],
+                        help="Skip inference on frames that have not changed since the last detection")
+    parser.add_argument('--gate-threshold', type=float,
+                        help="Fraction of changed pixels (absdiff) or hash bits (dhash) that triggers inference")
+    parser.add_argument('--gate-max-skip', type=int, default=30,
+                        help="Force inference after this many consecutive skipped frames")
+    parser.add_argument('--gate-regions', action='store_true',
+                        help="Only run inference on the roadside and upper regions where motion occurred")
+    parser.add_argument('--auto-announce', action='store_true',
+                        help="Announce newly detected signs automatically, with a per-sign cooldown")
+    parser.add_argument('--road-rules', action='store_true',
+                        help="Track the active speed limit, passing restrictions and hazards ahead; with "
+                             "--auto-announce, only changes to them are spoken")
+    parser.add_argument('--inference-processes', type=int, default=0,
+                        help="Run the model in this many worker processes instead of inside the UI process")
+    parser.add_argument('--target-fps', type=float,
+                        help="Lower the input resolution (and optionally the model) to hold this inference rate")
+    parser.add_argument('--imgsz-sizes', type=int, nargs='+', default=list(DEFAULT_SIZES),
+                        help="Input sizes the governor may choose from")
+    parser.add_argument('--fallback-model', help="Smaller model the governor switches to below the smallest size")
+    parser.add_argument('--governor-log', help="Append every governor decision to this JSONL file")
+    parser.add_argument('--metrics-overlay', action='store_true',
+                        help="Draw FPS, per-stage timings and queue depths over the video")
+    parser.add_argument('--metrics-json', help="Periodically write a metrics snapshot to this JSON file")
+    parser.add_argument('--metrics-interval', type=float, default=10.0,
+                        help="Seconds between metrics JSON snapshots")
+    parser.add_argument('--metrics-port', type=int,
+                        help="Serve Prometheus metrics on http://127.0.0.1:PORT/metrics")
+    parser.add_argument('--source', default='0',
+                        help="Camera index, video file, image directory, .aqrec recording, synthetic[:WxH], "
+                             "rtsp://... stream or gst:<pipeline ending in appsink>")
+    parser.add_argument('--capture-format', nargs='+', default=['MJPG', 'YUYV'], metavar='FOURCC',
+                        help="Camera pixel formats to try, in order of preference")
+    parser.add_argument('--capture-width', type=int, help="Requested camera width")
+    parser.add_argument('--capture-height', type=int, help="Requested camera height")
+    parser.add_argument('--capture-fps', type=float, help="Requested camera frame rate")
+    parser.add_argument('--capture-buffer', type=int, default=1,
+                        help="Driver buffers to keep; 1 always hands over the newest frame")
+    parser.add_argument('--capture-api', choices=list(CAPTURE_APIS), default='any', help="OpenCV camera API")
+    parser.add_argument('--stream-backend', choices=['gstreamer', 'ffmpeg'],
+                        help="Decode video files and streams with GStreamer or FFmpeg, using hardware decoders "
+                             "where available")
+    parser.add_argument('--color-order', choices=['bgr', 'rgb'], default='bgr',
+                        help="Channel order GStreamer decodes into; rgb removes the display conversion")
+    parser.add_argument('--stream-latency-ms', type=int, default=0, help="RTSP jitter buffer for GStreamer")
+    parser.add_argument('--fast-replay', action='store_true',
+                        help="Read files and recordings as fast as possible instead of at their original timing")
+    parser.add_argument('--record', help="Record frames and detections of this session to a .aqrec directory")
+    parser.add_argument('--record-encoding', choices=['jpeg', 'raw'], default='jpeg',
+                        help="Store recorded frames as JPEG (compact) or raw pixels (bit-exact)")
+    parser.add_argument('--detection-cache', type=int, metavar='ENTRIES',
+                        help="Reuse detections for repeated frames, keeping up to this many in an LRU cache")
+    parser.add_argument('--cache-tolerance', type=int, default=0,
+                        help="Hash bits two frames may differ by and still share cached detections")
+    parser.add_argument('--cache-dir', help="Load and save the detection cache in this directory")
+    parser.add_argument('--tile-size', type=int,
+                        help="Also run the model on overlapping tiles of this size to find small, distant signs")
+    parser.add_argument('--tile-overlap', type=float, default=0.2, help="Fractional overlap between tiles")
+    parser.add_argument('--tile-regions', action='store_true',
+                        help="Only tile the roadside and upper regions where signs usually appear")
+    parser.add_argument('--event-log', help="Keep a history of detections in this directory")
+    parser.add_argument('--event-log-format', choices=['sqlite', 'columnar'], default='sqlite',
+                        help="SQLite (WAL) databases or append-only per-column files")
+    parser.add_argument('--event-log-rotate-mb', type=float, default=64, help="Start a new segment at this size")
+    parser.add_argument('--event-log-rotate-hours', type=float, default=24, help="Start a new segment after this long")
+    args = parser.parse_args()
+
+    gate = None
+    if args.motion_gate:
+        gate = MotionGate(method=args.motion_gate, threshold=args.gate_threshold, max_skip=args.gate_max_skip,
+                          regions=DEFAULT_SIGN_REGIONS if args.gate_regions else None)
+
+    cache = None
+    if args.detection_cache:
+        cache = DetectionCache(max_entries=args.detection_cache, tolerance=args.cache_tolerance, path=args.cache_dir)
+
+    event_log = None
+    if args.event_log:
+        event_log = DetectionLog(args.event_log, format=args.event_log_format,
+                                 rotate_bytes=int(args.event_log_rotate_mb * (1 << 20)),
+                                 rotate_seconds=args.event_log_rotate_hours * 3600).start()
+
+    tiling = None
+    if args.tile_size:
+        tiling = {'tile_size': args.tile_size, 'overlap': args.tile_overlap,
+                  'regions': DEFAULT_SIGN_REGIONS if args.tile_regions else None}
+
+    recorder = SessionRecorder(args.record, encoding=args.record_encoding) if args.record else None
+
+    camera = {'formats': args.capture_format, 'width': args.capture_width, 'height': args.capture_height,
+              'fps': args.capture_fps, 'buffer_size': args.capture_buffer, 'api': args.capture_api}
+    stream = {'color_order': args.color_order, 'latency_ms': args.stream_latency_ms}
+    if args.stream_backend:
+        stream['backend'] = args.stream_backend
+
     root = tk.Tk()
-    app = RoadSignDetectorApp(root)
+    app = RoadSignDetectorApp(root, backend=args.backend, model_path=args.model,
+                              lazy=not args.eager, report_path=args.startup_report,
+                              tracking=not args.no_tracking, detect_interval=args.detect_interval, gate=gate,
+                              auto_announce=args.auto_announce, inference_processes=args.inference_processes,
+                              target_fps=args.target_fps, imgsz_sizes=args.imgsz_sizes,
+                              fallback_model=args.fallback_model, governor_log=args.governor_log,
+                              metrics_overlay=args.metrics_overlay, source=args.source,
+                              realtime=not args.fast_replay, recorder=recorder, cache=cache,
+                              event_log=event_log, tiling=tiling, camera=camera, stream=stream,
+                              road_rules=args.road_rules)
+
+    server = MetricsServer(port=args.metrics_port) if args.metrics_port else None
+    if server is not None:
+        server.start()
+    dumper = MetricsDumper(args.metrics_json, interval=args.metrics_interval) if args.metrics_json else None
+    if dumper is not None:
+        dumper.start()
+
     root.mainloop()
 
+    if recorder is not None:
+        if getattr(app, 'pipeline', None) is not None:
+            app.pipeline.stop()
+        recorder.close()
+        print(f"Recorded {recorder.count} frames to {args.record}")
+    if dumper is not None:
+        dumper.stop()
+    if server is not None:
+        server.stop()
+
+    if gate is not None:
+        print(f"Motion gate: {gate.report()}")
+    if event_log is not None:
+        if getattr(app, 'pipeline', None) is not None:
+            app.pipeline.stop()
+        event_log.stop()
+        print(f"Event log: {event_log.stats}")
+    if cache is not None:
+        cache.save()
+        print(f"Detection cache: {cache.report()}")
+    if getattr(app, 'governor', None) is not None:
+        print(f"Governor: {app.governor.report()}")
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
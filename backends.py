@@ -0,0 +1,239 @@
+import os
+import time
+
+import cv2
+import numpy as np
+
+from utils.preprocessing import Preprocessor
+
+DEFAULT_WEIGHTS = 'models/best.pt'
+DEFAULT_ONNX = 'models/best.onnx'
+DEFAULT_OPENVINO = 'models/best_openvino_model'
+
+
+def non_max_suppression(boxes, scores, iou_threshold=0.45):
+    if len(boxes) == 0:
+        return np.empty(0, dtype=np.int64)
+
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    areas = (x2 - x1).clip(0) * (y2 - y1).clip(0)
+    order = scores.argsort()[::-1]
+
+    keep = []
+    while order.size > 0:
+        i = order[0]
+        keep.append(i)
+
+        xx1 = np.maximum(x1[i], x1[order[1:]])
+        yy1 = np.maximum(y1[i], y1[order[1:]])
+        xx2 = np.minimum(x2[i], x2[order[1:]])
+        yy2 = np.minimum(y2[i], y2[order[1:]])
+
+        inter = (xx2 - xx1).clip(0) * (yy2 - yy1).clip(0)
+        iou = inter / (areas[i] + areas[order[1:]] - inter + 1e-9)
+
+        order = order[1:][iou <= iou_threshold]
+
+    return np.array(keep, dtype=np.int64)
+
+
+def decode_predictions(output, conf_threshold, iou_threshold=0.45, max_det=300):
+    # YOLOv8 head output is (4 + num_classes, anchors): cx, cy, w, h, class scores
+    predictions = output.T
+    scores = predictions[:, 4:]
+    class_ids = scores.argmax(axis=1)
+    confidences = scores[np.arange(len(scores)), class_ids]
+
+    mask = confidences > conf_threshold
+    predictions, class_ids, confidences = predictions[mask], class_ids[mask], confidences[mask]
+    if len(predictions) == 0:
+        return np.empty((0, 6), dtype=np.float32)
+
+    cx, cy, w, h = predictions[:, 0], predictions[:, 1], predictions[:, 2], predictions[:, 3]
+    boxes = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+
+    # offset boxes per class so NMS never suppresses across classes
+    offsets = class_ids[:, None].astype(np.float32) * 4096
+    keep = non_max_suppression(boxes + offsets, confidences, iou_threshold)[:max_det]
+
+    return np.concatenate([
+        boxes[keep],
+        confidences[keep, None],
+        class_ids[keep, None].astype(np.float32)
+    ], axis=1).astype(np.float32)
+
+
+def scale_boxes(data, scale, pad, shape):
+    if len(data) == 0:
+        return data
+
+    height, width = shape[:2]
+    data[:, [0, 2]] = ((data[:, [0, 2]] - pad[0]) / scale).clip(0, width)
+    data[:, [1, 3]] = ((data[:, [1, 3]] - pad[1]) / scale).clip(0, height)
+
+    return data
+
+
+class UltralyticsBackend:
+    name = 'ultralytics'
+
+    def __init__(self, model_path=DEFAULT_WEIGHTS, imgsz=None, input_order='bgr'):
+        from ultralytics import YOLO
+
+        self.model_path = model_path
+        self.imgsz = imgsz
+        self.input_order = input_order
+        self.fixed_imgsz = False
+        self.model = YOLO(model_path)
+        self.last_speed = {}
+        self.bgr_buffers = []
+
+    def _to_bgr(self, frames):
+        # ultralytics expects BGR and would copy a reversed (negative-stride) view anyway, so convert once
+        # into buffers reused across calls
+        converted = []
+        for i, frame in enumerate(frames):
+            if i == len(self.bgr_buffers):
+                self.bgr_buffers.append(None)
+            if self.bgr_buffers[i] is None or self.bgr_buffers[i].shape != frame.shape:
+                self.bgr_buffers[i] = np.empty_like(frame)
+            converted.append(cv2.cvtColor(frame, cv2.COLOR_RGB2BGR, dst=self.bgr_buffers[i]))
+        return converted
+
+    def predict(self, frames, conf_threshold):
+        kwargs = {'conf': conf_threshold}
+        if self.imgsz:
+            kwargs['imgsz'] = self.imgsz
+        if self.input_order == 'rgb':
+            if isinstance(frames, np.ndarray) and frames.ndim == 3:
+                frames = self._to_bgr([frames])[0]
+            else:
+                frames = self._to_bgr(frames)
+
+        results = self.model(frames, **kwargs)
+        if results:
+            # ultralytics reports per-image milliseconds for each stage
+            self.last_speed = {stage: ms * len(results) for stage, ms in results[0].speed.items()}
+
+        return [
+            result.boxes.data.cpu().numpy() if result.boxes is not None
+            else np.empty((0, 6), dtype=np.float32)
+            for result in results
+        ]
+
+
+class NumpyBackend:
+    def __init__(self, model_path, imgsz=640, iou_threshold=0.45, input_order='bgr'):
+        self.model_path = model_path
+        self.imgsz = imgsz
+        self.iou_threshold = iou_threshold
+        self.input_order = input_order
+        self.dynamic_batch = False
+        self.fixed_imgsz = False
+        self.preprocessor = None
+        self.last_speed = {}
+
+    def _forward(self, tensor):
+        raise NotImplementedError
+
+    def predict(self, frames, conf_threshold):
+        if isinstance(frames, np.ndarray) and frames.ndim == 3:
+            frames = [frames]
+
+        started = time.perf_counter()
+        if (self.preprocessor is None or self.preprocessor.target_size != (self.imgsz, self.imgsz)
+                or self.preprocessor.input_order != self.input_order):
+            self.preprocessor = Preprocessor(self.imgsz, input_order=self.input_order)
+        tensor, scales, pads = self.preprocessor(frames)
+        preprocessed = time.perf_counter()
+
+        if self.dynamic_batch or len(frames) == 1:
+            outputs = self._forward(tensor)
+        else:
+            outputs = np.concatenate([self._forward(tensor[i:i + 1]) for i in range(len(frames))])
+        forwarded = time.perf_counter()
+
+        detections = []
+        for output, frame, scale, pad in zip(outputs, frames, scales, pads):
+            data = decode_predictions(output, conf_threshold, self.iou_threshold)
+            detections.append(scale_boxes(data, scale, pad, frame.shape))
+
+        self.last_speed = {
+            'preprocess': (preprocessed - started) * 1000,
+            'inference': (forwarded - preprocessed) * 1000,
+            'postprocess': (time.perf_counter() - forwarded) * 1000,
+        }
+
+        return detections
+
+
+class OnnxBackend(NumpyBackend):
+    name = 'onnx'
+
+    def __init__(self, model_path=DEFAULT_ONNX, imgsz=640, iou_threshold=0.45, threads=None, input_order='bgr'):
+        import onnxruntime as ort
+
+        super().__init__(model_path, imgsz, iou_threshold, input_order)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+
+        self.session = ort.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.dynamic_batch = not isinstance(model_input.shape[0], int)
+        if isinstance(model_input.shape[2], int):
+            self.imgsz = model_input.shape[2]
+            self.fixed_imgsz = True
+
+    def _forward(self, tensor):
+        return self.session.run(None, {self.input_name: tensor})[0]
+
+
+class OpenVinoBackend(NumpyBackend):
+    name = 'openvino'
+
+    def __init__(self, model_path=DEFAULT_OPENVINO, imgsz=640, iou_threshold=0.45, device='CPU', input_order='bgr'):
+        import openvino as ov
+
+        super().__init__(model_path, imgsz, iou_threshold, input_order)
+
+        if os.path.isdir(model_path):
+            model_path = next(os.path.join(model_path, f) for f in os.listdir(model_path) if f.endswith('.xml'))
+
+        core = ov.Core()
+        model = core.read_model(model_path)
+        shape = model.inputs[0].get_partial_shape()
+        self.dynamic_batch = shape[0].is_dynamic
+        if shape[2].is_static:
+            self.imgsz = shape[2].get_length()
+            self.fixed_imgsz = True
+        self.compiled = core.compile_model(model, device)
+        self.output = self.compiled.output(0)
+
+    def _forward(self, tensor):
+        return self.compiled(tensor)[self.output]
+
+
+BACKENDS = {
+    'ultralytics': UltralyticsBackend,
+    'onnx': OnnxBackend,
+    'openvino': OpenVinoBackend,
+}
+
+
+def create_backend(name='ultralytics', model_path=None, **kwargs):
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend '{name}'. Choose from: {', '.join(BACKENDS)}")
+
+    backend_class = BACKENDS[name]
+    if model_path is None:
+        model_path = {
+            'ultralytics': DEFAULT_WEIGHTS,
+            'onnx': DEFAULT_ONNX,
+            'openvino': DEFAULT_OPENVINO,
+        }[name]
+
+    return backend_class(model_path, **kwargs)
@@ -0,0 +1,320 @@
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+
+from detection_cache import DetectionCache
+from detector import RoadSignDetector
+from sources import IMAGE_EXTENSIONS, VIDEO_EXTENSIONS
+
+_detector = None
+
+
+class FrameReader:
+    def __init__(self, path, max_queue=64):
+        self.path = path
+        self.frames = queue.Queue(maxsize=max_queue)
+        self.fps = None
+        self.size = None
+        self.error = None
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._read, name="frame-reader", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        # the consumer may have given up halfway through the file; unblock the reader and free queued frames
+        self.stopped.set()
+        deadline = time.monotonic() + 5
+        while self.thread.is_alive() and time.monotonic() < deadline:
+            # a put already waiting for a slot may still land, so keep draining until the reader has exited
+            self._drain()
+            self.thread.join(timeout=0.1)
+        self._drain()
+
+    def _drain(self):
+        while True:
+            try:
+                self.frames.get_nowait()
+            except queue.Empty:
+                break
+
+    def _put(self, item):
+        while not self.stopped.is_set():
+            try:
+                self.frames.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _read(self):
+        try:
+            if os.path.isdir(self.path):
+                self._read_images()
+            else:
+                self._read_video()
+        except Exception as e:
+            self.error = e
+        finally:
+            self._put(None)
+
+    def _read_video(self):
+        cap = cv2.VideoCapture(self.path)
+        if not cap.isOpened():
+            raise ValueError(f"Unable to open video {self.path}")
+
+        self.fps = cap.get(cv2.CAP_PROP_FPS) or None
+        self.size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+
+        index = 0
+        try:
+            while True:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                timestamp = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+                if not timestamp and self.fps:
+                    timestamp = index / self.fps
+                if not self._put((index, timestamp, None, frame)):
+                    break
+                index += 1
+        finally:
+            cap.release()
+
+    def _read_images(self):
+        names = sorted(name for name in os.listdir(self.path) if name.lower().endswith(IMAGE_EXTENSIONS))
+        for index, name in enumerate(names):
+            frame = cv2.imread(os.path.join(self.path, name))
+            if frame is None:
+                continue
+            if not self._put((index, None, name, frame)):
+                break
+
+    def batches(self, batch_size):
+        batch = []
+        while True:
+            item = self.frames.get()
+            if item is None:
+                break
+            batch.append(item)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+        if self.error is not None:
+            raise self.error
+
+
+class JsonlWriter:
+    extension = '.jsonl'
+
+    def __init__(self, path):
+        self.file = open(path, 'w')
+
+    def write(self, records):
+        for record in records:
+            self.file.write(json.dumps(record) + '\n')
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetWriter:
+    extension = '.parquet'
+
+    def __init__(self, path):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.pa = pa
+        self.schema = pa.schema([
+            ('source', pa.string()),
+            ('frame_index', pa.int64()),
+            ('timestamp', pa.float64()),
+            ('image', pa.string()),
+            ('class_id', pa.int32()),
+            ('name', pa.string()),
+            ('confidence', pa.float32()),
+            ('x1', pa.int32()),
+            ('y1', pa.int32()),
+            ('x2', pa.int32()),
+            ('y2', pa.int32()),
+        ])
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+    def write(self, records):
+        if not records:
+            return
+        rows = [{**{k: v for k, v in record.items() if k != 'box'},
+                 'x1': record['box'][0], 'y1': record['box'][1],
+                 'x2': record['box'][2], 'y2': record['box'][3]} for record in records]
+        self.writer.write_table(self.pa.Table.from_pylist(rows, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+WRITERS = {
+    'jsonl': JsonlWriter,
+    'parquet': ParquetWriter,
+}
+
+
+def find_inputs(paths):
+    inputs = []
+    for path in paths:
+        if os.path.isfile(path):
+            inputs.append(path)
+            continue
+        has_images = False
+        for root, _, files in os.walk(path):
+            for name in sorted(files):
+                lower = name.lower()
+                if lower.endswith(VIDEO_EXTENSIONS):
+                    inputs.append(os.path.join(root, name))
+                elif lower.endswith(IMAGE_EXTENSIONS) and root == path:
+                    has_images = True
+        if has_images:
+            inputs.append(path)
+    return inputs
+
+
+def output_name(path):
+    return os.path.normpath(os.path.abspath(path)).strip(os.sep).replace(os.sep, '__').replace(':', '')
+
+
+def _init_worker(backend, model_path, conf_threshold, cache_dir=None, cache_tolerance=0, cache_size=1 << 20,
+                 tile_size=None, tile_overlap=0.2):
+    global _detector
+    cache = None
+    if cache_dir:
+        cache = DetectionCache(max_entries=cache_size, max_bytes=1 << 30, tolerance=cache_tolerance, path=cache_dir)
+    _detector = RoadSignDetector(backend=backend, model_path=model_path, speech=False, cache=cache)
+    if conf_threshold is not None:
+        _detector.conf_threshold = conf_threshold
+    if tile_size:
+        _detector.enable_tiling(tile_size, tile_overlap)
+
+
+def process_file(path, output_dir, output_format='jsonl', batch_size=8, annotate_dir=None):
+    writer_class = WRITERS[output_format]
+    final_path = os.path.join(output_dir, output_name(path) + writer_class.extension)
+    if os.path.exists(final_path):
+        return path, 'skipped', 0, 0.0
+
+    partial_path = final_path + '.partial'
+    writer = writer_class(partial_path)
+    reader = FrameReader(path).start()
+
+    video_writer = None
+    frames = 0
+    started = time.perf_counter()
+    try:
+        for batch in reader.batches(batch_size):
+            frames_in_batch = [frame for _, _, _, frame in batch]
+            if _detector.tile_size:
+                # every tiled frame is already a batch of crops
+                results = [_detector.detect_signs(frame) for frame in frames_in_batch]
+            else:
+                results = _detector.detect_batch(frames_in_batch)
+
+            records = []
+            for (index, timestamp, image, frame), detections in zip(batch, results):
+                for det in detections:
+                    records.append({
+                        'source': path,
+                        'frame_index': index,
+                        'timestamp': timestamp,
+                        'image': image,
+                        'class_id': det['class_id'],
+                        'name': det['name'],
+                        'confidence': det['confidence'],
+                        'box': list(det['box'])
+                    })
+
+                if annotate_dir and image is None:
+                    if video_writer is None:
+                        height, width = frame.shape[:2]
+                        annotated_path = os.path.join(annotate_dir, output_name(path) + '.mp4')
+                        video_writer = cv2.VideoWriter(annotated_path, cv2.VideoWriter_fourcc(*'mp4v'),
+                                                       reader.fps or 30.0, (width, height))
+                    video_writer.write(_detector.draw_detections(frame, detections))
+                elif annotate_dir:
+                    cv2.imwrite(os.path.join(annotate_dir, f"{output_name(path)}__{image}"),
+                                _detector.draw_detections(frame, detections))
+
+            writer.write(records)
+            frames += len(batch)
+    finally:
+        reader.stop()
+        writer.close()
+        if video_writer is not None:
+            video_writer.release()
+
+    os.replace(partial_path, final_path)
+    if _detector.cache is not None:
+        _detector.cache.save()
+
+    return path, 'done', frames, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run road sign detection over videos and image directories")
+    parser.add_argument('inputs', nargs='+', help="Video files, image directories or directories of videos")
+    parser.add_argument('--output-dir', default='detections', help="Directory for per-input detection files")
+    parser.add_argument('--format', choices=list(WRITERS), default='jsonl')
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--workers', type=int, default=1, help="Number of worker processes across files")
+    parser.add_argument('--annotate-dir', help="Write annotated videos/images to this directory")
+    parser.add_argument('--backend', choices=['ultralytics', 'onnx', 'openvino'], default='ultralytics')
+    parser.add_argument('--model', help="Model path for the selected backend")
+    parser.add_argument('--conf', type=float, help="Confidence threshold override")
+    parser.add_argument('--cache-dir', help="Persist detections by frame hash here so re-runs skip inference")
+    parser.add_argument('--cache-tolerance', type=int, default=0,
+                        help="Hash bits two frames may differ by and still share cached detections")
+    parser.add_argument('--cache-size', type=int, default=1 << 20, help="Maximum cached frames per worker")
+    parser.add_argument('--tile-size', type=int, help="Also detect on overlapping tiles of this size")
+    parser.add_argument('--tile-overlap', type=float, default=0.2, help="Fractional overlap between tiles")
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    if args.annotate_dir:
+        os.makedirs(args.annotate_dir, exist_ok=True)
+
+    inputs = find_inputs(args.inputs)
+    if not inputs:
+        print("No videos or image directories found")
+        return
+
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                             initargs=(args.backend, args.model, args.conf, args.cache_dir, args.cache_tolerance,
+                                       args.cache_size, args.tile_size, args.tile_overlap)) as executor:
+        futures = {
+            executor.submit(process_file, path, args.output_dir, args.format, args.batch_size, args.annotate_dir): path
+            for path in inputs
+        }
+        for future in as_completed(futures):
+            try:
+                path, status, frames, elapsed = future.result()
+            except Exception as e:
+                print(f"{futures[future]}: failed ({e})")
+                continue
+            if status == 'skipped':
+                print(f"{path}: already processed, skipping")
+            else:
+                fps = frames / elapsed if elapsed else 0.0
+                print(f"{path}: {frames} frames in {elapsed:.1f}s ({fps:.1f} FPS)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import cv2
+import numpy as np
+
+from detector import RoadSignDetector
+from pipeline import DisplayRenderer
+from records import Detection
+from sources import ReplaySource
+from utils import preprocessing
+
+RESOLUTIONS = {
+    '480p': (640, 480),
+    '720p': (1280, 720),
+    '1080p': (1920, 1080),
+}
+
+
+def summarize(samples, items_per_sample=1):
+    samples = np.asarray(samples, dtype=np.float64)
+    if samples.size == 0:
+        return None
+    return {
+        'iterations': int(samples.size),
+        'mean_ms': float(samples.mean() * 1000),
+        'p50_ms': float(np.percentile(samples, 50) * 1000),
+        'p95_ms': float(np.percentile(samples, 95) * 1000),
+        'p99_ms': float(np.percentile(samples, 99) * 1000),
+        'throughput_per_s': float(items_per_sample * samples.size / samples.sum()) if samples.sum() else None,
+    }
+
+
+def measure(fn, inputs, iterations, warmup):
+    for i in range(warmup):
+        fn(inputs[i % len(inputs)])
+
+    samples = []
+    for i in range(iterations):
+        started = time.perf_counter()
+        fn(inputs[i % len(inputs)])
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def synthetic_frames(size, count, seed=0):
+    rng = np.random.default_rng(seed)
+    width, height = size
+    frames = []
+    for _ in range(count):
+        frame = cv2.GaussianBlur(rng.integers(0, 256, (height, width, 3), dtype=np.uint8), (0, 0), 3)
+        for _ in range(4):
+            center = (int(rng.integers(0, width)), int(rng.integers(0, height)))
+            radius = int(rng.integers(height // 40, height // 8))
+            cv2.circle(frame, center, radius, (0, 0, 255), -1)
+            cv2.circle(frame, center, int(radius * 0.75), (255, 255, 255), -1)
+        frames.append(frame)
+    return frames
+
+
+def clip_frames(path, count, size=None):
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while len(frames) < count:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        if size is not None:
+            frame = cv2.resize(frame, size)
+        frames.append(frame)
+    cap.release()
+    if not frames:
+        raise ValueError(f"No frames could be read from {path}")
+    return frames
+
+
+def replay_frames(path, count, size=None):
+    # recorded sessions give every run the exact same input, independent of camera and lighting
+    frames = ReplaySource(path, realtime=False).frames_list(count)
+    if size is not None:
+        frames = [cv2.resize(frame, size) for frame in frames]
+    if not frames:
+        raise ValueError(f"No frames could be read from {path}")
+    return frames
+
+
+def synthetic_detections(detector, size, count, seed=0):
+    rng = np.random.default_rng(seed)
+    width, height = size
+    detections = []
+    for _ in range(count):
+        x1, y1 = int(rng.integers(0, width - 100)), int(rng.integers(0, height - 100))
+        class_id = int(rng.integers(0, len(detector.classes)))
+        detections.append(Detection((x1, y1, x1 + 80, y1 + 80), float(rng.uniform(0.5, 1.0)), class_id,
+                                    detector.classes))
+    return detections
+
+
+def bench_preprocessing(frames, iterations, warmup):
+    preprocessor = preprocessing.Preprocessor(640)
+    batch = np.stack(frames[:8])
+
+    def reference(frame):
+        return preprocessing.to_input_tensor([preprocessing.letterbox(frame)[0]])
+
+    return {
+        'letterbox_to_tensor': summarize(measure(reference, frames, iterations, warmup)),
+        'preprocessor': summarize(measure(preprocessor, frames, iterations, warmup)),
+        'preprocessor_batch8': summarize(measure(preprocessor, [batch], iterations, warmup), items_per_sample=len(batch)),
+        'preprocess_image': summarize(measure(preprocessing.preprocess_image, frames, iterations, warmup)),
+        'apply_augmentation': summarize(measure(preprocessing.apply_augmentation, frames, iterations, warmup)),
+        'resize_maintain_aspect': summarize(measure(
+            lambda frame: preprocessing.resize_maintain_aspect(frame, (640, 640)), frames, iterations, warmup)),
+        'create_letterbox': summarize(measure(preprocessing.create_letterbox, frames, iterations, warmup)),
+        'letterbox': summarize(measure(preprocessing.letterbox, frames, iterations, warmup)),
+    }
+
+
+def bench_draw(detector, frames, size, iterations, warmup, box_counts=(1, 5, 20)):
+    results = {}
+    for count in box_counts:
+        detections = synthetic_detections(detector, size, count)
+        results[f'{count}_boxes'] = summarize(measure(
+            lambda frame: detector.draw_detections(frame, detections), frames, iterations, warmup))
+    return results
+
+
+def bench_display(frames, iterations, warmup, display_width=640):
+    from PIL import Image
+
+    height, width = frames[0].shape[:2]
+    display_size = (display_width, int(display_width * height / width))
+
+    stages = {
+        'cvtColor': lambda frame: cv2.cvtColor(frame, cv2.COLOR_BGR2RGB),
+        'resize': lambda frame: cv2.resize(frame, display_size),
+    }
+    converted = [cv2.resize(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB), display_size) for frame in frames]
+    results = {name: summarize(measure(fn, frames, iterations, warmup)) for name, fn in stages.items()}
+    results['fromarray'] = summarize(measure(Image.fromarray, converted, iterations, warmup))
+
+    root = None
+    try:
+        import tkinter as tk
+        from PIL import ImageTk
+
+        root = tk.Tk()
+        root.withdraw()
+        images = [Image.fromarray(frame) for frame in converted]
+        results['PhotoImage'] = summarize(measure(lambda image: ImageTk.PhotoImage(image=image),
+                                                  images, iterations, warmup))
+    except Exception as e:
+        print(f"Skipping PhotoImage benchmark: {e}")
+    finally:
+        if root is not None:
+            root.destroy()
+
+    def full_chain(frame):
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        frame = cv2.resize(frame, display_size)
+        return Image.fromarray(frame)
+
+    results['chain_without_photoimage'] = summarize(measure(full_chain, frames, iterations, warmup))
+    return results
+
+
+def bench_renderer(detector, frames, size, iterations, warmup, display_width=640, box_count=5):
+    width, height = size
+    renderer = DisplayRenderer(detector, (display_width, int(display_width * height / width)))
+    detections = synthetic_detections(detector, size, box_count)
+
+    # hand each buffer straight back, as the UI does once it has pasted the frame
+    return summarize(measure(lambda frame: renderer.release(renderer.render(frame, detections)), frames, iterations,
+                             warmup))
+
+
+def bench_detector(detector, frames, batch_sizes, iterations, warmup, tile_sizes=()):
+    stage_samples = {}
+
+    def single(frame):
+        started = time.perf_counter()
+        raw = detector.backend.predict(frame, detector.conf_threshold)
+        predicted = time.perf_counter()
+        detector.to_records(np.concatenate([detector._parse_result(data) for data in raw]))
+        finished = time.perf_counter()
+
+        for stage, ms in detector.backend.last_speed.items():
+            stage_samples.setdefault(f'backend_{stage}', []).append(ms / 1000)
+        stage_samples.setdefault('detector_postprocess', []).append(finished - predicted)
+
+    results = {'detect_signs': summarize(measure(single, frames, iterations, warmup))}
+    results['stages'] = {stage: summarize(samples[warmup:]) for stage, samples in stage_samples.items()}
+
+    batches = {}
+    for batch_size in batch_sizes:
+        batch_inputs = [[frames[(i + j) % len(frames)] for j in range(batch_size)] for i in range(len(frames))]
+        batches[str(batch_size)] = summarize(measure(detector.detect_batch, batch_inputs, iterations, warmup),
+                                             items_per_sample=batch_size)
+    results['detect_batch'] = batches
+
+    # tiled inference cost scales with the number of crops per frame, reported alongside the timing
+    tiled = {}
+    for tile_size in tile_sizes:
+        detector.enable_tiling(tile_size)
+        tiled[str(tile_size)] = summarize(measure(detector.detect_signs, frames, iterations, warmup))
+        tiled[str(tile_size)]['crops'] = len(detector.tiles(frames[0].shape))
+    detector.tile_size = None
+    results['detect_tiled'] = tiled
+    return results
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        'commit': commit or None,
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'opencv': cv2.__version__,
+        'numpy': np.__version__,
+        'cv2_threads': cv2.getNumThreads(),
+    }
+
+
+def compare(baseline_path, current_path, metric='p50_ms', tolerance=0.05):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    with open(current_path) as f:
+        current = json.load(f)
+
+    def walk(old, new, path):
+        if isinstance(old, dict) and metric in old and isinstance(new, dict) and metric in new:
+            change = (new[metric] - old[metric]) / old[metric] if old[metric] else 0.0
+            flag = 'REGRESSION' if change > tolerance else 'improved' if change < -tolerance else ''
+            print(f"{'/'.join(path):<70} {old[metric]:>10.3f} {new[metric]:>10.3f} {change:>+8.1%} {flag}")
+            return
+        if isinstance(old, dict) and isinstance(new, dict):
+            for key in old:
+                if key in new and key != 'environment':
+                    walk(old[key], new[key], path + [key])
+
+    print(f"{'benchmark':<70} {'baseline':>10} {'current':>10} {'change':>8}")
+    walk(baseline, current, [])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark detector and UI hot paths")
+    parser.add_argument('--output', default='benchmark.json', help="Where to write the JSON results")
+    parser.add_argument('--resolutions', nargs='+', default=['480p', '720p', '1080p'], choices=list(RESOLUTIONS))
+    parser.add_argument('--batch-sizes', nargs='+', type=int, default=[1, 2, 4, 8])
+    parser.add_argument('--tile-sizes', nargs='*', type=int, default=[640],
+                        help="Tile sizes to benchmark tiled inference with (frames no larger than a tile run untiled)")
+    parser.add_argument('--backends', nargs='+', default=['ultralytics'], choices=['ultralytics', 'onnx', 'openvino'])
+    parser.add_argument('--model', action='append', default=[],
+                        help="backend=path override, e.g. onnx=models/best_int8.onnx")
+    parser.add_argument('--clip', help="Recorded video clip to benchmark on in addition to synthetic frames")
+    parser.add_argument('--replay', help="Session recorded with app.py --record to benchmark on")
+    parser.add_argument('--frames', type=int, default=16, help="Distinct input frames per dataset")
+    parser.add_argument('--iterations', type=int, default=100)
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--threads', type=int, help="Pin OpenCV to this many threads for reproducible numbers")
+    parser.add_argument('--skip-detector', action='store_true', help="Only benchmark drawing, display and preprocessing")
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'), help="Diff two result files")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    if args.threads is not None:
+        cv2.setNumThreads(args.threads)
+
+    model_paths = dict(override.split('=', 1) for override in args.model)
+
+    datasets = {}
+    for name in args.resolutions:
+        datasets[f'synthetic_{name}'] = (RESOLUTIONS[name], synthetic_frames(RESOLUTIONS[name], args.frames))
+        if args.clip:
+            datasets[f'clip_{name}'] = (RESOLUTIONS[name], clip_frames(args.clip, args.frames, RESOLUTIONS[name]))
+        if args.replay:
+            datasets[f'replay_{name}'] = (RESOLUTIONS[name], replay_frames(args.replay, args.frames, RESOLUTIONS[name]))
+
+    results = {'environment': environment(), 'config': vars(args), 'datasets': {}}
+    drawing_detector = RoadSignDetector(lazy=True, speech=False)
+
+    for dataset, (size, frames) in datasets.items():
+        print(f"Benchmarking {dataset}...")
+        entry = {
+            'preprocessing': bench_preprocessing(frames, args.iterations, args.warmup),
+            'draw_detections': bench_draw(drawing_detector, frames, size, args.iterations, args.warmup),
+            'update_frame': bench_display(frames, args.iterations, args.warmup),
+            'display_renderer': bench_renderer(drawing_detector, frames, size, args.iterations, args.warmup),
+        }
+        results['datasets'][dataset] = entry
+
+    if not args.skip_detector:
+        for backend in args.backends:
+            print(f"Benchmarking {backend} backend...")
+            detector = RoadSignDetector(backend=backend, model_path=model_paths.get(backend), speech=False)
+            for dataset, (size, frames) in datasets.items():
+                results['datasets'][dataset].setdefault('detector', {})[backend] = bench_detector(
+                    detector, frames, args.batch_sizes, args.iterations, args.warmup, args.tile_sizes)
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Wrote results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+import yaml
+
+from utils.preprocessing import apply_augmentation, letterbox
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+_worker_images = None
+_worker_imgsz = None
+
+
+def resolve_split(yaml_path='data/data.yaml', split='val', data_root=None):
+    # data.yaml is written on the training machine, so fall back to its own directory when `path` does not exist
+    with open(yaml_path) as f:
+        data = yaml.safe_load(f)
+
+    base = os.path.dirname(os.path.abspath(yaml_path))
+    root = data_root or (data.get('path') or '').replace('\\', '/')
+    if not root or not os.path.isdir(root):
+        root = base
+    elif not os.path.isabs(root):
+        root = os.path.join(base, root)
+
+    entries = data[split] if isinstance(data[split], list) else [data[split]]
+    images = []
+    for entry in entries:
+        location = os.path.join(root, *entry.replace('\\', '/').split('/'))
+        if os.path.isdir(location):
+            images += [os.path.join(location, name) for name in sorted(os.listdir(location))
+                       if name.lower().endswith(IMAGE_EXTENSIONS)]
+        elif location.endswith('.txt'):
+            with open(location) as f:
+                images += [os.path.join(root, line.strip()) for line in f if line.strip()]
+        else:
+            raise FileNotFoundError(f"Dataset split '{split}' not found at {location}")
+    return images
+
+
+def label_path(image_path):
+    # YOLO layout: .../images/name.jpg -> .../labels/name.txt
+    head, name = os.path.split(image_path)
+    parent, folder = os.path.split(head)
+    if folder == 'images':
+        head = os.path.join(parent, 'labels')
+    return os.path.join(head, os.path.splitext(name)[0] + '.txt')
+
+
+def read_labels(image_path, width, height):
+    # returns (N, 5): class_id, x1, y1, x2, y2 in pixels of the original image
+    path = label_path(image_path)
+    if not os.path.exists(path):
+        return np.empty((0, 5), dtype=np.float32)
+    rows = np.loadtxt(path, dtype=np.float32, ndmin=2)
+    if rows.size == 0:
+        return np.empty((0, 5), dtype=np.float32)
+
+    cx, cy, w, h = rows[:, 1] * width, rows[:, 2] * height, rows[:, 3] * width, rows[:, 4] * height
+    return np.stack([rows[:, 0], cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+
+
+def _init_worker(images_path, count, imgsz):
+    global _worker_images, _worker_imgsz
+    _worker_images = np.memmap(images_path, dtype=np.uint8, mode='r+', shape=(count, imgsz, imgsz, 3))
+    _worker_imgsz = imgsz
+
+
+def _load_item(item):
+    # decode and letterbox straight into the shared memory-mapped file; only metadata goes back over the pipe
+    index, path = item
+    image = cv2.imread(path)
+    if image is None:
+        _worker_images[index] = 114
+        return index, 0.0, (0, 0), (0, 0), np.empty((0, 5), dtype=np.float32)
+
+    height, width = image.shape[:2]
+    letterboxed, scale, pad = letterbox(image, (_worker_imgsz, _worker_imgsz))
+    _worker_images[index] = letterboxed
+    return index, scale, pad, (height, width), read_labels(path, width, height)
+
+
+class DatasetCache:
+    def __init__(self, yaml_path='data/data.yaml', split='val', imgsz=640, cache_dir='cache/dataset',
+                 data_root=None, workers=None):
+        self.yaml_path = yaml_path
+        self.split = split
+        self.imgsz = imgsz
+        self.paths = resolve_split(yaml_path, split, data_root)
+        self.workers = workers or os.cpu_count()
+        self.directory = os.path.join(cache_dir, f"{split}-{imgsz}-{self._fingerprint()}")
+
+        self.images = None
+        self.scales = None
+        self.pads = None
+        self.shapes = None
+        self.labels = None
+        self.label_offsets = None
+
+    def _fingerprint(self):
+        # any added, removed or re-saved image invalidates the cache
+        digest = hashlib.sha1(str(self.imgsz).encode())
+        for path in self.paths:
+            stat = os.stat(path)
+            digest.update(f"{path}:{stat.st_size}:{int(stat.st_mtime)}".encode())
+            labels = label_path(path)
+            if os.path.exists(labels):
+                digest.update(f"{int(os.stat(labels).st_mtime)}".encode())
+        return digest.hexdigest()[:12]
+
+    def __len__(self):
+        return len(self.paths)
+
+    def load(self):
+        if not os.path.exists(os.path.join(self.directory, 'meta.npz')):
+            self.build()
+
+        meta = np.load(os.path.join(self.directory, 'meta.npz'))
+        self.scales, self.pads, self.shapes = meta['scales'], meta['pads'], meta['shapes']
+        self.labels, self.label_offsets = meta['labels'], meta['label_offsets']
+        self.images = np.memmap(os.path.join(self.directory, 'images.u8'), dtype=np.uint8, mode='r',
+                                shape=(len(self.paths), self.imgsz, self.imgsz, 3))
+        return self
+
+    def build(self):
+        os.makedirs(self.directory, exist_ok=True)
+        count = len(self.paths)
+        images_path = os.path.join(self.directory, 'images.u8')
+        np.memmap(images_path, dtype=np.uint8, mode='w+', shape=(count, self.imgsz, self.imgsz, 3)).flush()
+
+        scales = np.zeros(count, dtype=np.float32)
+        pads = np.zeros((count, 2), dtype=np.float32)
+        shapes = np.zeros((count, 2), dtype=np.int32)
+        labels = [None] * count
+
+        print(f"Caching {count} {self.split} images at {self.imgsz}px into {self.directory}...")
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                 initargs=(images_path, count, self.imgsz)) as executor:
+            for index, scale, pad, shape, rows in executor.map(_load_item, enumerate(self.paths), chunksize=32):
+                scales[index], pads[index], shapes[index], labels[index] = scale, pad, shape, rows
+
+        counts = np.array([len(rows) for rows in labels], dtype=np.int64)
+        partial_path = os.path.join(self.directory, 'meta.partial.npz')
+        np.savez(partial_path, scales=scales, pads=pads, shapes=shapes,
+                 labels=np.concatenate(labels) if count else np.empty((0, 5), dtype=np.float32),
+                 label_offsets=np.concatenate([[0], np.cumsum(counts)]))
+        # meta.npz only appears once every image has been written, so an interrupted build is redone
+        os.replace(partial_path, os.path.join(self.directory, 'meta.npz'))
+        with open(os.path.join(self.directory, 'sources.json'), 'w') as f:
+            json.dump({'yaml': self.yaml_path, 'split': self.split, 'paths': self.paths}, f)
+
+    def targets(self, index):
+        return self.labels[self.label_offsets[index]:self.label_offsets[index + 1]]
+
+    def to_original(self, boxes, index):
+        # map boxes from letterboxed model input back to original image pixels
+        boxes = boxes.astype(np.float32)
+        height, width = self.shapes[index]
+        boxes[:, [0, 2]] = ((boxes[:, [0, 2]] - self.pads[index, 0]) / self.scales[index]).clip(0, width)
+        boxes[:, [1, 3]] = ((boxes[:, [1, 3]] - self.pads[index, 1]) / self.scales[index]).clip(0, height)
+        return boxes
+
+    def batches(self, batch_size=16, shuffle=False, augment=False, seed=None):
+        order = np.random.default_rng(seed).permutation(len(self)) if shuffle else np.arange(len(self))
+        for start in range(0, len(order), batch_size):
+            indices = order[start:start + batch_size]
+            images = [np.array(self.images[i]) for i in indices]
+            if augment:
+                images = [apply_augmentation(image) for image in images]
+            yield indices, images
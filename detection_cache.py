@@ -0,0 +1,158 @@
+import glob
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from records import DETECTION_DTYPE
+
+# rough per-entry bookkeeping on top of the hash and detection bytes (dict slot, tuple key, version string)
+ENTRY_OVERHEAD = 200
+
+
+def perceptual_hash(frame, size=16):
+    # difference hash on a (size+1) x size thumbnail: size*size bits, robust to re-encoding and small noise
+    small = cv2.resize(frame, (size + 1, size), interpolation=cv2.INTER_AREA)
+    if small.ndim == 3:
+        small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    return np.packbits(small[:, 1:] > small[:, :-1]).tobytes()
+
+
+class DetectionCache:
+    def __init__(self, max_entries=4096, max_bytes=64 << 20, tolerance=0, hash_size=16, path=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # maximum number of differing hash bits that still counts as the same frame; 0 only matches
+        # frames whose thumbnails are identical, larger values trade accuracy for hit rate
+        self.tolerance = tolerance
+        self.hash_size = hash_size
+        self.path = path
+
+        self.entries = OrderedDict()
+        self.hashes = {}
+        self.bytes = 0
+        self.lock = threading.Lock()
+        self.new_keys = set()
+        self.shard = f"{os.getpid()}-{int(time.time() * 1000)}.npz"
+        self.stats = {'hits': 0, 'near_hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0, 'loaded': 0}
+
+        if path:
+            self.load()
+
+    def key(self, frame, version):
+        return (version, perceptual_hash(frame, self.hash_size))
+
+    def get(self, key):
+        with self.lock:
+            detections = self.entries.get(key)
+            if detections is not None:
+                self.entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return detections.copy()
+
+            if self.tolerance:
+                near = self._nearest(key)
+                if near is not None:
+                    self.entries.move_to_end(near)
+                    self.stats['near_hits'] += 1
+                    return self.entries[near].copy()
+
+            self.stats['misses'] += 1
+            return None
+
+    def _nearest(self, key):
+        version, digest = key
+        candidates = self.hashes.get(version)
+        if not candidates:
+            return None
+
+        digests = list(candidates)
+        table = np.frombuffer(b''.join(digests), dtype=np.uint8).reshape(len(digests), -1)
+        query = np.frombuffer(digest, dtype=np.uint8)
+        distances = np.unpackbits(table ^ query, axis=1).sum(axis=1)
+        best = int(distances.argmin())
+        if distances[best] > self.tolerance:
+            return None
+        return (version, digests[best])
+
+    def put(self, key, detections):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return
+            self._insert(key, detections.copy())
+            self.new_keys.add(key)
+            self.stats['stores'] += 1
+            self._evict()
+
+    def _insert(self, key, detections):
+        self.entries[key] = detections
+        self.hashes.setdefault(key[0], {})[key[1]] = None
+        self.bytes += self._size(key, detections)
+
+    def _size(self, key, detections):
+        return detections.nbytes + len(key[1]) + ENTRY_OVERHEAD
+
+    def _evict(self):
+        while self.entries and (len(self.entries) > self.max_entries or self.bytes > self.max_bytes):
+            key, detections = self.entries.popitem(last=False)
+            del self.hashes[key[0]][key[1]]
+            self.new_keys.discard(key)
+            self.bytes -= self._size(key, detections)
+            self.stats['evictions'] += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hashes.clear()
+            self.new_keys.clear()
+            self.bytes = 0
+
+    def load(self):
+        # every process writes its own shard, so parallel batch workers never overwrite each other
+        for shard in sorted(glob.glob(os.path.join(self.path, '*.npz'))):
+            if shard.endswith('.partial.npz'):
+                continue
+            try:
+                with np.load(shard, allow_pickle=False) as data:
+                    versions, digests, counts = data['versions'], data['digests'], data['counts']
+                    detections = data['detections'].astype(DETECTION_DTYPE)
+            except (OSError, KeyError, ValueError) as e:
+                print(f"Skipping unreadable detection cache shard {shard}: {e}")
+                continue
+
+            starts = np.concatenate([[0], np.cumsum(counts)[:-1]]) if len(counts) else []
+            with self.lock:
+                for version, digest, start, count in zip(versions.tolist(), digests, starts, counts):
+                    key = (version, digest.tobytes())
+                    if key not in self.entries:
+                        self._insert(key, detections[start:start + count].copy())
+                        self.stats['loaded'] += 1
+                self._evict()
+
+    def save(self):
+        if not self.path:
+            return
+        with self.lock:
+            keys = [key for key in self.entries if key in self.new_keys]
+            values = [self.entries[key] for key in keys]
+        if not keys:
+            return
+
+        os.makedirs(self.path, exist_ok=True)
+        final_path = os.path.join(self.path, self.shard)
+        partial_path = final_path + '.partial.npz'
+        np.savez(partial_path,
+                 versions=np.array([key[0] for key in keys]),
+                 digests=np.frombuffer(b''.join(key[1] for key in keys), dtype=np.uint8).reshape(len(keys), -1),
+                 counts=np.array([len(value) for value in values], dtype=np.int64),
+                 detections=np.concatenate(values) if values else np.empty(0, dtype=DETECTION_DTYPE))
+        os.replace(partial_path, final_path)
+
+    def report(self):
+        lookups = self.stats['hits'] + self.stats['near_hits'] + self.stats['misses']
+        hit_rate = (self.stats['hits'] + self.stats['near_hits']) / lookups if lookups else 0.0
+        return {**self.stats, 'entries': len(self.entries), 'bytes': self.bytes, 'hit_rate': hit_rate}
@@ -1,18 +1,28 @@
 import cv2
 import numpy as np
-from ultralytics import YOLO
-import pyttsx3
 import threading
-import queue
+import time
+from backends import create_backend, non_max_suppression
+from metrics import METRICS
+from records import DETECTION_DTYPE, load_class_table, to_records
+from speech import SpeechScheduler
+from utils.tiling import tile_grid, uncut_boxes
 
 class RoadSignDetector:
-    def __init__(self):
+    def __init__(self, backend='ultralytics', model_path=None, lazy=False, speech=True, cache=None,
+                 input_order='bgr'):
 
-        self.engine = None
-        self.speaking = False
-        self.speech_queue = queue.Queue()
-        self.speech_thread = threading.Thread(target=self._speech_worker, daemon=True)
-        self.speech_thread.start()
+        self.speech = SpeechScheduler()
+        self.speech_enabled = speech
+
+        self.backend_name = backend
+        self.model_path = model_path
+        # channel order of the frames handed to detect_*, as delivered by the frame source
+        self.input_order = input_order
+        self.backend = None
+        self.ready = threading.Event()
+        self.load_lock = threading.Lock()
+        self.timings = {}
         
         self.sign_classes = {
             0: {
@@ -188,67 +198,259 @@ class RoadSignDetector:
                 "description": "End of no-overtaking zone for heavy vehicles. Trucks may now pass other vehicles."
             }
         }
+
+        self.classes = load_class_table(descriptions={
+            class_id: info["description"] for class_id, info in self.sign_classes.items()
+        })
         
-        self.model = YOLO('models/best.pt')
         self.conf_threshold = 0.5
+        self.cache = cache
 
-    def _speech_worker(self):
-        self.engine = pyttsx3.init()
-        
-        while True:
-            try:
-                text = self.speech_queue.get()
-                if text is None:
-                    break
-                
-                self.speaking = True
-                self.engine.say(text)
-                self.engine.runAndWait()
-                self.speaking = False
-                
-            except Exception as e:
-                print(f"Speech error: {e}")
-                self.speaking = False
-            finally:
-                self.speech_queue.task_done()
+        self.tile_size = None
+        self.tile_overlap = 0.2
+        self.tile_regions = None
+        self.tile_full_frame = True
+        self.tile_iou_threshold = 0.5
+        self.last_model_run = False
+
+        if not lazy:
+            self.load()
+
+    def load(self, warmup=True):
+        with self.load_lock:
+            if self.ready.is_set():
+                return
+
+            if self.speech_enabled:
+                self.start_speech()
+
+            started = time.perf_counter()
+            self.backend = create_backend(self.backend_name, self.model_path, input_order=self.input_order)
+            self.model_path = self.backend.model_path
+            self.timings['model_load'] = time.perf_counter() - started
+
+            if warmup:
+                started = time.perf_counter()
+                self.warmup()
+                self.timings['warmup'] = time.perf_counter() - started
+
+            self.ready.set()
+
+    def warmup(self, shape=(480, 640, 3), backend=None):
+        backend = backend if backend is not None else self.backend
+        backend.predict(np.zeros(shape, dtype=np.uint8), self.conf_threshold)
+
+    def set_imgsz(self, imgsz):
+        if self.backend.fixed_imgsz:
+            return imgsz == self.backend.imgsz
+        self.backend.imgsz = imgsz
+        return True
+
+    def switch_model(self, model_path, imgsz=None):
+        # build and warm the new backend off to the side so inference keeps running on the old one
+        started = time.perf_counter()
+        kwargs = {'imgsz': imgsz} if imgsz else {}
+        backend = create_backend(self.backend_name, model_path, input_order=self.input_order, **kwargs)
+        self.warmup(backend=backend)
+        self.backend = backend
+        self.model_path = backend.model_path
+        self.timings['model_switch'] = time.perf_counter() - started
+
+    def set_input_order(self, order):
+        self.input_order = order
+        if self.backend is not None:
+            self.backend.input_order = order
+
+    def start_speech(self):
+        self.speech.start({
+            class_id: self.announcement_text({'name': self.classes.name(class_id),
+                                              'description': self.classes.description(class_id)})
+            for class_id in range(len(self.classes))
+        })
+
+    def announcement_text(self, detection):
+        return f"Detected {detection['name']}. {detection['description']}"
+
+    def announce(self, detection, force=False):
+        self.start_speech()
+        key = detection.get('class_id', detection['name'])
+        return self.speech.announce(key, self.announcement_text(detection), force=force)
+
+    def announce_rule(self, change):
+        # rule changes are already deduplicated by RoadRules, so skip the per-sign cooldown; a change still
+        # queued for the same rule is outdated and gets replaced rather than spoken first
+        self.start_speech()
+        return self.speech.announce(change['key'], change['text'], force=True, replace=True)
 
     def speak_description(self, text):
-        try:
-            self.speech_queue.put_nowait(text)
-        except queue.Full:
+        self.start_speech()
+        if not self.speech.say(text):
             print("Speech queue is full, skipping this announcement")
         
-    def detect_signs(self, frame):
-        results = self.model(frame)
-        
-        detections = []
-        
-        for result in results:
-            boxes = result.boxes
-            for box in boxes:
-                x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                confidence = float(box.conf[0].cpu().numpy())
-                class_id = int(box.cls[0].cpu().numpy())
-                
-                if confidence > self.conf_threshold:
-                    sign_info = self.sign_classes.get(class_id, {
-                        "name": "Unknown Sign",
-                        "description": "Sign not recognized"
-                    })
-                    detections.append({
-                        'box': (int(x1), int(y1), int(x2), int(y2)),
-                        'name': sign_info["name"],
-                        'description': sign_info["description"],
-                        'confidence': confidence
-                    })
-        
+    def cache_version(self):
+        # anything that changes the output for the same pixels must change the cache key
+        return f"{self.backend_name}:{self.model_path}:{self.backend.imgsz}:{self.conf_threshold}:{self.input_order}"
+
+    def enable_tiling(self, tile_size=640, overlap=0.2, regions=None, full_frame=True):
+        # regions are fractional (x1, y1, x2, y2) areas to tile, e.g. utils.motion.DEFAULT_SIGN_REGIONS
+        self.tile_size = tile_size
+        self.tile_overlap = overlap
+        self.tile_regions = regions
+        self.tile_full_frame = full_frame
+
+    def tiles(self, shape):
+        height, width = shape[:2]
+        tiles = tile_grid(width, height, self.tile_size, self.tile_overlap, self.tile_regions)
+        if self.tile_full_frame:
+            # the downscaled full frame still catches signs too large for a single tile
+            tiles = [(0, 0, width, height)] + tiles
+        return tiles
+
+    def detect_signs(self, frame, as_array=False, frame_id=0):
+        # whether this call ran the model on the whole frame, so latency consumers can ignore cache hits and tiling
+        self.last_model_run = False
+        if self.tile_size and max(frame.shape[:2]) > self.tile_size:
+            return self.detect_tiled(frame, as_array=as_array, frame_id=frame_id)
+        if not self.ready.is_set():
+            self.load()
+
+        key = None
+        detections = None
+        if self.cache is not None:
+            key = self.cache.key(frame, f"{self.cache_version()}:{frame.shape}")
+            detections = self.cache.get(key)
+
+        if detections is None:
+            results = self.backend.predict(frame, self.conf_threshold)
+            self.last_model_run = True
+
+            started = time.perf_counter()
+            parsed = [self._parse_result(result, frame_id) for result in results]
+            detections = np.concatenate(parsed) if parsed else np.empty(0, dtype=DETECTION_DTYPE)
+            self.record_speed(self.backend.last_speed, time.perf_counter() - started)
+            if key is not None:
+                self.cache.put(key, detections)
+        else:
+            detections['frame_id'] = frame_id
+
+        if as_array:
+            return detections
+        return self.to_records(detections)
+
+    def detect_batch(self, frames, as_array=False, frame_ids=None):
+        if not frames:
+            return []
+        if not self.ready.is_set():
+            self.load()
+
+        frames = list(frames)
+        frame_ids = frame_ids if frame_ids is not None else [0] * len(frames)
+        parsed = [None] * len(frames)
+
+        keys = [None] * len(frames)
+        if self.cache is not None:
+            version = self.cache_version()
+            for i, frame in enumerate(frames):
+                keys[i] = self.cache.key(frame, f"{version}:{frame.shape}")
+                parsed[i] = self.cache.get(keys[i])
+                if parsed[i] is not None:
+                    parsed[i]['frame_id'] = frame_ids[i]
+
+        missing = [i for i, detections in enumerate(parsed) if detections is None]
+        if missing:
+            results = self.backend.predict([frames[i] for i in missing], self.conf_threshold)
+
+            started = time.perf_counter()
+            for i, result in zip(missing, results):
+                parsed[i] = self._parse_result(result, frame_ids[i])
+                if keys[i] is not None:
+                    self.cache.put(keys[i], parsed[i])
+            self.record_speed(self.backend.last_speed, time.perf_counter() - started)
+        if as_array:
+            return parsed
+        return [self.to_records(detections) for detections in parsed]
+
+    def _detect_crops(self, frame, regions, frame_id=0):
+        # one batch over the crops; boxes come back in frame coordinates, one array per region
+        crops = [frame[y1:y2, x1:x2] for x1, y1, x2, y2 in regions]
+        parsed = self.detect_batch(crops, as_array=True, frame_ids=[frame_id] * len(crops))
+        for detections, (x1, y1, _, _) in zip(parsed, regions):
+            detections['box'] += np.array([x1, y1, x1, y1], dtype=np.int16)
+        return parsed
+
+    def detect_regions(self, frame, regions, as_array=False, frame_id=0):
+        parsed = self._detect_crops(frame, regions, frame_id)
+        detections = np.concatenate(parsed) if parsed else np.empty(0, dtype=DETECTION_DTYPE)
+        if len(regions) > 1:
+            # regions may overlap, and a sign inside the overlap is found once per region
+            detections = self.merge_detections(detections)
+
+        if as_array:
+            return detections
+        return self.to_records(detections)
+
+    def detect_tiled(self, frame, as_array=False, frame_id=0):
+        # each tile goes through the backend's letterbox at native resolution, so small signs keep their
+        # pixels; all tiles run as one batch and cost grows with len(self.tiles(frame.shape))
+        height, width = frame.shape[:2]
+        tiles = self.tiles(frame.shape)
+        parsed = self._detect_crops(frame, tiles, frame_id)
+        # a sign cut by a tile edge leaves a partial box that NMS alone does not always suppress
+        parsed = [detections[uncut_boxes(detections['box'], tile, tiles, width, height)]
+                  for detections, tile in zip(parsed, tiles)]
+        detections = self.merge_detections(np.concatenate(parsed))
+
+        if as_array:
+            return detections
+        return self.to_records(detections)
+
+    def merge_detections(self, detections):
+        # cross-region NMS: overlapping tiles and regions report the same sign more than once
+        if len(detections) < 2:
+            return detections
+        boxes = detections['box'].astype(np.float32)
+        # int16 boxes never exceed 32767, so this offset keeps classes from suppressing each other
+        offsets = detections['class_id'][:, None].astype(np.float32) * 32768
+        keep = non_max_suppression(boxes + offsets, detections['confidence'], self.tile_iou_threshold)
+        return detections[np.sort(keep)]
+
+    def record_speed(self, speed, parse_seconds=0.0):
+        # backends report milliseconds per call; parsing the raw boxes counts towards postprocess
+        for stage, ms in speed.items():
+            if stage == 'postprocess':
+                METRICS.observe(stage, ms / 1000 + parse_seconds)
+            else:
+                METRICS.observe(stage, ms / 1000)
+        if 'postprocess' not in speed:
+            METRICS.observe('postprocess', parse_seconds)
+
+    def _parse_result(self, data, frame_id=0):
+        # data is (N, 6): x1, y1, x2, y2, conf, cls -- one array per frame from the backend
+        data = data[data[:, 4] > self.conf_threshold]
+
+        detections = np.empty(len(data), dtype=DETECTION_DTYPE)
+        detections['frame_id'] = frame_id
+        detections['box'] = data[:, :4]
+        detections['confidence'] = data[:, 4]
+        detections['class_id'] = self.classes.lookup(data[:, 5].astype(np.int32))
+
         return detections
+
+    def to_records(self, detections):
+        return to_records(detections, self.classes)
+
+    def to_dicts(self, detections):
+        return [record.as_dict() for record in self.to_records(detections)]
     
-    def draw_detections(self, frame, detections):
+    def draw_detections(self, frame, detections, scale=None, in_place=False):
 
-        frame_copy = frame.copy()
+        frame_copy = frame if in_place else frame.copy()
         for det in detections:
             x1, y1, x2, y2 = det['box']
+            if scale is not None:
+                scale_x, scale_y = scale
+                x1, x2 = int(x1 * scale_x), int(x2 * scale_x)
+                y1, y2 = int(y1 * scale_y), int(y2 * scale_y)
             
             
             cv2.rectangle(frame_copy, (x1, y1), (x2, y2), (0, 255, 0), 2)
@@ -261,7 +463,5 @@ class RoadSignDetector:
         return frame_copy
 
     def __del__(self):
-        if hasattr(self, 'speech_queue'):
-            self.speech_queue.put(None)
-            if hasattr(self, 'speech_thread'):
-                self.speech_thread.join(timeout=1)
\ No newline at end of file
+        if hasattr(self, 'speech'):
+            self.speech.stop()
\ No newline at end of file
@@ -0,0 +1,220 @@
+import argparse
+import csv
+import json
+import time
+
+import numpy as np
+
+from dataset import DatasetCache
+from detector import RoadSignDetector
+from utils.motion import DEFAULT_SIGN_REGIONS
+
+IOU_THRESHOLDS = np.linspace(0.5, 0.95, 10)
+
+
+def box_iou(a, b):
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)), dtype=np.float32)
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = (x2 - x1).clip(0) * (y2 - y1).clip(0)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+def match_predictions(pred_boxes, pred_classes, targets):
+    # (num_predictions, 10) true-positive matrix, one column per IoU threshold, matched one-to-one by IoU
+    correct = np.zeros((len(pred_boxes), len(IOU_THRESHOLDS)), dtype=bool)
+    if len(pred_boxes) == 0 or len(targets) == 0:
+        return correct
+
+    iou = box_iou(targets[:, 1:], pred_boxes)
+    iou = iou * (targets[:, :1] == pred_classes[None, :])
+    for i, threshold in enumerate(IOU_THRESHOLDS):
+        target_index, pred_index = np.nonzero(iou >= threshold)
+        if not len(target_index):
+            continue
+        matches = np.stack([target_index, pred_index, iou[target_index, pred_index]], axis=1)
+        matches = matches[matches[:, 2].argsort()[::-1]]
+        matches = matches[np.unique(matches[:, 1], return_index=True)[1]]
+        matches = matches[np.unique(matches[:, 0], return_index=True)[1]]
+        correct[matches[:, 1].astype(int), i] = True
+    return correct
+
+
+def compute_ap(recall, precision):
+    # 101-point interpolated area under the precision envelope, as in COCO and ultralytics
+    mrec = np.concatenate([[0.0], recall, [1.0]])
+    mpre = np.concatenate([[1.0], precision, [0.0]])
+    mpre = np.flip(np.maximum.accumulate(np.flip(mpre)))
+    x = np.linspace(0, 1, 101)
+    y = np.interp(x, mrec, mpre)
+    return float(((y[1:] + y[:-1]) / 2 * np.diff(x)).sum())
+
+
+def ap_per_class(correct, confidence, pred_classes, target_classes, eps=1e-16):
+    order = np.argsort(-confidence)
+    correct, confidence, pred_classes = correct[order], confidence[order], pred_classes[order]
+
+    classes, counts = np.unique(target_classes, return_counts=True)
+    grid = np.linspace(0, 1, 1000)
+    ap = np.zeros((len(classes), correct.shape[1]))
+    p_curve = np.zeros((len(classes), len(grid)))
+    r_curve = np.zeros((len(classes), len(grid)))
+
+    for ci, cls in enumerate(classes):
+        mask = pred_classes == cls
+        if not mask.any():
+            continue
+        tp = correct[mask].cumsum(0)
+        fp = (1 - correct[mask]).cumsum(0)
+        recall = tp / (counts[ci] + eps)
+        precision = tp / (tp + fp)
+
+        # precision/recall as a function of the confidence threshold, at IoU 0.5
+        r_curve[ci] = np.interp(-grid, -confidence[mask], recall[:, 0], left=0)
+        p_curve[ci] = np.interp(-grid, -confidence[mask], precision[:, 0], left=1)
+        for j in range(correct.shape[1]):
+            ap[ci, j] = compute_ap(recall[:, j], precision[:, j])
+
+    f1 = 2 * p_curve * r_curve / (p_curve + r_curve + eps)
+    best = f1.mean(0).argmax()
+    return classes, counts, p_curve[:, best], r_curve[:, best], ap, grid[best]
+
+
+def evaluate(detector, dataset, batch_size=16, conf_threshold=0.001):
+    if not len(dataset):
+        raise ValueError("The dataset split has no images")
+
+    previous_threshold = detector.conf_threshold
+    detector.conf_threshold = conf_threshold
+
+    stats = []
+    images_per_class = {}
+    inference_time = 0.0
+    try:
+        for indices, images in dataset.batches(batch_size):
+            started = time.perf_counter()
+            if detector.tile_size:
+                # tiles are cut per image, so tiled inference runs one image at a time
+                results = [detector.detect_signs(image, as_array=True) for image in images]
+            else:
+                results = detector.detect_batch(images, as_array=True)
+            inference_time += time.perf_counter() - started
+
+            for index, detections in zip(indices, results):
+                targets = dataset.targets(index)
+                boxes = dataset.to_original(detections['box'], index)
+                classes = detections['class_id'].astype(np.int64)
+                stats.append((match_predictions(boxes, classes, targets), detections['confidence'], classes,
+                              targets[:, 0].astype(np.int64)))
+                for cls in np.unique(targets[:, 0].astype(np.int64)).tolist():
+                    images_per_class[cls] = images_per_class.get(cls, 0) + 1
+    finally:
+        detector.conf_threshold = previous_threshold
+
+    correct, confidence, pred_classes, target_classes = (np.concatenate(parts) for parts in zip(*stats))
+    classes, counts, precision, recall, ap, best_conf = ap_per_class(correct, confidence, pred_classes,
+                                                                      target_classes)
+
+    per_class = {
+        int(cls): {
+            'name': detector.classes.name(int(cls)),
+            'images': images_per_class.get(int(cls), 0),
+            'instances': int(count),
+            'precision': float(p),
+            'recall': float(r),
+            'mAP50': float(class_ap[0]),
+            'mAP50-95': float(class_ap.mean()),
+        }
+        for cls, count, p, r, class_ap in zip(classes, counts, precision, recall, ap)
+    }
+    return {
+        'images': len(dataset),
+        'instances': int(counts.sum()),
+        'metrics/precision(B)': float(precision.mean()) if len(precision) else 0.0,
+        'metrics/recall(B)': float(recall.mean()) if len(recall) else 0.0,
+        'metrics/mAP50(B)': float(ap[:, 0].mean()) if len(ap) else 0.0,
+        'metrics/mAP50-95(B)': float(ap.mean()) if len(ap) else 0.0,
+        'best_f1_confidence': float(best_conf),
+        'images_per_s': len(dataset) / inference_time if inference_time else None,
+        'ms_per_image': inference_time * 1000 / len(dataset) if len(dataset) else None,
+        'per_class': per_class,
+    }
+
+
+def training_metrics(results_csv):
+    # last epoch of an ultralytics training run, keyed like evaluate() output
+    with open(results_csv) as f:
+        rows = [{key.strip(): value for key, value in row.items()} for row in csv.DictReader(f)]
+    if not rows:
+        return None
+    return {key: float(value) for key, value in rows[-1].items() if key.startswith('metrics/')}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate RoadSignDetector on a dataset split")
+    parser.add_argument('--data', default='data/data.yaml', help="Dataset yaml")
+    parser.add_argument('--data-root', help="Dataset directory, if data.yaml's path is not valid on this machine")
+    parser.add_argument('--split', default='val')
+    parser.add_argument('--imgsz', type=int, default=640)
+    parser.add_argument('--batch-size', type=int, default=16)
+    parser.add_argument('--conf', type=float, default=0.001, help="Confidence threshold used for mAP")
+    parser.add_argument('--workers', type=int, help="Decoding processes for building the cache")
+    parser.add_argument('--cache-dir', default='cache/dataset', help="Where preprocessed images are memory-mapped")
+    parser.add_argument('--tile-size', type=int,
+                        help="Also run the model on overlapping tiles of this size; needs --imgsz above it")
+    parser.add_argument('--tile-overlap', type=float, default=0.2, help="Fractional overlap between tiles")
+    parser.add_argument('--tile-regions', action='store_true',
+                        help="Only tile the roadside and upper regions where signs usually appear")
+    parser.add_argument('--backend', choices=['ultralytics', 'onnx', 'openvino'], default='ultralytics')
+    parser.add_argument('--model', help="Model path for the selected backend")
+    parser.add_argument('--baseline', default='runs/train/gtsrb_yolov8/results.csv',
+                        help="Training results.csv to compare against")
+    parser.add_argument('--output', help="Write the full results to this JSON file")
+    args = parser.parse_args()
+    if args.tile_size and args.tile_size >= args.imgsz:
+        parser.error("--tile-size only splits images larger than the tile, so pass an --imgsz above it")
+
+    started = time.perf_counter()
+    dataset = DatasetCache(args.data, args.split, args.imgsz, args.cache_dir, args.data_root, args.workers)
+    if not len(dataset):
+        parser.error(f"No images found for split '{args.split}' of {args.data}; check --split and --data-root")
+    dataset.load()
+    print(f"Loaded {len(dataset)} images in {time.perf_counter() - started:.1f}s")
+
+    detector = RoadSignDetector(backend=args.backend, model_path=args.model, speech=False)
+    if args.tile_size:
+        detector.enable_tiling(args.tile_size, args.tile_overlap, DEFAULT_SIGN_REGIONS if args.tile_regions else None)
+    results = evaluate(detector, dataset, args.batch_size, args.conf)
+
+    print(f"{'class':<50} {'images':>7} {'inst':>6} {'P':>6} {'R':>6} {'mAP50':>6} {'mAP50-95':>9}")
+    for cls, row in sorted(results['per_class'].items()):
+        print(f"{row['name']:<50} {row['images']:>7} {row['instances']:>6} {row['precision']:>6.3f} "
+              f"{row['recall']:>6.3f} {row['mAP50']:>6.3f} {row['mAP50-95']:>9.3f}")
+    print(f"{'all':<50} {results['images']:>7} {results['instances']:>6} {results['metrics/precision(B)']:>6.3f} "
+          f"{results['metrics/recall(B)']:>6.3f} {results['metrics/mAP50(B)']:>6.3f} "
+          f"{results['metrics/mAP50-95(B)']:>9.3f}")
+    if results['images_per_s'] is not None:
+        print(f"Throughput: {results['images_per_s']:.1f} images/s ({results['ms_per_image']:.1f} ms/image)")
+
+    try:
+        baseline = training_metrics(args.baseline)
+    except OSError:
+        baseline = None
+    if baseline:
+        print(f"\n{'metric':<24} {'training':>9} {'this run':>9}")
+        for key, value in baseline.items():
+            print(f"{key:<24} {value:>9.4f} {results.get(key, float('nan')):>9.4f}")
+        results['baseline'] = baseline
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
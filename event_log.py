@@ -0,0 +1,271 @@
+import argparse
+import glob
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from records import load_class_table, to_array
+
+LOG_DTYPE = np.dtype([
+    ('timestamp', np.float64),
+    ('frame_id', np.uint32),
+    ('box', np.int16, (4,)),
+    ('confidence', np.float32),
+    ('class_id', np.uint8),
+])
+
+
+class SqliteSegment:
+    extension = '.db'
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS detections (timestamp REAL, frame_id INTEGER, class_id INTEGER, "
+            "confidence REAL, x1 INTEGER, y1 INTEGER, x2 INTEGER, y2 INTEGER)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS detections_time ON detections (timestamp)")
+        self.connection.commit()
+
+    def write(self, batch):
+        rows = zip(batch['timestamp'].tolist(), batch['frame_id'].tolist(), batch['class_id'].tolist(),
+                   batch['confidence'].tolist(), *batch['box'].T.tolist())
+        with self.connection:
+            self.connection.executemany("INSERT INTO detections VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def size(self):
+        return sum(os.path.getsize(path) for path in (self.path, self.path + '-wal') if os.path.exists(path))
+
+    def close(self):
+        self.connection.close()
+
+    @staticmethod
+    def counts(path, start, end, bucket):
+        # WAL lets this read while the writer thread keeps appending
+        connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            rows = connection.execute(
+                "SELECT CAST(timestamp / ? AS INTEGER), class_id, COUNT(*) FROM detections "
+                "WHERE timestamp >= ? AND timestamp < ? GROUP BY 1, 2", (bucket, start, end)).fetchall()
+        finally:
+            connection.close()
+        return [(index * bucket, class_id, count) for index, class_id, count in rows]
+
+
+class ColumnarSegment:
+    # one append-only file per column; reads memory-map only the columns a query needs
+    extension = '.cols'
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.files = {name: open(os.path.join(path, f"{name}.bin"), 'ab') for name in LOG_DTYPE.names}
+
+    def write(self, batch):
+        for name, f in self.files.items():
+            f.write(np.ascontiguousarray(batch[name]).tobytes())
+            f.flush()
+
+    def size(self):
+        return sum(f.tell() for f in self.files.values())
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+
+    @staticmethod
+    def column(path, name):
+        file_path = os.path.join(path, f"{name}.bin")
+        dtype, shape = LOG_DTYPE.fields[name][0].base, LOG_DTYPE.fields[name][0].shape
+        if not os.path.exists(file_path) or os.path.getsize(file_path) == 0:
+            return np.empty((0,) + shape, dtype=dtype)
+        column = np.memmap(file_path, dtype=dtype, mode='r')
+        return column.reshape((-1,) + shape) if shape else column
+
+    @staticmethod
+    def counts(path, start, end, bucket):
+        timestamps = ColumnarSegment.column(path, 'timestamp')
+        class_ids = ColumnarSegment.column(path, 'class_id')
+        # a crash can leave the last batch partially written in some columns
+        length = min(len(timestamps), len(class_ids))
+        timestamps, class_ids = timestamps[:length], class_ids[:length]
+
+        mask = (timestamps >= start) & (timestamps < end)
+        if not mask.any():
+            return []
+        buckets = (timestamps[mask] // bucket).astype(np.int64)
+        pairs, counts = np.unique(np.stack([buckets, class_ids[mask].astype(np.int64)], axis=1), axis=0,
+                                  return_counts=True)
+        return [(int(index) * bucket, int(class_id), int(count)) for (index, class_id), count in zip(pairs, counts)]
+
+
+SEGMENTS = {
+    'sqlite': SqliteSegment,
+    'columnar': ColumnarSegment,
+}
+
+
+class DetectionLog:
+    def __init__(self, directory, format='sqlite', batch_size=512, flush_interval=1.0, max_pending=20000,
+                 rotate_bytes=64 << 20, rotate_seconds=24 * 3600):
+        if format not in SEGMENTS:
+            raise ValueError(f"Unknown event log format '{format}'. Choose from: {', '.join(SEGMENTS)}")
+
+        self.directory = directory
+        self.segment_class = SEGMENTS[format]
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.rotate_bytes = rotate_bytes
+        self.rotate_seconds = rotate_seconds
+
+        self.pending = []
+        self.pending_count = 0
+        self.condition = threading.Condition()
+        self.segment = None
+        self.segment_started = None
+        self.running = False
+        self.thread = None
+        self.stats = {'submitted': 0, 'written': 0, 'dropped': 0, 'flushes': 0, 'rotations': 0, 'errors': 0}
+
+        os.makedirs(directory, exist_ok=True)
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._worker, name="event-log", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        if self.thread is not None:
+            self.thread.join(timeout=5)
+            self.thread = None
+
+    def submit(self, detections, frame_id=0, timestamp=None):
+        # called from the inference thread: never blocks on I/O, drops the frame's records when the writer is behind
+        count = len(detections)
+        if not count:
+            return True
+        with self.condition:
+            if self.pending_count + count > self.max_pending:
+                self.stats['dropped'] += count
+                return False
+            self.pending.append((timestamp if timestamp is not None else time.time(), frame_id, detections))
+            self.pending_count += count
+            self.stats['submitted'] += count
+            if self.pending_count >= self.batch_size:
+                self.condition.notify()
+        return True
+
+    def _take(self):
+        with self.condition:
+            if self.running and self.pending_count < self.batch_size:
+                self.condition.wait(self.flush_interval)
+            pending, self.pending, self.pending_count = self.pending, [], 0
+            return pending
+
+    def _batch(self, pending):
+        parts = []
+        for timestamp, frame_id, detections in pending:
+            array = detections if isinstance(detections, np.ndarray) else to_array(detections, frame_id)
+            part = np.empty(len(array), dtype=LOG_DTYPE)
+            part['timestamp'] = timestamp
+            for name in ('frame_id', 'box', 'confidence', 'class_id'):
+                part[name] = array[name]
+            parts.append(part)
+        return np.concatenate(parts)
+
+    def _segment(self):
+        now = time.time()
+        if self.segment is not None and (self.segment.size() >= self.rotate_bytes
+                                         or now - self.segment_started >= self.rotate_seconds):
+            self.segment.close()
+            self.segment = None
+            self.stats['rotations'] += 1
+
+        if self.segment is None:
+            name = datetime.fromtimestamp(now).strftime('detections-%Y%m%d-%H%M%S')
+            path = os.path.join(self.directory, name + self.segment_class.extension)
+            suffix = 1
+            while os.path.exists(path):
+                path = os.path.join(self.directory, f"{name}-{suffix}{self.segment_class.extension}")
+                suffix += 1
+            self.segment = self.segment_class(path)
+            self.segment_started = now
+        return self.segment
+
+    def _worker(self):
+        while True:
+            pending = self._take()
+            if pending:
+                try:
+                    batch = self._batch(pending)
+                    self._segment().write(batch)
+                    self.stats['written'] += len(batch)
+                    self.stats['flushes'] += 1
+                except Exception as e:
+                    self.stats['errors'] += 1
+                    print(f"Event log write error: {e}")
+            elif not self.running:
+                break
+
+        if self.segment is not None:
+            self.segment.close()
+            self.segment = None
+
+    def counts(self, start=None, end=None, bucket=3600):
+        return query_counts(self.directory, start, end, bucket)
+
+
+def query_counts(directory, start=None, end=None, bucket=3600):
+    # {(bucket_start, class_id): count} over every segment in the directory, for [start, end) in epoch seconds
+    start = 0.0 if start is None else start
+    end = float('inf') if end is None else end
+
+    totals = {}
+    for segment_class in SEGMENTS.values():
+        for path in sorted(glob.glob(os.path.join(directory, '*' + segment_class.extension))):
+            try:
+                rows = segment_class.counts(path, start, end, bucket)
+            except (sqlite3.Error, OSError, ValueError) as e:
+                print(f"Skipping unreadable event log segment {path}: {e}")
+                continue
+            for bucket_start, class_id, count in rows:
+                totals[(bucket_start, class_id)] = totals.get((bucket_start, class_id), 0) + count
+    return totals
+
+
+def class_counts(directory, start=None, end=None):
+    totals = {}
+    # one bucket wider than any real window
+    for (_, class_id), count in query_counts(directory, start, end, bucket=1e12).items():
+        totals[class_id] = totals.get(class_id, 0) + count
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarise logged detections per sign class over time")
+    parser.add_argument('directory', help="Event log directory written by app.py --event-log")
+    parser.add_argument('--since', type=float, default=24 * 3600, help="Look back this many seconds")
+    parser.add_argument('--bucket', type=float, default=3600, help="Bucket width in seconds")
+    args = parser.parse_args()
+
+    classes = load_class_table()
+    end = time.time()
+    counts = query_counts(args.directory, end - args.since, end, args.bucket)
+    for (bucket_start, class_id), count in sorted(counts.items()):
+        stamp = datetime.fromtimestamp(bucket_start).strftime('%Y-%m-%d %H:%M')
+        print(f"{stamp}  {classes.name(class_id):<50} {count}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import argparse
+import glob
+import os
+import random
+
+import cv2
+
+from utils.preprocessing import letterbox, to_input_tensor
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+def find_images(directory):
+    paths = []
+    for extension in IMAGE_EXTENSIONS:
+        paths.extend(glob.glob(os.path.join(directory, '**', f'*{extension}'), recursive=True))
+    return sorted(paths)
+
+
+class LetterboxCalibrationReader:
+    def __init__(self, input_name, image_paths, imgsz=640):
+        self.input_name = input_name
+        self.image_paths = iter(image_paths)
+        self.imgsz = imgsz
+
+    def get_next(self):
+        for path in self.image_paths:
+            image = cv2.imread(path)
+            if image is None:
+                continue
+            letterboxed, _, _ = letterbox(image, (self.imgsz, self.imgsz))
+            return {self.input_name: to_input_tensor([letterboxed])}
+        return None
+
+
+def export_onnx(weights, imgsz=640, dynamic=False, opset=None):
+    from ultralytics import YOLO
+
+    kwargs = {'format': 'onnx', 'imgsz': imgsz, 'dynamic': dynamic, 'simplify': True}
+    if opset:
+        kwargs['opset'] = opset
+
+    return YOLO(weights).export(**kwargs)
+
+
+def export_openvino(weights, imgsz=640, int8=False, data=None):
+    from ultralytics import YOLO
+
+    kwargs = {'format': 'openvino', 'imgsz': imgsz, 'int8': int8}
+    if int8 and data:
+        kwargs['data'] = data
+
+    return YOLO(weights).export(**kwargs)
+
+
+def quantize_onnx(model_path, calibration_dir, output_path=None, samples=200, imgsz=640, seed=0):
+    import onnxruntime as ort
+    from onnxruntime.quantization import QuantFormat, QuantType, quantize_static
+
+    image_paths = find_images(calibration_dir)
+    if not image_paths:
+        raise ValueError(f"No calibration images found in {calibration_dir}")
+
+    random.Random(seed).shuffle(image_paths)
+    image_paths = image_paths[:samples]
+
+    input_name = ort.InferenceSession(model_path, providers=['CPUExecutionProvider']).get_inputs()[0].name
+    reader = LetterboxCalibrationReader(input_name, image_paths, imgsz)
+
+    if output_path is None:
+        root, extension = os.path.splitext(model_path)
+        output_path = f"{root}_int8{extension}"
+
+    quantize_static(
+        model_path,
+        output_path,
+        reader,
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=True
+    )
+
+    return output_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the road sign model for lightweight CPU inference")
+    parser.add_argument('--weights', default='models/best.pt', help="PyTorch weights to export")
+    parser.add_argument('--format', choices=['onnx', 'openvino'], default='onnx')
+    parser.add_argument('--imgsz', type=int, default=640)
+    parser.add_argument('--dynamic', action='store_true', help="Export with a dynamic batch dimension")
+    parser.add_argument('--int8', action='store_true', help="Quantize to INT8 using calibration images")
+    parser.add_argument('--calibration-dir', help="Directory of sample images used for INT8 calibration")
+    parser.add_argument('--calibration-samples', type=int, default=200)
+    parser.add_argument('--data', default='data/data.yaml', help="Dataset yaml used for OpenVINO INT8 calibration")
+    args = parser.parse_args()
+
+    if args.format == 'openvino':
+        output = export_openvino(args.weights, args.imgsz, args.int8, args.data)
+        print(f"Exported OpenVINO model to {output}")
+        return
+
+    output = export_onnx(args.weights, args.imgsz, args.dynamic)
+    print(f"Exported ONNX model to {output}")
+
+    if args.int8:
+        if not args.calibration_dir:
+            parser.error("--int8 requires --calibration-dir for ONNX export")
+        quantized = quantize_onnx(output, args.calibration_dir, samples=args.calibration_samples, imgsz=args.imgsz)
+        print(f"Wrote INT8 model to {quantized}")
+
+
+if __name__ == "__main__":
+    main()
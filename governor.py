@@ -0,0 +1,159 @@
+import json
+import threading
+import time
+
+DEFAULT_SIZES = (640, 512, 416, 320)
+
+
+class ResolutionGovernor:
+    def __init__(self, detector, target_fps=15.0, sizes=DEFAULT_SIZES, models=None, smoothing=0.2,
+                 downgrade_at=1.0, upgrade_at=0.6, patience=10, cooldown=3.0, log_path=None):
+        self.detector = detector
+        self.target_fps = target_fps
+        self.budget = 1.0 / target_fps
+        self.sizes = sorted(set(sizes), reverse=True)
+        # heaviest first; every model is tried at every size before falling back to the next one.
+        # None stands for the detector's own model until it has been loaded
+        self.models = list(models) if models else [None]
+        self.levels = [(model, size) for model in self.models for size in self.sizes]
+
+        # hysteresis: downgrade once the smoothed latency exceeds downgrade_at * budget, upgrade only when the
+        # next heavier level is predicted to stay under upgrade_at * budget, and never change twice within
+        # cooldown seconds or before patience consecutive samples agree
+        self.smoothing = smoothing
+        self.downgrade_at = downgrade_at
+        self.upgrade_at = upgrade_at
+        self.patience = patience
+        self.cooldown = cooldown
+        self.log_path = log_path
+
+        self.level = 0
+        self.latency = None
+        self.over = 0
+        self.under = 0
+        self.last_change = float('-inf')
+        self.switching = False
+        self.lock = threading.Lock()
+        self.decisions = []
+        self.stats = {'samples': 0, 'downgrades': 0, 'upgrades': 0, 'model_switches': 0, 'switch_failures': 0}
+
+    @property
+    def model_path(self):
+        return self.levels[self.level][0]
+
+    @property
+    def imgsz(self):
+        return self.levels[self.level][1]
+
+    def start(self):
+        self.models = [self.detector.model_path if model is None else model for model in self.models]
+        self.levels = [(model, size) for model in self.models for size in self.sizes]
+        if self.detector.model_path in self.models:
+            self.level = self.models.index(self.detector.model_path) * len(self.sizes)
+        self._apply(self.level, reason='initial', latency=None)
+
+    def observe(self, latency):
+        with self.lock:
+            self.stats['samples'] += 1
+            if self.latency is None:
+                self.latency = latency
+            else:
+                self.latency += self.smoothing * (latency - self.latency)
+
+            if self.switching or time.monotonic() - self.last_change < self.cooldown:
+                return
+
+            if self.latency > self.budget * self.downgrade_at:
+                self.over += 1
+                self.under = 0
+            elif self.level > 0 and self._predicted(self.level - 1) < self.budget * self.upgrade_at:
+                self.under += 1
+                self.over = 0
+            else:
+                self.over = self.under = 0
+
+            if self.over >= self.patience and self.level < len(self.levels) - 1:
+                self._change(self.level + 1, 'downgrade')
+            elif self.under >= self.patience:
+                self._change(self.level - 1, 'upgrade')
+
+    def _predicted(self, level):
+        # inference cost scales roughly with the number of input pixels; a model switch is a guess, so
+        # require the same margin as for the largest size step
+        model, size = self.levels[level]
+        if model != self.model_path:
+            return self.latency * (self.sizes[0] / self.sizes[-1]) ** 2
+        return self.latency * (size / self.imgsz) ** 2
+
+    def _change(self, level, reason):
+        self.over = self.under = 0
+        self.stats[f'{reason}s'] += 1
+        self._apply(level, reason, self.latency)
+        # start measuring the new level from scratch
+        self.latency = None
+
+    def _apply(self, level, reason, latency):
+        previous = self.levels[self.level]
+        model, size = self.levels[level]
+        self.level = level
+        self.last_change = time.monotonic()
+
+        if model != self.detector.model_path:
+            self.switching = True
+            threading.Thread(target=self._switch_model, args=(model, size), name="governor-switch",
+                             daemon=True).start()
+        elif not self.detector.set_imgsz(size):
+            # static-shape exports cannot be resized; pin the ladder to what the backend accepts
+            self.sizes = [self.detector.backend.imgsz]
+            self.levels = [(m, self.sizes[0]) for m in self.models]
+            self.level = self.models.index(model)
+
+        self._log(reason, previous, self.levels[self.level], latency)
+
+    def _switch_model(self, model, size):
+        try:
+            self.detector.switch_model(model, imgsz=size)
+            self.stats['model_switches'] += 1
+        except Exception as e:
+            self.stats['switch_failures'] += 1
+            print(f"Unable to switch to {model}: {e}")
+            with self.lock:
+                self.levels = [level for level in self.levels if level[0] != model]
+                self.models.remove(model)
+                current = (self.detector.model_path, self.detector.backend.imgsz)
+                self.level = self.levels.index(current) if current in self.levels else 0
+        finally:
+            with self.lock:
+                self.switching = False
+                self.last_change = time.monotonic()
+
+    def _log(self, reason, previous, current, latency):
+        decision = {
+            'time': time.time(),
+            'reason': reason,
+            'from': {'model': previous[0], 'imgsz': previous[1]},
+            'to': {'model': current[0], 'imgsz': current[1]},
+            'latency_ms': latency * 1000 if latency is not None else None,
+            'budget_ms': self.budget * 1000,
+        }
+        self.decisions.append(decision)
+
+        latency_text = f"{decision['latency_ms']:.1f}ms" if latency is not None else "n/a"
+        print(f"Governor {reason}: {previous[0]}@{previous[1]} -> {current[0]}@{current[1]} "
+              f"(latency {latency_text}, budget {decision['budget_ms']:.1f}ms)")
+
+        if self.log_path:
+            try:
+                with open(self.log_path, 'a') as f:
+                    f.write(json.dumps(decision) + '\n')
+            except OSError as e:
+                print(f"Unable to write governor log: {e}")
+
+    def report(self):
+        return {
+            **self.stats,
+            'model': self.model_path,
+            'imgsz': self.imgsz,
+            'latency_ms': self.latency * 1000 if self.latency is not None else None,
+            'budget_ms': self.budget * 1000,
+        }
@@ -0,0 +1,316 @@
+import math
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+from detector import RoadSignDetector
+from records import DETECTION_DTYPE
+
+DEFAULT_MAX_FRAME_SHAPE = (1080, 1920, 3)
+
+
+class SharedFrameRing:
+    def __init__(self, slots, max_shape, name=None):
+        self.slots = slots
+        self.max_shape = tuple(max_shape)
+        self.slot_size = int(np.prod(self.max_shape))
+        self.owner = name is None
+
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=slots * self.slot_size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.array = np.ndarray((slots, self.slot_size), dtype=np.uint8, buffer=self.shm.buf)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def write(self, slot, frame):
+        if frame.dtype != np.uint8 or frame.size > self.slot_size:
+            raise ValueError(f"Frame {frame.shape} {frame.dtype} does not fit slots of {self.max_shape} uint8")
+        self.array[slot, :frame.size] = frame.reshape(-1)
+        return frame.shape
+
+    def view(self, slot, shape):
+        return self.array[slot, :int(np.prod(shape))].reshape(shape)
+
+    def close(self):
+        self.array = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def _worker_main(conn, ring_name, slots, max_shape, backend, model_path, conf_threshold, input_order='bgr'):
+    ring = SharedFrameRing(slots, max_shape, name=ring_name)
+    try:
+        detector = RoadSignDetector(backend=backend, model_path=model_path, lazy=True, speech=False,
+                                    input_order=input_order)
+        detector.conf_threshold = conf_threshold
+        detector.load()
+        conn.send(('ready', os.getpid(), detector.timings))
+
+        while True:
+            message = conn.recv()
+            if message is None:
+                break
+            if message[0] == 'ping':
+                conn.send(('pong', message[1]))
+                continue
+
+            _, request_id, slot, shape, regions = message
+            frame = ring.view(slot, shape)
+            try:
+                if regions:
+                    detections = detector.detect_regions(frame, regions, as_array=True)
+                else:
+                    detections = detector.detect_signs(frame, as_array=True)
+                conn.send(('result', request_id, detections, detector.backend.last_speed))
+            except Exception as e:
+                conn.send(('error', request_id, repr(e)))
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        ring.close()
+
+
+class WorkerHandle:
+    def __init__(self, index):
+        self.index = index
+        self.process = None
+        self.conn = None
+        self.lock = threading.Lock()
+        self.pid = None
+
+
+class ProcessDetector:
+    def __init__(self, detector, workers=1, slots=None, max_frame_shape=DEFAULT_MAX_FRAME_SHAPE,
+                 backend='ultralytics', model_path=None, timeout=10.0, startup_timeout=120.0, health_interval=2.0):
+        self.detector = detector
+        self.workers = [WorkerHandle(i) for i in range(workers)]
+        self.slots = slots or workers + 1
+        # stream sources may not know their size up front and report 0x0
+        self.max_frame_shape = tuple(max_frame_shape) if min(max_frame_shape) > 0 else DEFAULT_MAX_FRAME_SHAPE
+        self.backend_name = backend
+        self.model_path = model_path
+        self.timeout = timeout
+        self.startup_timeout = startup_timeout
+        self.health_interval = health_interval
+
+        self.context = mp.get_context('spawn')
+        self.ring = None
+        self.free_slots = queue.Queue()
+        self.idle = queue.Queue()
+        self.request_ids = iter(range(1, 1 << 62))
+
+        self.ready = threading.Event()
+        self.load_lock = threading.Lock()
+        self.running = False
+        self.health_thread = None
+        self.executor = None
+        self.timings = {}
+        self.stats = {'requests': 0, 'errors': 0, 'timeouts': 0, 'restarts': 0, 'unavailable': 0, 'resized': 0}
+        self.worker_main = _worker_main
+
+    def load(self):
+        with self.load_lock:
+            if self.ready.is_set():
+                return
+
+            started = time.perf_counter()
+            self.ring = SharedFrameRing(self.slots, self.max_frame_shape)
+            for slot in range(self.slots):
+                self.free_slots.put(slot)
+
+            self.running = True
+            for worker in self.workers:
+                self._spawn(worker)
+            for worker in self.workers:
+                self._wait_ready(worker)
+                self.idle.put(worker.index)
+            self.timings['worker_start'] = time.perf_counter() - started
+
+            self.health_thread = threading.Thread(target=self._health_worker, name="inference-health", daemon=True)
+            self.health_thread.start()
+            self.ready.set()
+
+    def _spawn(self, worker):
+        parent_conn, child_conn = self.context.Pipe()
+        worker.conn = parent_conn
+        worker.process = self.context.Process(
+            target=self.worker_main,
+            args=(child_conn, self.ring.name, self.slots, self.max_frame_shape,
+                  self.backend_name, self.model_path, self.detector.conf_threshold, self.detector.input_order),
+            name=f"inference-{worker.index}",
+            daemon=True
+        )
+        worker.process.start()
+        child_conn.close()
+
+    def _wait_ready(self, worker):
+        if not worker.conn.poll(self.startup_timeout):
+            raise TimeoutError(f"Inference worker {worker.index} did not start in time")
+        kind, pid, timings = worker.conn.recv()
+        worker.pid = pid
+        for name, value in timings.items():
+            self.timings[f"worker{worker.index}_{name}"] = value
+
+    def _restart(self, worker):
+        self.stats['restarts'] += 1
+        try:
+            worker.conn.close()
+        except OSError:
+            pass
+        if worker.process.is_alive():
+            worker.process.kill()
+        worker.process.join(timeout=1)
+
+        if not self.running:
+            return False
+        try:
+            self._spawn(worker)
+            self._wait_ready(worker)
+            return True
+        except Exception as e:
+            print(f"Unable to restart inference worker {worker.index}: {e}")
+            return False
+
+    def _health_worker(self):
+        while self.running:
+            time.sleep(self.health_interval)
+            for worker in self.workers:
+                if not worker.lock.acquire(blocking=False):
+                    continue
+                try:
+                    if not self.running:
+                        break
+                    healthy = worker.process.is_alive()
+                    if healthy:
+                        try:
+                            worker.conn.send(('ping', time.monotonic()))
+                            healthy = worker.conn.poll(self.timeout) and worker.conn.recv()[0] == 'pong'
+                        except (EOFError, OSError):
+                            healthy = False
+                    if not healthy:
+                        print(f"Inference worker {worker.index} is unresponsive, restarting")
+                        self._restart(worker)
+                finally:
+                    worker.lock.release()
+
+    def _fit(self, frame, regions):
+        # the ring is sized from what the source reported, which can be stale; larger frames are shrunk to fit
+        # a slot and their boxes scaled back afterwards, rather than failing inside the inference thread
+        if frame.size <= self.ring.slot_size:
+            return frame, regions, None
+        height, width = frame.shape[:2]
+        shrink = math.sqrt(self.ring.slot_size / frame.size)
+        size = (max(1, int(width * shrink)), max(1, int(height * shrink)))
+        scale = np.array([size[0] / width, size[1] / height] * 2, dtype=np.float32)
+        if regions:
+            regions = [tuple(int(v) for v in np.array(region) * scale) for region in regions]
+        self.stats['resized'] += 1
+        return cv2.resize(frame, size, interpolation=cv2.INTER_AREA), regions, scale
+
+    def detect_signs(self, frame, as_array=False, regions=None, frame_id=0):
+        if not self.ready.is_set():
+            self.load()
+
+        detections = np.empty(0, dtype=DETECTION_DTYPE)
+        if frame.dtype != np.uint8:
+            self.stats['errors'] += 1
+            print(f"Inference workers only take uint8 frames, skipping a {frame.dtype} frame")
+            return detections if as_array else []
+        frame, regions, scale = self._fit(frame, regions)
+
+        try:
+            index = self.idle.get(timeout=self.timeout)
+        except queue.Empty:
+            self.stats['unavailable'] += 1
+            return detections if as_array else []
+
+        worker = self.workers[index]
+        slot = self.free_slots.get()
+        try:
+            with worker.lock:
+                request_id = next(self.request_ids)
+                shape = self.ring.write(slot, frame)
+                self.stats['requests'] += 1
+                try:
+                    worker.conn.send(('detect', request_id, slot, shape, regions))
+                    while True:
+                        if not worker.conn.poll(self.timeout):
+                            self.stats['timeouts'] += 1
+                            raise TimeoutError(f"Inference worker {index} timed out")
+                        reply = worker.conn.recv()
+                        # skip late replies to an earlier health check
+                        if reply[0] != 'pong':
+                            break
+                    if reply[0] == 'result' and reply[1] == request_id:
+                        detections = reply[2]
+                        detections['frame_id'] = frame_id
+                        if scale is not None:
+                            detections['box'] = np.round(detections['box'] / scale)
+                        self.detector.record_speed(reply[3])
+                    else:
+                        self.stats['errors'] += 1
+                        print(f"Inference worker {index} error: {reply[2] if reply[0] == 'error' else reply}")
+                except (EOFError, OSError, TimeoutError):
+                    self.stats['errors'] += 1
+                    self._restart(worker)
+        finally:
+            self.free_slots.put(slot)
+            self.idle.put(index)
+
+        if as_array:
+            return detections
+        return self.detector.to_records(detections)
+
+    def detect_regions(self, frame, regions, as_array=False, frame_id=0):
+        return self.detect_signs(frame, as_array=as_array, regions=regions, frame_id=frame_id)
+
+    def detect_batch(self, frames, as_array=False, frame_ids=None):
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=len(self.workers), thread_name_prefix="inference-client")
+        frame_ids = frame_ids if frame_ids is not None else [0] * len(frames)
+        return list(self.executor.map(
+            lambda frame, frame_id: self.detect_signs(frame, as_array=as_array, frame_id=frame_id), frames, frame_ids))
+
+    def merge_detections(self, detections):
+        return self.detector.merge_detections(detections)
+
+    def draw_detections(self, frame, detections, scale=None, in_place=False):
+        return self.detector.draw_detections(frame, detections, scale=scale, in_place=in_place)
+
+    def to_records(self, detections):
+        return self.detector.to_records(detections)
+
+    def to_dicts(self, detections):
+        return self.detector.to_dicts(detections)
+
+    def close(self):
+        self.running = False
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+        for worker in self.workers:
+            if worker.process is None:
+                continue
+            with worker.lock:
+                try:
+                    worker.conn.send(None)
+                except (OSError, ValueError):
+                    pass
+                worker.process.join(timeout=2)
+                if worker.process.is_alive():
+                    worker.process.kill()
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
+        self.ready.clear()
@@ -0,0 +1,223 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+STAGES = ('capture', 'preprocess', 'inference', 'postprocess', 'draw', 'convert', 'blit', 'glass_to_det')
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class RollingHistogram:
+    def __init__(self, window=512):
+        # deque.append is atomic under the GIL, so recording a sample takes no lock
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+    def snapshot(self):
+        samples = np.array(self.samples, dtype=np.float64)
+        summary = {'count': self.count, 'sum': self.total}
+        if samples.size:
+            summary['mean'] = float(samples.mean())
+            summary['quantiles'] = dict(zip(QUANTILES, np.quantile(samples, QUANTILES).tolist()))
+        return summary
+
+
+class RateMeter:
+    def __init__(self, window=60):
+        self.stamps = deque(maxlen=window)
+
+    def tick(self):
+        self.stamps.append(time.perf_counter())
+
+    def rate(self):
+        stamps = list(self.stamps)
+        if len(stamps) < 2 or stamps[-1] == stamps[0]:
+            return 0.0
+        return (len(stamps) - 1) / (stamps[-1] - stamps[0])
+
+
+class Metrics:
+    def __init__(self, window=512):
+        self.window = window
+        self.enabled = True
+        self.histograms = {stage: RollingHistogram(window) for stage in STAGES}
+        self.rates = {}
+        self.gauges = {}
+        self.lock = threading.Lock()
+
+    def observe(self, stage, seconds):
+        if not self.enabled:
+            return
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            with self.lock:
+                histogram = self.histograms.setdefault(stage, RollingHistogram(self.window))
+        histogram.add(seconds)
+
+    def span(self, stage):
+        return Span(self, stage)
+
+    def tick(self, name):
+        meter = self.rates.get(name)
+        if meter is None:
+            with self.lock:
+                meter = self.rates.setdefault(name, RateMeter())
+        meter.tick()
+
+    def gauge(self, name, fn):
+        self.gauges[name] = fn
+
+    def snapshot(self):
+        gauges = {}
+        for name, fn in list(self.gauges.items()):
+            try:
+                gauges[name] = fn()
+            except Exception as e:
+                gauges[name] = None
+                print(f"Metrics gauge '{name}' failed: {e}")
+
+        return {
+            'time': time.time(),
+            'stages': {stage: histogram.snapshot() for stage, histogram in list(self.histograms.items())},
+            'rates': {name: meter.rate() for name, meter in list(self.rates.items())},
+            'gauges': gauges,
+        }
+
+    def overlay_text(self):
+        snapshot = self.snapshot()
+        lines = [f"FPS {snapshot['rates'].get('rendered', 0.0):5.1f}  "
+                 f"inference {snapshot['rates'].get('inferred', 0.0):5.1f}/s"]
+        for stage in STAGES:
+            summary = snapshot['stages'].get(stage)
+            if summary and 'quantiles' in summary:
+                lines.append(f"{stage:<12}{summary['mean'] * 1000:6.1f} ms  p95 {summary['quantiles'][0.95] * 1000:6.1f}")
+        for name, value in snapshot['gauges'].items():
+            lines.append(f"{name:<12}{value}")
+        return "\n".join(lines)
+
+    def prometheus_text(self, prefix='aqroad'):
+        snapshot = self.snapshot()
+        lines = [f"# TYPE {prefix}_stage_seconds summary"]
+        for stage, summary in snapshot['stages'].items():
+            for quantile, value in summary.get('quantiles', {}).items():
+                lines.append(f'{prefix}_stage_seconds{{stage="{stage}",quantile="{quantile}"}} {value:.6f}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {summary["sum"]:.6f}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {summary["count"]}')
+
+        lines.append(f"# TYPE {prefix}_rate_per_second gauge")
+        for name, value in snapshot['rates'].items():
+            lines.append(f'{prefix}_rate_per_second{{name="{name}"}} {value:.3f}')
+
+        for name, value in snapshot['gauges'].items():
+            if isinstance(value, (int, float)):
+                lines.append(f"# TYPE {prefix}_{name} gauge")
+                lines.append(f"{prefix}_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+class Span:
+    __slots__ = ('metrics', 'stage', 'started')
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.stage, time.perf_counter() - self.started)
+        return False
+
+
+# process-wide registry shared by the detector, pipeline and UI
+METRICS = Metrics()
+
+
+class MetricsServer:
+    def __init__(self, metrics=METRICS, host='127.0.0.1', port=9108):
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self.server = None
+        self.thread = None
+
+    def start(self):
+        metrics = self.metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == '/metrics':
+                    body, content_type = metrics.prometheus_text(), 'text/plain; version=0.0.4'
+                elif self.path == '/metrics.json':
+                    body, content_type = json.dumps(metrics.snapshot()), 'application/json'
+                else:
+                    self.send_error(404)
+                    return
+                data = body.encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        try:
+            self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+        except OSError as e:
+            print(f"Unable to start metrics endpoint on {self.host}:{self.port}: {e}")
+            return False
+        self.thread = threading.Thread(target=self.server.serve_forever, name="metrics-http", daemon=True)
+        self.thread.start()
+        return True
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+class MetricsDumper:
+    def __init__(self, path, metrics=METRICS, interval=10.0):
+        self.path = path
+        self.metrics = metrics
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._worker, name="metrics-dump", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join(timeout=1)
+        self.dump()
+
+    def dump(self):
+        partial_path = self.path + '.partial'
+        try:
+            with open(partial_path, 'w') as f:
+                json.dump(self.metrics.snapshot(), f, indent=2)
+            os.replace(partial_path, self.path)
+        except OSError as e:
+            print(f"Unable to write metrics to {self.path}: {e}")
+
+    def _worker(self):
+        while not self.stopped.wait(self.interval):
+            self.dump()
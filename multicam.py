@@ -0,0 +1,160 @@
+import argparse
+import threading
+import time
+
+import cv2
+
+from detector import RoadSignDetector
+from pipeline import LatestQueue
+
+
+class CameraSource:
+    def __init__(self, source_id, cap):
+        self.source_id = source_id
+        self.cap = cap
+        self.latest = LatestQueue(1)
+        self.output = LatestQueue(1)
+        self.running = False
+        self.thread = None
+        self.frame_id = 0
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._capture_worker, name=f"camera-{self.source_id}", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self.latest.close()
+        self.output.close()
+        if self.thread is not None:
+            self.thread.join(timeout=1)
+        self.cap.release()
+
+    def _capture_worker(self):
+        while self.running:
+            ret, frame = self.cap.read()
+            if not ret:
+                time.sleep(0.01)
+                continue
+            self.frame_id += 1
+            self.latest.put((self.frame_id, frame))
+
+
+class MultiCameraDetector:
+    def __init__(self, sources, detector=None, latency_budget=0.25, min_batch_size=1, max_batch_size=None):
+        self.detector = detector if detector is not None else RoadSignDetector(speech=False)
+        self.sources = [source if isinstance(source, CameraSource) else CameraSource(i, source)
+                        for i, source in enumerate(sources)]
+
+        self.latency_budget = latency_budget
+        self.min_batch_size = min_batch_size
+        self.max_batch_size = max_batch_size or len(self.sources)
+        self.batch_size = self.max_batch_size
+
+        self.running = False
+        self.thread = None
+        self.next_source = 0
+        self.stats = {'ticks': 0, 'batches': 0, 'frames': 0, 'last_batch_latency': 0.0}
+
+    def start(self):
+        for source in self.sources:
+            source.start()
+        self.running = True
+        self.thread = threading.Thread(target=self._inference_worker, name="multicam-inference", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout=2)
+        for source in self.sources:
+            source.stop()
+
+    def get_detections(self, source_id):
+        return self.sources[source_id].output.get_nowait()
+
+    def tick(self):
+        pending = []
+        count = len(self.sources)
+        for offset in range(count):
+            source = self.sources[(self.next_source + offset) % count]
+            item = source.latest.get_nowait()
+            if item is not None:
+                pending.append((source, item))
+        self.next_source = (self.next_source + 1) % max(count, 1)
+        self.stats['ticks'] += 1
+
+        for start in range(0, len(pending), self.batch_size):
+            batch = pending[start:start + self.batch_size]
+            frames = [frame for _, (_, frame) in batch]
+            frame_ids = [frame_id for _, (frame_id, _) in batch]
+
+            started = time.monotonic()
+            results = self.detector.detect_batch(frames, frame_ids=frame_ids)
+            latency = time.monotonic() - started
+
+            for (source, (frame_id, frame)), detections in zip(batch, results):
+                source.output.put((frame_id, frame, detections))
+
+            self.stats['batches'] += 1
+            self.stats['frames'] += len(batch)
+            self.stats['last_batch_latency'] = latency
+            self._adapt_batch_size(latency, len(batch))
+
+        return len(pending)
+
+    def _adapt_batch_size(self, latency, size):
+        if latency > self.latency_budget and self.batch_size > self.min_batch_size:
+            per_frame = latency / size
+            self.batch_size = max(self.min_batch_size, min(self.batch_size - 1, int(self.latency_budget / per_frame)))
+        elif latency < self.latency_budget * 0.7 and size == self.batch_size and self.batch_size < self.max_batch_size:
+            self.batch_size += 1
+
+    def _inference_worker(self):
+        while self.running:
+            if not self.tick():
+                time.sleep(0.005)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run road sign detection on several cameras with batched inference")
+    parser.add_argument('sources', nargs='+', help="Camera indices or video paths")
+    parser.add_argument('--latency-budget', type=float, default=0.25, help="Target seconds per batched forward pass")
+    parser.add_argument('--show', action='store_true', help="Display annotated frames for each source")
+    args = parser.parse_args()
+
+    caps = [cv2.VideoCapture(int(source) if source.isdigit() else source) for source in args.sources]
+    for source, cap in zip(args.sources, caps):
+        if not cap.isOpened():
+            print(f"Unable to open source {source}")
+            return
+
+    engine = MultiCameraDetector(caps, latency_budget=args.latency_budget)
+    engine.start()
+
+    try:
+        while True:
+            for source in engine.sources:
+                item = engine.get_detections(source.source_id)
+                if item is None:
+                    continue
+                frame_id, frame, detections = item
+                for det in detections:
+                    print(f"[source {source.source_id}] frame {frame_id}: {det['name']} ({det['confidence']:.2f})")
+                if args.show:
+                    cv2.imshow(f"AQROAD source {source.source_id}", engine.detector.draw_detections(frame, detections))
+            if args.show:
+                if cv2.waitKey(1) & 0xFF == ord('q'):
+                    break
+            else:
+                time.sleep(0.01)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        engine.stop()
+        cv2.destroyAllWindows()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+import queue
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+from metrics import METRICS
+from records import to_array
+
+
+class LatestQueue:
+    def __init__(self, maxsize=1, on_drop=None):
+        self.maxsize = maxsize
+        self.on_drop = on_drop
+        self.items = deque()
+        self.condition = threading.Condition()
+        self.dropped = 0
+        self.closed = False
+
+    def put(self, item):
+        with self.condition:
+            if len(self.items) >= self.maxsize:
+                dropped = self.items.popleft()
+                self.dropped += 1
+                if self.on_drop is not None:
+                    self.on_drop(dropped)
+            self.items.append(item)
+            self.condition.notify_all()
+
+    def get(self, timeout=None):
+        with self.condition:
+            if not self.items and not self.closed:
+                self.condition.wait(timeout)
+            if not self.items:
+                return None
+            return self.items.popleft()
+
+    def get_nowait(self):
+        with self.condition:
+            if not self.items:
+                return None
+            return self.items.popleft()
+
+    def qsize(self):
+        with self.condition:
+            return len(self.items)
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+
+class DisplayRenderer:
+    def __init__(self, detector, display_size, buffers=3, color_order='bgr'):
+        self.detector = detector
+        self.display_size = display_size
+        self.color_order = color_order
+        # preallocated RGB buffers: one being rendered, one queued, one on screen. A buffer only comes back to
+        # the free list once the UI is done with it or the output queue drops it, so a lagging UI never sees
+        # a buffer overwritten under it; the pool grows instead
+        self.buffers = [self._allocate() for _ in range(buffers)]
+        self.free = deque(self.buffers)
+        self.lock = threading.Lock()
+
+    def _allocate(self):
+        width, height = self.display_size
+        return np.empty((height, width, 3), dtype=np.uint8)
+
+    def acquire(self):
+        with self.lock:
+            if self.free:
+                return self.free.popleft()
+            buffer = self._allocate()
+            self.buffers.append(buffer)
+            return buffer
+
+    def release(self, buffer):
+        with self.lock:
+            if any(buffer is own for own in self.buffers) and not any(buffer is free for free in self.free):
+                self.free.append(buffer)
+
+    def render(self, frame, detections):
+        buffer = self.acquire()
+
+        started = time.perf_counter()
+        cv2.resize(frame, self.display_size, dst=buffer)
+        if self.color_order == 'bgr':
+            cv2.cvtColor(buffer, cv2.COLOR_BGR2RGB, dst=buffer)
+        converted = time.perf_counter()
+        METRICS.observe('convert', converted - started)
+
+        if detections:
+            height, width = frame.shape[:2]
+            scale = (self.display_size[0] / width, self.display_size[1] / height)
+            self.detector.draw_detections(buffer, detections, scale=scale, in_place=True)
+            METRICS.observe('draw', time.perf_counter() - converted)
+
+        return buffer
+
+
+class DetectionPipeline:
+    def __init__(self, cap, detector, queue_size=1, tracker=None, detect_interval=1, gate=None,
+                 display_size=None, on_output=None, inference_threads=1, governor=None, recorder=None,
+                 event_log=None, rules=None):
+        self.cap = cap
+        self.detector = detector
+        self.renderer = (DisplayRenderer(detector, display_size, color_order=getattr(cap, 'color_order', 'bgr'))
+                         if display_size else None)
+        self.on_output = on_output
+        self.tracker = tracker
+        self.gate = gate
+        self.governor = governor
+        self.recorder = recorder
+        self.event_log = event_log
+        self.rules = rules
+        self.last_detections = []
+        self.detect_interval = max(1, detect_interval)
+        self.tracker_step = 0
+        self.events = queue.Queue(maxsize=256)
+        self.rule_changes = queue.Queue(maxsize=64)
+        # more than one inference thread only helps when the detector runs out of process
+        self.inference_threads = max(1, inference_threads)
+        self.state_lock = threading.Lock()
+        self.last_rendered_id = 0
+
+        self.capture_queue = LatestQueue(queue_size)
+        self.inference_queue = LatestQueue(queue_size)
+        self.output_queue = LatestQueue(queue_size, on_drop=lambda item: self.release_frame(item[0]))
+
+        self.running = False
+        self.live = threading.Event()
+        self.live.set()
+
+        self.frame_id = 0
+        self.counts = {'captured': 0, 'inferred': 0, 'tracked': 0, 'rendered': 0,
+                       'read_failures': 0, 'events_dropped': 0, 'rule_changes_dropped': 0, 'out_of_order': 0}
+        self.threads = []
+
+    def start(self):
+        self.running = True
+        workers = [('capture', self._capture_worker)]
+        workers += [(f'inference-{i}', self._inference_worker) for i in range(self.inference_threads)]
+        workers += [('render', self._render_worker)]
+        for name, target in workers:
+            thread = threading.Thread(target=target, name=f"pipeline-{name}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self):
+        self.running = False
+        self.live.set()
+        for q in (self.capture_queue, self.inference_queue, self.output_queue):
+            q.close()
+        for thread in self.threads:
+            if thread is not threading.current_thread():
+                thread.join(timeout=1)
+        self.threads = []
+
+    def release_frame(self, frame):
+        # the UI hands back each output frame once it has been pasted and is no longer kept as the current one
+        if self.renderer is not None:
+            self.renderer.release(frame)
+
+    def pause(self):
+        self.live.clear()
+
+    def resume(self):
+        self.live.set()
+
+    def _capture_worker(self):
+        while self.running:
+            started = time.perf_counter()
+            ret, frame = self.cap.read()
+            METRICS.observe('capture', time.perf_counter() - started)
+            if not ret:
+                self.counts['read_failures'] += 1
+                time.sleep(0.01)
+                continue
+
+            self.counts['captured'] += 1
+            if self.live.is_set():
+                self.frame_id += 1
+                # live sources know when the frame was exposed, which is earlier than when read() returned
+                captured_at = getattr(self.cap, 'capture_time', None) or time.monotonic()
+                self.capture_queue.put((self.frame_id, captured_at, frame))
+
+    def _inference_worker(self):
+        while self.running:
+            self.live.wait()
+            item = self.capture_queue.get(timeout=0.1)
+            if item is None:
+                continue
+
+            frame_id, timestamp, frame = item
+            if self.detector.ready.is_set():
+                detections = self._detect(frame, frame_id)
+                METRICS.observe('glass_to_det', time.monotonic() - timestamp)
+            else:
+                detections = None
+            self.inference_queue.put((frame_id, timestamp, frame, detections))
+
+    def _run_detector(self, frame, frame_id):
+        regions = None
+        if self.gate is not None:
+            with self.state_lock:
+                run, regions = self.gate.check(frame)
+                if not run:
+                    return self.last_detections, False
+
+        started = time.perf_counter()
+        if regions:
+            detections = self.detector.detect_regions(frame, regions, as_array=True, frame_id=frame_id)
+            detections = self.detector.to_records(self._carry_over(detections, regions, frame_id))
+        else:
+            detections = self.detector.detect_signs(frame, frame_id=frame_id)
+        # only full-frame model runs say anything about the input size; cache hits and crops would drag it down
+        if self.governor is not None and not regions and getattr(self.detector, 'last_model_run', False):
+            self.governor.observe(time.perf_counter() - started)
+
+        METRICS.tick('inferred')
+        if self.event_log is not None:
+            self.event_log.submit(detections, frame_id)
+        with self.state_lock:
+            self.counts['inferred'] += 1
+            self.last_detections = detections
+
+        return detections, True
+
+    def _carry_over(self, detections, regions, frame_id):
+        # the crops only cover the changed regions; signs centred elsewhere have not moved, so keep their last boxes
+        with self.state_lock:
+            previous = [det for det in self.last_detections
+                        if not any(x1 <= (det['box'][0] + det['box'][2]) / 2 < x2
+                                   and y1 <= (det['box'][1] + det['box'][3]) / 2 < y2
+                                   for x1, y1, x2, y2 in regions)]
+        if not previous:
+            return detections
+        # a sign straddling a region edge is found again by its crop
+        return self.detector.merge_detections(np.concatenate([detections, to_array(previous, frame_id)]))
+
+    def _apply_rules(self, detections):
+        # called under state_lock; only transitions of the road rules leave the inference thread
+        for change in self.rules.update(detections):
+            try:
+                self.rule_changes.put_nowait(change)
+            except queue.Full:
+                self.counts['rule_changes_dropped'] += 1
+
+    def _detect(self, frame, frame_id):
+        if self.tracker is None:
+            detections, ran = self._run_detector(frame, frame_id)
+            if ran and self.rules is not None:
+                with self.state_lock:
+                    self._apply_rules(detections)
+            return detections
+
+        with self.state_lock:
+            step = self.tracker_step
+            self.tracker_step += 1
+
+        ran = False
+        if step % self.detect_interval == 0:
+            detections, ran = self._run_detector(frame, frame_id)
+
+        with self.state_lock:
+            if ran:
+                detections, events = self.tracker.update(detections)
+                for event in events:
+                    try:
+                        self.events.put_nowait(event)
+                    except queue.Full:
+                        self.counts['events_dropped'] += 1
+                if self.rules is not None:
+                    # every confirmed track matched in this update is a sighting, so hazards still in view keep
+                    # being refreshed; repeats of rules already in force produce no changes
+                    self._apply_rules(self.tracker.sightings())
+            else:
+                detections = self.tracker.predict()
+                self.counts['tracked'] += 1
+
+        return detections
+
+    def _render_worker(self):
+        while self.running:
+            item = self.inference_queue.get(timeout=0.1)
+            if item is None:
+                continue
+
+            frame_id, timestamp, frame, detections = item
+            if frame_id <= self.last_rendered_id:
+                # a parallel inference thread already delivered a newer frame
+                self.counts['out_of_order'] += 1
+                continue
+            self.last_rendered_id = frame_id
+
+            if self.recorder is not None:
+                self.recorder.write(frame, timestamp, detections, frame_id)
+
+            if self.renderer is not None:
+                processed_frame = self.renderer.render(frame, detections)
+            elif detections:
+                with METRICS.span('draw'):
+                    processed_frame = self.detector.draw_detections(frame, detections)
+            else:
+                processed_frame = frame
+            self.counts['rendered'] += 1
+            self.output_queue.put((processed_frame, detections))
+            if self.on_output is not None:
+                self.on_output()
+
+    def stats(self):
+        return {
+            **self.counts,
+            'gate': self.gate.report() if self.gate is not None else None,
+            'governor': self.governor.report() if self.governor is not None else None,
+            'event_log': self.event_log.stats if self.event_log is not None else None,
+            'rules': self.rules.stats if self.rules is not None else None,
+            'dropped': {
+                'capture': self.capture_queue.dropped,
+                'inference': self.inference_queue.dropped,
+                'render': self.output_queue.dropped,
+            },
+            'queue_depths': {
+                'capture': self.capture_queue.qsize(),
+                'inference': self.inference_queue.qsize(),
+                'render': self.output_queue.qsize(),
+            },
+        }
@@ -0,0 +1,159 @@
+import functools
+
+import numpy as np
+import yaml
+
+# Packed per-detection record: 4 (frame_id) + 8 (box) + 4 (confidence) + 1 (class_id) = 17 bytes.
+# Boxes are int16, which covers frames up to 32767 px on a side; GTSRB has 43 classes so uint8 is enough.
+DETECTION_DTYPE = np.dtype([
+    ('frame_id', np.uint32),
+    ('box', np.int16, (4,)),
+    ('confidence', np.float32),
+    ('class_id', np.uint8),
+])
+
+UNKNOWN_NAME = "Unknown Sign"
+UNKNOWN_DESCRIPTION = "Sign not recognized"
+
+
+class ClassTable:
+    def __init__(self, names, descriptions=None):
+        descriptions = descriptions or {}
+        self.names = np.array(list(names) + [UNKNOWN_NAME], dtype=object)
+        self.descriptions = np.array(
+            [descriptions.get(i, "") for i in range(len(names))] + [UNKNOWN_DESCRIPTION], dtype=object)
+        self.unknown_index = len(names)
+
+    @classmethod
+    def from_yaml(cls, path='data/data.yaml', descriptions=None):
+        with open(path) as f:
+            data = yaml.safe_load(f)
+
+        names = data['names']
+        if isinstance(names, dict):
+            names = [names[i] for i in sorted(names)]
+        return cls(names, descriptions)
+
+    def __len__(self):
+        return self.unknown_index
+
+    def lookup(self, class_ids):
+        class_ids = np.asarray(class_ids)
+        return np.where((class_ids >= 0) & (class_ids < self.unknown_index), class_ids, self.unknown_index)
+
+    def name(self, class_id):
+        return self.names[class_id if 0 <= class_id < self.unknown_index else self.unknown_index]
+
+    def description(self, class_id):
+        return self.descriptions[class_id if 0 <= class_id < self.unknown_index else self.unknown_index]
+
+
+@functools.lru_cache(maxsize=None)
+def _cached_table(path, descriptions):
+    return ClassTable.from_yaml(path, dict(descriptions))
+
+
+def load_class_table(path='data/data.yaml', descriptions=None):
+    return _cached_table(path, tuple(sorted((descriptions or {}).items())))
+
+
+class Detection:
+    # 96 bytes per instance on 64-bit CPython, up to ~260 with boxed coordinates and confidence, versus
+    # ~390 for the equivalent dict and box tuple. Long-lived history should keep the 17-byte
+    # DETECTION_DTYPE rows (DetectionHistory) and only materialise Detection objects on access.
+    # name/description are joined from the shared ClassTable on access.
+    __slots__ = ('x1', 'y1', 'x2', 'y2', 'confidence', 'class_id', 'frame_id', 'table')
+
+    KEYS = ('box', 'name', 'description', 'confidence', 'class_id')
+
+    def __init__(self, box, confidence, class_id, table, frame_id=0):
+        self.x1, self.y1, self.x2, self.y2 = box
+        self.confidence = confidence
+        self.class_id = class_id
+        self.frame_id = frame_id
+        self.table = table
+
+    @property
+    def box(self):
+        return (self.x1, self.y1, self.x2, self.y2)
+
+    @property
+    def name(self):
+        return self.table.name(self.class_id)
+
+    @property
+    def description(self):
+        return self.table.description(self.class_id)
+
+    def __getitem__(self, key):
+        if key not in self.KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key):
+        return key in self.KEYS
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self.KEYS else default
+
+    def keys(self):
+        return self.KEYS
+
+    def as_dict(self):
+        return {key: getattr(self, key) for key in self.KEYS}
+
+    def __repr__(self):
+        return (f"Detection(name={self.name!r}, confidence={self.confidence:.2f}, "
+                f"box={self.box}, frame_id={self.frame_id})")
+
+
+def to_records(detections, table):
+    return [
+        Detection(tuple(box), confidence, class_id, table, frame_id)
+        for frame_id, box, confidence, class_id in zip(
+            detections['frame_id'].tolist(),
+            detections['box'].tolist(),
+            detections['confidence'].tolist(),
+            detections['class_id'].tolist()
+        )
+    ]
+
+
+def to_array(detections, frame_id=0):
+    # accepts Detection records or the tracker's dicts; both expose box/confidence/class_id by key
+    array = np.empty(len(detections), dtype=DETECTION_DTYPE)
+    array['frame_id'] = frame_id
+    for i, det in enumerate(detections):
+        array['box'][i] = det['box']
+        array['confidence'][i] = det['confidence']
+        array['class_id'][i] = det['class_id']
+    return array
+
+
+class DetectionHistory:
+    def __init__(self, table, capacity=1 << 16):
+        self.table = table
+        self.data = np.empty(capacity, dtype=DETECTION_DTYPE)
+        self.size = 0
+
+    def append(self, detections):
+        count = len(detections)
+        if self.size + count > len(self.data):
+            grown = np.empty(max(len(self.data) * 2, self.size + count), dtype=DETECTION_DTYPE)
+            grown[:self.size] = self.data[:self.size]
+            self.data = grown
+        self.data[self.size:self.size + count] = detections
+        self.size += count
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index):
+        records = to_records(np.atleast_1d(self.view()[index]), self.table)
+        return records[0] if isinstance(index, int) else records
+
+    def view(self):
+        return self.data[:self.size]
+
+    def memory_bytes(self):
+        return self.data.nbytes
@@ -0,0 +1,406 @@
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import socket
+import struct
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from detector import RoadSignDetector
+from metrics import METRICS
+
+WEBSOCKET_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 413: 'Payload Too Large',
+           429: 'Too Many Requests', 503: 'Service Unavailable'}
+
+
+class ServiceError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class MicroBatcher:
+    # collects frames from concurrent requests for up to `window` seconds and runs them as one forward pass
+    def __init__(self, detector, window=0.005, max_batch=8, max_pending=32):
+        self.detector = detector
+        self.window = window
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self.queue = None
+        # one thread keeps every forward pass on the same warm model instance
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="service-inference")
+        self.task = None
+        self.stats = {'requests': 0, 'batches': 0, 'frames': 0, 'rejected': 0}
+
+    def start(self):
+        self.queue = asyncio.Queue()
+        self.task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+        self.executor.shutdown(wait=False)
+
+    async def submit(self, frame):
+        # reject instead of queueing without bound; callers turn this into 503 / a busy message
+        if self.queue.qsize() >= self.max_pending:
+            self.stats['rejected'] += 1
+            raise ServiceError(503, "Detector is busy, try again later")
+
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((frame, future, time.perf_counter()))
+        self.stats['requests'] += 1
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            batch = [item for item in batch if not item[1].cancelled()]
+            if not batch:
+                continue
+
+            started = time.perf_counter()
+            for _, _, queued in batch:
+                METRICS.observe('service_queue', started - queued)
+            try:
+                results = await loop.run_in_executor(
+                    self.executor, lambda: self.detector.detect_batch([frame for frame, _, _ in batch], as_array=True))
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            METRICS.observe('service_batch', time.perf_counter() - started)
+
+            self.stats['batches'] += 1
+            self.stats['frames'] += len(batch)
+            for (_, future, _), detections in zip(batch, results):
+                if not future.done():
+                    future.set_result(detections)
+
+
+class DetectionService:
+    def __init__(self, detector, host='127.0.0.1', port=8765, unix_path=None, window=0.005, max_batch=8,
+                 max_pending=32, rate=30.0, burst=30, max_frame_bytes=8 << 20, global_rate=120.0, global_burst=120):
+        self.detector = detector
+        self.host = host
+        self.port = port
+        self.unix_path = unix_path
+        self.batcher = MicroBatcher(detector, window, max_batch, max_pending)
+        self.rate = rate
+        self.burst = burst
+        self.max_frame_bytes = max_frame_bytes
+        self.buckets = {}
+        # ceiling for all clients together, so reconnecting for a fresh per-client bucket gains nothing
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        # a bucket left idle this long has refilled to its burst, so forgetting it changes nothing
+        self.bucket_idle = burst / rate if rate > 0 else float('inf')
+        self.next_sweep = 0.0
+        self.servers = []
+
+    async def start(self):
+        self.batcher.start()
+        METRICS.gauge('service_pending', self.batcher.queue.qsize)
+        if self.port is not None:
+            server = await asyncio.start_server(self._handle_http, self.host, self.port)
+            self.servers.append(server)
+            self.port = server.sockets[0].getsockname()[1]
+            print(f"Serving HTTP and WebSocket on http://{self.host}:{self.port}")
+        if self.unix_path:
+            if os.path.exists(self.unix_path):
+                os.unlink(self.unix_path)
+            self.servers.append(await asyncio.start_unix_server(self._handle_unix, self.unix_path))
+            print(f"Serving length-prefixed frames on {self.unix_path}")
+
+    async def stop(self):
+        for server in self.servers:
+            server.close()
+            await server.wait_closed()
+        await self.batcher.stop()
+        if self.unix_path and os.path.exists(self.unix_path):
+            os.unlink(self.unix_path)
+
+    def _allow(self, client):
+        now = time.monotonic()
+        if now >= self.next_sweep:
+            self.buckets = {key: bucket for key, bucket in self.buckets.items()
+                            if now - bucket.updated < self.bucket_idle}
+            self.next_sweep = now + self.bucket_idle
+        bucket = self.buckets.get(client)
+        if bucket is None:
+            bucket = self.buckets[client] = TokenBucket(self.rate, self.burst)
+        return bucket.take() and self.global_bucket.take()
+
+    async def detect(self, client, data):
+        started = time.perf_counter()
+        if not self._allow(client):
+            raise ServiceError(429, f"Rate limit of {self.rate:g} frames/s per client, "
+                                    f"{self.global_bucket.rate:g} frames/s in total exceeded")
+        if len(data) > self.max_frame_bytes:
+            raise ServiceError(413, "Frame is too large")
+
+        loop = asyncio.get_running_loop()
+        frame = await loop.run_in_executor(None, cv2.imdecode, np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            raise ServiceError(400, "Body is not a decodable image")
+
+        detections = await self.batcher.submit(frame)
+        latency = time.perf_counter() - started
+        METRICS.observe('service_total', latency)
+        return {
+            'detections': [
+                {'box': list(det.box), 'name': det.name, 'confidence': round(det.confidence, 4),
+                 'class_id': det.class_id}
+                for det in self.detector.to_records(detections)
+            ],
+            'latency_ms': round(latency * 1000, 2),
+        }
+
+    def report(self):
+        return {**self.batcher.stats, 'clients': len(self.buckets), 'pending': self.batcher.queue.qsize()}
+
+    # HTTP/1.1 with keep-alive, plus the WebSocket upgrade on /ws
+
+    async def _handle_http(self, reader, writer):
+        # the service listens on loopback, so the address alone would put every client in one bucket;
+        # each connection (one keep-alive HTTP client or WebSocket) is a client, under the global ceiling
+        peer = writer.get_extra_info('peername')
+        client = f"tcp:{peer[0]}:{peer[1]}" if peer else f"tcp:{id(writer)}"
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                if path == '/ws' and headers.get('upgrade', '').lower() == 'websocket':
+                    await self._websocket(reader, writer, headers, client)
+                    break
+
+                length = int(headers.get('content-length', 0))
+                if length > self.max_frame_bytes:
+                    await self._respond(writer, 413, {'error': "Frame is too large"}, close=True)
+                    break
+                body = await reader.readexactly(length) if length else b''
+                await self._route(writer, method, path, body, client)
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            self.buckets.pop(client, None)
+            writer.close()
+
+    async def _route(self, writer, method, path, body, client):
+        if method == 'POST' and path == '/detect':
+            try:
+                await self._respond(writer, 200, await self.detect(client, body))
+            except ServiceError as e:
+                await self._respond(writer, e.status, {'error': str(e)})
+        elif method == 'GET' and path == '/health':
+            await self._respond(writer, 200, {'ready': self.detector.ready.is_set(), **self.report()})
+        elif method == 'GET' and path == '/metrics':
+            await self._respond(writer, 200, METRICS.prometheus_text(), content_type='text/plain; version=0.0.4')
+        else:
+            await self._respond(writer, 404, {'error': f"No route for {method} {path}"})
+
+    async def _respond(self, writer, status, payload, content_type='application/json', close=False):
+        body = payload.encode('utf-8') if isinstance(payload, str) else json.dumps(payload).encode('utf-8')
+        head = [f"HTTP/1.1 {status} {REASONS.get(status, '')}", f"Content-Type: {content_type}",
+                f"Content-Length: {len(body)}"]
+        if close:
+            head.append("Connection: close")
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode('latin-1') + body)
+        await writer.drain()
+
+    async def _websocket(self, reader, writer, headers, client):
+        if 'sec-websocket-key' not in headers:
+            await self._respond(writer, 400, {'error': "Missing Sec-WebSocket-Key"}, close=True)
+            return
+        accept = base64.b64encode(hashlib.sha1((headers['sec-websocket-key'] + WEBSOCKET_GUID).encode()).digest())
+        writer.write(b"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                     b"Sec-WebSocket-Accept: " + accept + b"\r\n\r\n")
+        await writer.drain()
+
+        message = b''
+        while True:
+            opcode, fin, payload = await self._read_ws_frame(reader)
+            if opcode == 0x8:
+                self._write_ws_frame(writer, 0x8, payload[:2])
+                break
+            if opcode == 0x9:
+                self._write_ws_frame(writer, 0xA, payload)
+                continue
+            if opcode in (0x0, 0x2):
+                if len(message) + len(payload) > self.max_frame_bytes:
+                    # 1009: message too big; fragments must not add up past a single frame's limit
+                    self._write_ws_frame(writer, 0x8, struct.pack('!H', 1009))
+                    await writer.drain()
+                    break
+                message += payload
+                if not fin:
+                    continue
+                data, message = message, b''
+                try:
+                    result = await self.detect(client, data)
+                except ServiceError as e:
+                    result = {'error': str(e), 'status': e.status}
+                self._write_ws_frame(writer, 0x1, json.dumps(result).encode('utf-8'))
+                await writer.drain()
+
+    async def _read_ws_frame(self, reader):
+        first, second = await reader.readexactly(2)
+        length = second & 0x7F
+        if length == 126:
+            length = struct.unpack('!H', await reader.readexactly(2))[0]
+        elif length == 127:
+            length = struct.unpack('!Q', await reader.readexactly(8))[0]
+        if length > self.max_frame_bytes:
+            raise ValueError("WebSocket frame too large")
+
+        mask = await reader.readexactly(4) if second & 0x80 else None
+        payload = await reader.readexactly(length)
+        if mask:
+            payload = (np.frombuffer(payload, dtype=np.uint8) ^ np.resize(np.frombuffer(mask, dtype=np.uint8),
+                                                                          length)).tobytes()
+        return first & 0x0F, bool(first & 0x80), payload
+
+    def _write_ws_frame(self, writer, opcode, payload):
+        length = len(payload)
+        if length < 126:
+            header = struct.pack('!BB', 0x80 | opcode, length)
+        elif length < 1 << 16:
+            header = struct.pack('!BBH', 0x80 | opcode, 126, length)
+        else:
+            header = struct.pack('!BBQ', 0x80 | opcode, 127, length)
+        writer.write(header + payload)
+
+    # Unix socket: 4-byte big-endian length + encoded image in, 4-byte length + JSON out
+
+    def _unix_client(self, writer):
+        # the peer's uid and pid survive reconnects, unlike the connection itself
+        try:
+            credentials = writer.get_extra_info('socket').getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED,
+                                                                     struct.calcsize('3i'))
+            pid, uid, _ = struct.unpack('3i', credentials)
+            return f"unix:{uid}:{pid}"
+        except (AttributeError, OSError):
+            return f"unix:{id(writer)}"
+
+    async def _handle_unix(self, reader, writer):
+        client = self._unix_client(writer)
+        try:
+            while True:
+                length = struct.unpack('!I', await reader.readexactly(4))[0]
+                if length > self.max_frame_bytes:
+                    break
+                data = await reader.readexactly(length)
+                try:
+                    result = await self.detect(client, data)
+                except ServiceError as e:
+                    result = {'error': str(e), 'status': e.status}
+                body = json.dumps(result).encode('utf-8')
+                writer.write(struct.pack('!I', len(body)) + body)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+def request_detections(image_path, url='http://127.0.0.1:8765'):
+    with open(image_path, 'rb') as f:
+        request = urllib.request.Request(f"{url}/detect", data=f.read(), method='POST',
+                                         headers={'Content-Type': 'application/octet-stream'})
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())
+
+
+async def serve(args):
+    detector = RoadSignDetector(backend=args.backend, model_path=args.model, speech=False)
+    if args.conf is not None:
+        detector.conf_threshold = args.conf
+
+    service = DetectionService(detector, args.host, args.port, args.unix, args.window_ms / 1000, args.max_batch,
+                               args.max_pending, args.rate, args.burst, global_rate=args.global_rate,
+                               global_burst=args.global_burst)
+    await service.start()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await service.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve road sign detections to other local processes")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765, help="HTTP (POST /detect) and WebSocket (/ws) port")
+    parser.add_argument('--unix', help="Also listen on this Unix socket path")
+    parser.add_argument('--backend', choices=['ultralytics', 'onnx', 'openvino'], default='ultralytics')
+    parser.add_argument('--model', help="Model path for the selected backend")
+    parser.add_argument('--conf', type=float, help="Confidence threshold override")
+    parser.add_argument('--window-ms', type=float, default=5.0, help="How long to gather frames into one batch")
+    parser.add_argument('--max-batch', type=int, default=8)
+    parser.add_argument('--max-pending', type=int, default=32, help="Queued frames before requests are rejected")
+    parser.add_argument('--rate', type=float, default=30.0, help="Frames per second allowed per client")
+    parser.add_argument('--burst', type=int, default=30, help="Frames a client may send at once above its rate")
+    parser.add_argument('--global-rate', type=float, default=120.0, help="Frames per second allowed for all clients")
+    parser.add_argument('--global-burst', type=int, default=120)
+    parser.add_argument('--client', metavar='IMAGE', help="Send IMAGE to a running service and print the result")
+    args = parser.parse_args()
+
+    if args.client:
+        print(json.dumps(request_detections(args.client, f"http://{args.host}:{args.port}"), indent=2))
+        return
+
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
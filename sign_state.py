@@ -0,0 +1,167 @@
+import time
+
+from records import load_class_table
+
+SPEED_LIMITS = {0: 20, 1: 30, 2: 50, 3: 60, 4: 70, 5: 80, 7: 100, 8: 120}
+END_OF_SPEED_LIMIT = 6
+ENDED_SPEED_LIMIT = 80
+NO_PASSING = 9
+NO_PASSING_HEAVY = 10
+END_OF_ALL_LIMITS = 32
+END_OF_NO_PASSING = 41
+END_OF_NO_PASSING_HEAVY = 42
+
+# warning signs plus yield, stop and no entry: they apply to the next stretch of road, not until revoked,
+# so they stay pending for a while after the last sighting and then lapse
+HAZARDS = frozenset({11, 13, 14, 17, *range(18, 32)})
+
+
+class RoadRules:
+    # Folds the detection stream into the rules currently in force and reports only transitions. Each detection
+    # is a dict lookup plus a few comparisons; repeated sightings of a sign that is already in force cost nothing
+    # further, so the UI and speech see a handful of changes instead of every frame's detections.
+    def __init__(self, min_hits=3, confirm_window=1.0, hazard_ttl=20.0, min_confidence=0.5, classes=None):
+        self.min_hits = min_hits
+        self.confirm_window = confirm_window
+        self.hazard_ttl = hazard_ttl
+        self.min_confidence = min_confidence
+        self.classes = classes if classes is not None else load_class_table()
+
+        self.speed_limit = None
+        self.no_passing = False
+        self.no_passing_heavy = False
+        self.hazards = {}
+        self.next_expiry = float('inf')
+
+        self.sightings = {}
+        self.handlers = {END_OF_SPEED_LIMIT: self._end_speed_limit, NO_PASSING: self._no_passing,
+                         NO_PASSING_HEAVY: self._no_passing_heavy, END_OF_ALL_LIMITS: self._end_all,
+                         END_OF_NO_PASSING: self._end_no_passing, END_OF_NO_PASSING_HEAVY: self._end_no_passing_heavy}
+        for class_id in SPEED_LIMITS:
+            self.handlers[class_id] = self._speed_limit
+        for class_id in HAZARDS:
+            self.handlers[class_id] = self._hazard
+
+        self.stats = {'detections': 0, 'confirmed': 0, 'changes': 0}
+
+    def update(self, detections, timestamp=None):
+        now = time.monotonic() if timestamp is None else timestamp
+        changes = []
+        if now >= self.next_expiry:
+            self._expire(now, changes)
+
+        for detection in detections:
+            self.stats['detections'] += 1
+            class_id = detection['class_id']
+            handler = self.handlers.get(class_id)
+            if handler is None or detection['confidence'] < self.min_confidence:
+                continue
+            if self._confirmed(class_id, now):
+                self.stats['confirmed'] += 1
+                handler(class_id, now, changes)
+
+        self.stats['changes'] += len(changes)
+        if changes:
+            state = self.state()
+            for change in changes:
+                change['state'] = state
+        return changes
+
+    def _confirmed(self, class_id, now):
+        # a class must be seen min_hits times with gaps under confirm_window; one-frame misclassifications
+        # never reach the rules. Tracker events are already confirmed, so use min_hits=1 for those
+        count, last_seen = self.sightings.get(class_id, (0, float('-inf')))
+        count = count + 1 if now - last_seen <= self.confirm_window else 1
+        self.sightings[class_id] = (count, now)
+        return count >= self.min_hits
+
+    def _change(self, changes, kind, value, previous, class_id, now, text, key=None, speak=True):
+        changes.append({'kind': kind, 'value': value, 'previous': previous, 'class_id': class_id,
+                        'timestamp': now, 'text': text, 'key': key if key is not None else kind, 'speak': speak})
+
+    def _set_speed_limit(self, limit, class_id, now, changes):
+        if limit == self.speed_limit:
+            return
+        previous, self.speed_limit = self.speed_limit, limit
+        text = f"Speed limit {limit} kilometers per hour" if limit else "Speed limit lifted"
+        self._change(changes, 'speed_limit', limit, previous, class_id, now, text)
+
+    def _set_passing(self, attribute, restricted, class_id, now, changes):
+        if getattr(self, attribute) == restricted:
+            return
+        setattr(self, attribute, restricted)
+        vehicles = " for vehicles over 3.5 tons" if attribute == 'no_passing_heavy' else ""
+        text = f"No passing{vehicles} in force" if restricted else f"End of no passing zone{vehicles}"
+        self._change(changes, attribute, restricted, not restricted, class_id, now, text)
+
+    def _speed_limit(self, class_id, now, changes):
+        self._set_speed_limit(SPEED_LIMITS[class_id], class_id, now, changes)
+
+    def _end_speed_limit(self, class_id, now, changes):
+        # GTSRB class 6 is "end of speed limit 80"; it does not lift any other limit
+        if self.speed_limit == ENDED_SPEED_LIMIT:
+            self._set_speed_limit(None, class_id, now, changes)
+
+    def _no_passing(self, class_id, now, changes):
+        self._set_passing('no_passing', True, class_id, now, changes)
+
+    def _no_passing_heavy(self, class_id, now, changes):
+        self._set_passing('no_passing_heavy', True, class_id, now, changes)
+
+    def _end_no_passing(self, class_id, now, changes):
+        self._set_passing('no_passing', False, class_id, now, changes)
+
+    def _end_no_passing_heavy(self, class_id, now, changes):
+        self._set_passing('no_passing_heavy', False, class_id, now, changes)
+
+    def _end_all(self, class_id, now, changes):
+        self._set_speed_limit(None, class_id, now, changes)
+        self._set_passing('no_passing', False, class_id, now, changes)
+        self._set_passing('no_passing_heavy', False, class_id, now, changes)
+
+    def _hazard(self, class_id, now, changes):
+        expiry = now + self.hazard_ttl
+        is_new = class_id not in self.hazards
+        self.hazards[class_id] = expiry
+        self.next_expiry = min(self.next_expiry, expiry)
+        if is_new:
+            self._change(changes, 'hazard', class_id, None, class_id, now, self.classes.name(class_id), key=class_id)
+
+    def _expire(self, now, changes):
+        # at most one entry per hazard class, and only scanned when the earliest one is due
+        for class_id, expiry in list(self.hazards.items()):
+            if expiry <= now:
+                del self.hazards[class_id]
+                self._change(changes, 'hazard_cleared', class_id, class_id, class_id, now,
+                             f"{self.classes.name(class_id)} cleared", key=class_id, speak=False)
+        self.next_expiry = min(self.hazards.values(), default=float('inf'))
+
+    def state(self):
+        return {
+            'speed_limit': self.speed_limit,
+            'no_passing': self.no_passing,
+            'no_passing_heavy': self.no_passing_heavy,
+            'hazards': sorted(self.hazards),
+        }
+
+    def describe(self, state=None):
+        state = self.state() if state is None else state
+        limit = state['speed_limit']
+        lines = [f"Speed limit: {f'{limit} km/h' if limit else 'none signed'}"]
+        if state['no_passing']:
+            lines.append("No passing")
+        elif state['no_passing_heavy']:
+            lines.append("No passing for vehicles over 3.5 t")
+        else:
+            lines.append("Passing allowed")
+        if state['hazards']:
+            lines.append("Ahead: " + ", ".join(self.classes.name(class_id) for class_id in state['hazards']))
+        return "\n".join(lines)
+
+    def reset(self):
+        self.speed_limit = None
+        self.no_passing = False
+        self.no_passing_heavy = False
+        self.hazards = {}
+        self.next_expiry = float('inf')
+        self.sightings = {}
@@ -0,0 +1,480 @@
+import json
+import os
+import time
+
+import cv2
+import numpy as np
+
+from records import DETECTION_DTYPE, to_array
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.m4v', '.webm')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+RECORDING_EXTENSION = '.aqrec'
+STREAM_SCHEMES = ('rtsp://', 'rtsps://', 'rtmp://', 'udp://', 'tcp://', 'http://', 'https://')
+
+CAPTURE_APIS = {
+    'any': cv2.CAP_ANY,
+    'v4l2': cv2.CAP_V4L2,
+    'dshow': cv2.CAP_DSHOW,
+    'msmf': cv2.CAP_MSMF,
+    'avfoundation': cv2.CAP_AVFOUNDATION,
+    'gstreamer': cv2.CAP_GSTREAMER,
+    'ffmpeg': cv2.CAP_FFMPEG,
+}
+
+# one row per recorded frame; frames live back to back in frames.bin, detections in detections.bin
+INDEX_DTYPE = np.dtype([
+    ('frame_id', np.uint32),
+    ('timestamp', np.float64),
+    ('offset', np.uint64),
+    ('length', np.uint32),
+    ('detection_start', np.uint32),
+    ('detection_count', np.uint16),
+])
+
+
+class FrameSource:
+    # mirrors the parts of cv2.VideoCapture the pipeline and app use, so any source can stand in for a camera
+    def __init__(self, fps=30.0, realtime=False, loop=False):
+        self.fps = fps
+        self.realtime = realtime
+        self.loop = loop
+        self.width = 0
+        self.height = 0
+        self.frame_count = 0
+        self.timestamp = None
+        # time.monotonic() at which the current frame was exposed (or as close as the source can tell),
+        # so the pipeline can report glass-to-detection latency; None when the frame is not live
+        self.capture_time = None
+        # channel order of the frames read() returns
+        self.color_order = 'bgr'
+        self.started = None
+        self.first_timestamp = None
+
+    def isOpened(self):
+        return True
+
+    def read(self):
+        raise NotImplementedError
+
+    def release(self):
+        pass
+
+    def get(self, prop):
+        return {
+            cv2.CAP_PROP_FRAME_WIDTH: float(self.width),
+            cv2.CAP_PROP_FRAME_HEIGHT: float(self.height),
+            cv2.CAP_PROP_FPS: float(self.fps or 0),
+            cv2.CAP_PROP_FRAME_COUNT: float(self.frame_count),
+        }.get(prop, 0.0)
+
+    def set(self, prop, value):
+        return False
+
+    def _pace(self, timestamp):
+        # sleep until the frame's offset from the first frame has elapsed since playback started
+        self.timestamp = timestamp
+        if not self.realtime:
+            return
+        now = time.monotonic()
+        if self.started is None or timestamp < self.first_timestamp:
+            self.started, self.first_timestamp = now, timestamp
+            return
+        delay = (timestamp - self.first_timestamp) - (now - self.started)
+        if delay > 0:
+            time.sleep(delay)
+
+
+class LiveSource(FrameSource):
+    def __init__(self, index=0, formats=('MJPG', 'YUYV'), width=None, height=None, fps=None, buffer_size=1,
+                 api='any'):
+        super().__init__()
+        self.cap = cv2.VideoCapture(index, CAPTURE_APIS[api])
+        self.index = index
+        self.fourcc = None
+        if self.cap.isOpened():
+            self._negotiate(formats, width, height, fps, buffer_size)
+        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.driver_clock = None
+
+    def _negotiate(self, formats, width, height, fps, buffer_size):
+        # V4L2 applies the pixel format before the size, and some drivers reset the size when it changes.
+        # MJPEG is preferred: uncompressed YUYV usually cannot reach full frame rate at 720p and above over USB 2
+        for fourcc in formats or ():
+            self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*fourcc))
+            if self._fourcc() == fourcc:
+                break
+        if width:
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        if height:
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        if fps:
+            self.cap.set(cv2.CAP_PROP_FPS, fps)
+        if buffer_size:
+            # with the default 4+ buffers every frame read is already several frame periods old
+            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, buffer_size)
+
+        self.fourcc = self._fourcc()
+        print(f"Camera {self.index}: {self.fourcc or 'default format'} "
+              f"{int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))}x{int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))} "
+              f"@ {self.cap.get(cv2.CAP_PROP_FPS):g} fps, buffer {int(self.cap.get(cv2.CAP_PROP_BUFFERSIZE))}")
+
+    def _fourcc(self):
+        code = int(self.cap.get(cv2.CAP_PROP_FOURCC))
+        text = ''.join(chr((code >> (8 * i)) & 0xFF) for i in range(4))
+        return text if code and text.isprintable() else None
+
+    def _exposure_time(self, now):
+        # V4L2 reports the driver's buffer timestamp, taken on the same clock as time.monotonic(), through
+        # CAP_PROP_POS_MSEC; other APIs report something else there, so fall back to the time read() returned
+        if self.driver_clock is False:
+            return now
+        stamp = self.cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+        plausible = 0 <= now - stamp < 1.0
+        if self.driver_clock is None and stamp:
+            self.driver_clock = plausible
+        return stamp if self.driver_clock and plausible else now
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def read(self):
+        ret, frame = self.cap.read()
+        self.timestamp = time.monotonic()
+        self.capture_time = self._exposure_time(self.timestamp) if ret else None
+        return ret, frame
+
+    def release(self):
+        self.cap.release()
+
+    def get(self, prop):
+        return self.cap.get(prop)
+
+    def set(self, prop, value):
+        return self.cap.set(prop, value)
+
+
+def gstreamer_available():
+    for line in cv2.getBuildInformation().splitlines():
+        if line.strip().startswith('GStreamer:'):
+            return 'YES' in line
+    return False
+
+
+def gstreamer_pipeline(uri, color_order='bgr', latency_ms=0, live=True):
+    # decodebin picks the highest-ranked decoder, which is the hardware one (vaapi, nvv4l2, d3d11, vtdec)
+    # whenever its plugin is installed; videoconvert then writes the colour order the consumers want
+    if uri.startswith(('rtsp://', 'rtsps://')):
+        head = f'rtspsrc location="{uri}" latency={latency_ms} ! decodebin'
+    elif '://' in uri:
+        head = f'uridecodebin uri="{uri}"'
+    else:
+        head = f'filesrc location="{uri}" ! decodebin'
+    # live streams keep only the newest buffer; files must not drop frames
+    sink = 'appsink drop=true max-buffers=1 sync=false' if live else 'appsink sync=false'
+    return f"{head} ! videoconvert ! video/x-raw,format={color_order.upper()} ! {sink}"
+
+
+class StreamSource(FrameSource):
+    # files and network streams decoded by GStreamer or FFmpeg (with hardware decoding where available),
+    # instead of OpenCV's default software path
+    def __init__(self, uri, backend='gstreamer', color_order='bgr', latency_ms=0, realtime=True, loop=False):
+        super().__init__(realtime=realtime, loop=loop)
+        self.uri = uri
+        self.live = uri.startswith(STREAM_SCHEMES) or uri.startswith('gst:')
+        if backend == 'gstreamer' and not uri.startswith('gst:') and not gstreamer_available():
+            print("OpenCV was built without GStreamer, decoding with FFmpeg instead")
+            backend = 'ffmpeg'
+        if backend == 'ffmpeg' and color_order != 'bgr':
+            print("The FFmpeg capture backend only delivers BGR frames")
+            color_order = 'bgr'
+        self.backend = backend
+        self.color_order = color_order
+
+        if backend == 'gstreamer':
+            pipeline = uri[4:] if uri.startswith('gst:') else gstreamer_pipeline(uri, color_order, latency_ms,
+                                                                                 self.live)
+            self.cap = cv2.VideoCapture(pipeline, cv2.CAP_GSTREAMER)
+        else:
+            if self.live:
+                # skip FFmpeg's input probing buffer so frames are delivered as soon as they are decoded
+                os.environ.setdefault('OPENCV_FFMPEG_CAPTURE_OPTIONS', 'fflags;nobuffer|flags;low_delay')
+            try:
+                self.cap = cv2.VideoCapture(uri, cv2.CAP_FFMPEG,
+                                            [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY])
+            except (AttributeError, TypeError, cv2.error):
+                # OpenCV < 4.5.2 has no capture parameters
+                self.cap = cv2.VideoCapture(uri, cv2.CAP_FFMPEG)
+
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.frame_count = 0 if self.live else int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.index = 0
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def read(self):
+        ret, frame = self.cap.read()
+        if not ret and self.loop and self.index and not self.live:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            self.index = 0
+            ret, frame = self.cap.read()
+        if not ret:
+            return False, None
+
+        if self.live:
+            # the stream carries no exposure time that shares our clock, so arrival is the best estimate
+            self.timestamp = self.capture_time = time.monotonic()
+        else:
+            self._pace(self.index / self.fps)
+        self.index += 1
+        return True, frame
+
+    def release(self):
+        self.cap.release()
+
+
+class VideoFileSource(FrameSource):
+    def __init__(self, path, realtime=True, loop=False):
+        self.cap = cv2.VideoCapture(path)
+        super().__init__(self.cap.get(cv2.CAP_PROP_FPS) or 30.0, realtime, loop)
+        self.path = path
+        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.frame_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.index = 0
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def read(self):
+        ret, frame = self.cap.read()
+        if not ret and self.loop and self.index:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            self.index = 0
+            ret, frame = self.cap.read()
+        if not ret:
+            return False, None
+
+        self._pace(self.index / self.fps)
+        self.index += 1
+        return True, frame
+
+    def release(self):
+        self.cap.release()
+
+
+class ImageDirectorySource(FrameSource):
+    def __init__(self, path, fps=10.0, realtime=True, loop=False):
+        super().__init__(fps, realtime, loop)
+        self.path = path
+        self.names = sorted(name for name in os.listdir(path) if name.lower().endswith(IMAGE_EXTENSIONS))
+        self.frame_count = len(self.names)
+        self.index = 0
+
+        first = self._load(0) if self.names else None
+        if first is not None:
+            self.height, self.width = first.shape[:2]
+
+    def _load(self, index):
+        return cv2.imread(os.path.join(self.path, self.names[index]))
+
+    def isOpened(self):
+        return bool(self.names)
+
+    def read(self):
+        if self.index >= len(self.names):
+            if not self.loop or not self.names:
+                return False, None
+            self.index = 0
+
+        frame = self._load(self.index)
+        if frame is not None and frame.shape[:2] != (self.height, self.width):
+            frame = cv2.resize(frame, (self.width, self.height))
+        self._pace(self.index / self.fps)
+        self.index += 1
+        return frame is not None, frame
+
+
+class SyntheticSource(FrameSource):
+    # deterministic moving sign-like shapes, so runs on machines without a camera are repeatable
+    def __init__(self, size=(640, 480), fps=30.0, count=None, seed=0, realtime=True):
+        super().__init__(fps, realtime, loop=False)
+        self.width, self.height = size
+        self.frame_count = count or 0
+        self.count = count
+        self.index = 0
+
+        rng = np.random.default_rng(seed)
+        self.background = cv2.GaussianBlur(rng.integers(0, 256, (self.height, self.width, 3), dtype=np.uint8),
+                                           (0, 0), 3)
+        self.shapes = [(rng.uniform(0, self.width), rng.uniform(0, self.height),
+                        rng.uniform(-4, 4), rng.uniform(-2, 2),
+                        int(rng.integers(self.height // 40, self.height // 8))) for _ in range(4)]
+        self.frame = np.empty_like(self.background)
+
+    def read(self):
+        if self.count is not None and self.index >= self.count:
+            return False, None
+
+        np.copyto(self.frame, self.background)
+        for x, y, dx, dy, radius in self.shapes:
+            center = (int((x + dx * self.index) % self.width), int((y + dy * self.index) % self.height))
+            cv2.circle(self.frame, center, radius, (0, 0, 255), -1)
+            cv2.circle(self.frame, center, int(radius * 0.75), (255, 255, 255), -1)
+
+        self._pace(self.index / self.fps)
+        self.index += 1
+        return True, self.frame.copy()
+
+
+class SessionRecorder:
+    def __init__(self, path, encoding='jpeg', quality=90, color_order='bgr'):
+        if encoding not in ('jpeg', 'raw'):
+            raise ValueError(f"Unknown frame encoding '{encoding}'")
+        self.path = path
+        self.encoding = encoding
+        self.quality = quality
+        # raw frames are stored as delivered and tagged in meta.json; JPEG always holds BGR
+        self.color_order = color_order
+        self.shape = None
+        self.count = 0
+        self.offset = 0
+        self.detection_count = 0
+
+        os.makedirs(path, exist_ok=True)
+        self.frames_file = open(os.path.join(path, 'frames.bin'), 'wb')
+        self.index_file = open(os.path.join(path, 'index.bin'), 'wb')
+        self.detections_file = open(os.path.join(path, 'detections.bin'), 'wb')
+
+    def write(self, frame, timestamp, detections=None, frame_id=None):
+        if self.shape is None:
+            self.shape = frame.shape
+        elif frame.shape != self.shape:
+            frame = cv2.resize(frame, (self.shape[1], self.shape[0]))
+
+        if self.encoding == 'jpeg':
+            if self.color_order == 'rgb':
+                frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
+            ok, encoded = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+            if not ok:
+                print("Unable to encode frame for recording")
+                return
+            data = encoded.tobytes()
+        else:
+            data = np.ascontiguousarray(frame).tobytes()
+        self.frames_file.write(data)
+
+        frame_id = self.count if frame_id is None else frame_id
+        if detections is None:
+            detections = np.empty(0, dtype=DETECTION_DTYPE)
+        elif not isinstance(detections, np.ndarray):
+            detections = to_array(detections, frame_id)
+        self.detections_file.write(detections.tobytes())
+
+        row = np.array([(frame_id, timestamp, self.offset, len(data), self.detection_count, len(detections))],
+                       dtype=INDEX_DTYPE)
+        self.index_file.write(row.tobytes())
+
+        self.offset += len(data)
+        self.detection_count += len(detections)
+        self.count += 1
+
+    def close(self):
+        for f in (self.frames_file, self.index_file, self.detections_file):
+            f.close()
+        with open(os.path.join(self.path, 'meta.json'), 'w') as f:
+            json.dump({'version': 1, 'encoding': self.encoding, 'shape': list(self.shape or ()),
+                       'color_order': self.color_order if self.encoding == 'raw' else 'bgr',
+                       'frames': self.count, 'detections': self.detection_count}, f, indent=2)
+
+
+class ReplaySource(FrameSource):
+    def __init__(self, path, realtime=True, loop=False):
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+        super().__init__(realtime=realtime, loop=loop)
+        self.path = path
+        self.encoding = self.meta['encoding']
+        self.shape = tuple(self.meta['shape'])
+        self.color_order = self.meta.get('color_order', 'bgr')
+        self.height, self.width = self.shape[:2] if self.shape else (0, 0)
+
+        # memory-mapped so opening a long session is instant and only the frames read are paged in
+        self.index = self._map('index.bin', INDEX_DTYPE)
+        self.frames = self._map('frames.bin', np.uint8)
+        self.detections = self._map('detections.bin', DETECTION_DTYPE)
+        self.frame_count = len(self.index)
+        if self.frame_count > 1:
+            duration = self.index['timestamp'][-1] - self.index['timestamp'][0]
+            self.fps = (self.frame_count - 1) / duration if duration > 0 else 30.0
+        self.position = 0
+        self.recorded_detections = None
+
+    def _map(self, name, dtype):
+        path = os.path.join(self.path, name)
+        if os.path.getsize(path) == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode='r')
+
+    def isOpened(self):
+        return self.frame_count > 0
+
+    def frame(self, position):
+        row = self.index[position]
+        data = self.frames[int(row['offset']):int(row['offset']) + int(row['length'])]
+        if self.encoding == 'jpeg':
+            return cv2.imdecode(data, cv2.IMREAD_COLOR)
+        return np.array(data).reshape(self.shape)
+
+    def detections_at(self, position):
+        row = self.index[position]
+        start = int(row['detection_start'])
+        return np.array(self.detections[start:start + int(row['detection_count'])])
+
+    def read(self):
+        if self.position >= self.frame_count:
+            if not self.loop or not self.frame_count:
+                return False, None
+            self.position = 0
+
+        frame = self.frame(self.position)
+        self.recorded_detections = self.detections_at(self.position)
+        self._pace(float(self.index['timestamp'][self.position]))
+        self.position += 1
+        return True, frame
+
+    def frames_list(self, count=None):
+        count = self.frame_count if count is None else min(count, self.frame_count)
+        return [self.frame(i) for i in range(count)]
+
+
+def open_source(spec, realtime=True, loop=False, camera=None, stream=None):
+    # "0" -> camera, "synthetic" or "synthetic:1280x720" -> generator, *.aqrec -> replay,
+    # directory -> images, rtsp://... or gst:<pipeline> -> stream, anything else -> video file.
+    # camera holds LiveSource options; stream holds StreamSource options, and naming a stream backend there
+    # also routes video files through GStreamer/FFmpeg
+    spec = str(spec)
+    if spec.isdigit():
+        return LiveSource(int(spec), **(camera or {}))
+    if spec.startswith(STREAM_SCHEMES) or spec.startswith('gst:'):
+        options = dict(stream or {})
+        options.setdefault('backend', 'gstreamer' if spec.startswith('gst:') else 'ffmpeg')
+        return StreamSource(spec, realtime=realtime, loop=loop, **options)
+    if spec.startswith('synthetic'):
+        size = (640, 480)
+        if ':' in spec:
+            width, height = spec.split(':', 1)[1].lower().split('x')
+            size = (int(width), int(height))
+        return SyntheticSource(size, realtime=realtime)
+    if spec.endswith(RECORDING_EXTENSION) or os.path.exists(os.path.join(spec, 'meta.json')):
+        return ReplaySource(spec, realtime=realtime, loop=loop)
+    if os.path.isdir(spec):
+        return ImageDirectorySource(spec, realtime=realtime, loop=loop)
+    if stream and stream.get('backend'):
+        return StreamSource(spec, realtime=realtime, loop=loop, **stream)
+    return VideoFileSource(spec, realtime=realtime, loop=loop)
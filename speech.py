@@ -0,0 +1,252 @@
+import hashlib
+import heapq
+import itertools
+import os
+import threading
+import time
+import wave
+
+HIGH_PRIORITY = 0
+NORMAL_PRIORITY = 1
+
+# Stop and No entry jump the queue
+PRIORITY_CLASSES = {14: HIGH_PRIORITY, 17: HIGH_PRIORITY}
+
+
+class SimpleAudioPlayer:
+    def __init__(self):
+        import simpleaudio
+
+        self.simpleaudio = simpleaudio
+        self.current = None
+
+    def load(self, path):
+        with wave.open(path, 'rb') as f:
+            return (f.readframes(f.getnframes()), f.getnchannels(), f.getsampwidth(), f.getframerate())
+
+    def play(self, clip):
+        self.current = self.simpleaudio.play_buffer(*clip)
+        self.current.wait_done()
+        self.current = None
+
+    def stop(self):
+        current = self.current
+        if current is not None:
+            current.stop()
+
+
+class WinsoundPlayer:
+    def __init__(self):
+        import winsound
+
+        self.winsound = winsound
+
+    def load(self, path):
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def play(self, clip):
+        self.winsound.PlaySound(clip, self.winsound.SND_MEMORY | self.winsound.SND_NODEFAULT)
+
+    def stop(self):
+        # a None sound stops whatever waveform is playing, which returns the blocked play() call
+        self.winsound.PlaySound(None, 0)
+
+
+def create_player():
+    for player_class in (SimpleAudioPlayer, WinsoundPlayer):
+        try:
+            return player_class()
+        except ImportError:
+            continue
+    return None
+
+
+class SpeechScheduler:
+    def __init__(self, cooldown=10.0, max_pending=4, max_age=5.0, cache_dir='cache/speech',
+                 priority_classes=None, prerender=True):
+        self.cooldown = cooldown
+        self.max_pending = max_pending
+        self.max_age = max_age
+        self.cache_dir = cache_dir
+        self.priority_classes = PRIORITY_CLASSES if priority_classes is None else priority_classes
+        self.prerender = prerender
+
+        self.pending = []
+        self.condition = threading.Condition()
+        self.sequence = itertools.count()
+        self.last_spoken = {}
+        self.current_priority = None
+        self.speaking_live = False
+
+        self.engine = None
+        self.player = None
+        self.clips = {}
+        self.texts = {}
+        self.thread = None
+        self.running = False
+        self.ready = threading.Event()
+        self.timings = {}
+        self.stats = {'queued': 0, 'spoken': 0, 'played_cached': 0, 'synthesized': 0, 'deduplicated': 0,
+                      'cooldown_skips': 0, 'dropped_stale': 0, 'dropped_full': 0, 'preempted': 0,
+                      'replaced': 0}
+
+    def start(self, texts=None):
+        if self.thread is not None:
+            return
+        self.texts = dict(texts or {})
+        self.running = True
+        self.thread = threading.Thread(target=self._worker, name="speech", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.pending = []
+            self.condition.notify_all()
+        if self.player is not None:
+            self.player.stop()
+        if self.thread is not None:
+            self.thread.join(timeout=1)
+
+    def say(self, text, key=None, priority=NORMAL_PRIORITY, replace=False):
+        # replace=True is for state announcements such as the speed limit, where only the latest value matters
+        key = key if key is not None else text
+        with self.condition:
+            queued = next((item for item in self.pending if item[3] == key), None)
+            if queued is not None:
+                if not replace:
+                    self.stats['deduplicated'] += 1
+                    return False
+                # the queued text is out of date; the new one takes its place in the queue
+                self.pending.remove(queued)
+                heapq.heapify(self.pending)
+                self.stats['replaced'] += 1
+
+            if priority == HIGH_PRIORITY:
+                stale = [item for item in self.pending if item[0] > priority]
+                if stale:
+                    self.pending = [item for item in self.pending if item[0] <= priority]
+                    heapq.heapify(self.pending)
+                    self.stats['preempted'] += len(stale)
+                if self.current_priority is not None and self.current_priority > priority:
+                    self._interrupt()
+
+            if len(self.pending) >= self.max_pending:
+                # drop the least important, oldest-queued item to make room
+                worst = max(self.pending, key=lambda item: (item[0], -item[1]))
+                if worst[0] < priority:
+                    self.stats['dropped_full'] += 1
+                    return False
+                self.pending.remove(worst)
+                heapq.heapify(self.pending)
+                self.stats['dropped_full'] += 1
+
+            sequence = queued[1] if queued is not None else next(self.sequence)
+            heapq.heappush(self.pending, (priority, sequence, time.monotonic(), key, text))
+            self.stats['queued'] += 1
+            self.condition.notify()
+            return True
+
+    def announce(self, key, text, force=False, replace=False):
+        now = time.monotonic()
+        if not force and now - self.last_spoken.get(key, float('-inf')) < self.cooldown:
+            self.stats['cooldown_skips'] += 1
+            return False
+
+        queued = self.say(text, key=key, priority=self.priority_classes.get(key, NORMAL_PRIORITY), replace=replace)
+        if queued:
+            self.last_spoken[key] = now
+        return queued
+
+    def _interrupt(self):
+        # cut off the announcement being spoken: cached clips stop in the player, live synthesis in the engine
+        if self.speaking_live and self.engine is not None:
+            self.engine.stop()
+        elif self.player is not None:
+            self.player.stop()
+        else:
+            return
+        self.stats['preempted'] += 1
+
+    def _cache_path(self, text):
+        digest = hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"{digest}.wav")
+
+    def _prerender(self):
+        if not self.texts:
+            return
+
+        self.player = create_player()
+        if self.player is None:
+            return
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        started = time.perf_counter()
+        missing = False
+        for text in self.texts.values():
+            path = self._cache_path(text)
+            if not os.path.exists(path):
+                self.engine.save_to_file(text, path)
+                missing = True
+        if missing:
+            self.engine.runAndWait()
+        self.timings['tts_prerender'] = time.perf_counter() - started
+
+        for key, text in self.texts.items():
+            path = self._cache_path(text)
+            try:
+                self.clips[key] = self.player.load(path)
+            except Exception as e:
+                print(f"Speech cache error for '{key}': {e}")
+
+    def _next_item(self):
+        with self.condition:
+            while self.running:
+                while self.pending:
+                    item = heapq.heappop(self.pending)
+                    if time.monotonic() - item[2] > self.max_age:
+                        self.stats['dropped_stale'] += 1
+                        continue
+                    self.current_priority = item[0]
+                    return item
+                self.condition.wait()
+            return None
+
+    def _worker(self):
+        import pyttsx3
+
+        started = time.perf_counter()
+        self.engine = pyttsx3.init()
+        self.timings['tts_init'] = time.perf_counter() - started
+
+        if self.prerender:
+            try:
+                self._prerender()
+            except Exception as e:
+                print(f"Speech pre-render error: {e}")
+        self.ready.set()
+
+        while True:
+            item = self._next_item()
+            if item is None:
+                break
+
+            _, _, _, key, text = item
+            try:
+                clip = self.clips.get(key)
+                if clip is not None and self.texts.get(key) == text:
+                    self.player.play(clip)
+                    self.stats['played_cached'] += 1
+                else:
+                    self.speaking_live = True
+                    self.engine.say(text)
+                    self.engine.runAndWait()
+                    self.stats['synthesized'] += 1
+                self.stats['spoken'] += 1
+            except Exception as e:
+                print(f"Speech error: {e}")
+            finally:
+                with self.condition:
+                    self.current_priority = None
+                    self.speaking_live = False
@@ -0,0 +1,47 @@
+import os
+import sys
+
+# the modules live at the repository root rather than in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pytest
+
+
+class MarkerBackend:
+    # stands in for a model: reports the bounding box of the bright pixels in each frame as one sign
+    name = 'marker'
+
+    def __init__(self, class_id=2, confidence=0.9):
+        self.class_id = class_id
+        self.confidence = confidence
+        self.imgsz = 640
+        self.fixed_imgsz = False
+        self.model_path = 'marker'
+        self.input_order = 'bgr'
+        self.last_speed = {}
+        self.calls = []
+
+    def predict(self, frames, conf_threshold):
+        if isinstance(frames, np.ndarray) and frames.ndim == 3:
+            frames = [frames]
+        self.calls.append(len(frames))
+        results = []
+        for frame in frames:
+            ys, xs = np.nonzero(frame.max(axis=2) > 127)
+            if len(xs):
+                results.append(np.array([[xs.min(), ys.min(), xs.max() + 1, ys.max() + 1, self.confidence,
+                                          self.class_id]], dtype=np.float32))
+            else:
+                results.append(np.empty((0, 6), dtype=np.float32))
+        return results
+
+
+@pytest.fixture
+def marker_detector():
+    from detector import RoadSignDetector
+
+    detector = RoadSignDetector(lazy=True, speech=False)
+    detector.backend = MarkerBackend()
+    detector.ready.set()
+    return detector
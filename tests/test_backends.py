@@ -0,0 +1,109 @@
+import numpy as np
+import pytest
+
+from backends import NumpyBackend, UltralyticsBackend, decode_predictions, non_max_suppression, scale_boxes
+
+
+class RecordingModel:
+    def __init__(self):
+        self.frames = []
+
+    def __call__(self, frames, **kwargs):
+        self.frames.append(frames)
+        return []
+
+
+def ultralytics_backend(input_order):
+    # skips YOLO() in __init__, which needs the ultralytics package and weights
+    backend = UltralyticsBackend.__new__(UltralyticsBackend)
+    backend.imgsz = None
+    backend.input_order = input_order
+    backend.last_speed = {}
+    backend.bgr_buffers = []
+    backend.model = RecordingModel()
+    return backend
+
+
+def test_ultralytics_rgb_frames_are_converted_into_reused_buffers():
+    backend = ultralytics_backend('rgb')
+    frame = np.zeros((4, 6, 3), dtype=np.uint8)
+    frame[..., 0] = 200
+
+    backend.predict(frame, 0.5)
+    backend.predict([frame, frame], 0.5)
+
+    single, batch = backend.model.frames
+    assert single[..., 2].min() == 200 and single[..., 0].max() == 0
+    assert single.flags['C_CONTIGUOUS'] and single.strides[-1] > 0
+    assert batch[0] is single and batch[1] is not single
+
+
+def test_ultralytics_bgr_frames_pass_through():
+    backend = ultralytics_backend('bgr')
+    frame = np.zeros((4, 6, 3), dtype=np.uint8)
+    backend.predict(frame, 0.5)
+    assert backend.model.frames == [frame]
+
+
+def test_nms_suppresses_overlaps_above_the_threshold():
+    boxes = np.array([[0, 0, 10, 10], [1, 1, 11, 11], [20, 20, 30, 30], [0, 0, 10, 5]], dtype=np.float32)
+    scores = np.array([0.6, 0.9, 0.5, 0.7], dtype=np.float32)
+    # [1] beats [0] (IoU 0.68); [3] only overlaps [1] with IoU 0.35; [2] stands alone
+    assert non_max_suppression(boxes, scores, 0.45).tolist() == [1, 3, 2]
+    assert non_max_suppression(boxes, scores, 0.3).tolist() == [1, 2]
+    assert non_max_suppression(np.empty((0, 4), dtype=np.float32), np.empty(0)).tolist() == []
+
+
+def head_output(rows, num_classes=3, anchors=8):
+    # YOLOv8 layout: (4 + num_classes, anchors) of cx, cy, w, h, class scores
+    output = np.zeros((4 + num_classes, anchors), dtype=np.float32)
+    for anchor, (cx, cy, w, h, class_id, score) in enumerate(rows):
+        output[:4, anchor] = cx, cy, w, h
+        output[4 + class_id, anchor] = score
+    return output
+
+
+def test_decode_converts_centres_and_filters_by_confidence():
+    output = head_output([(50, 40, 20, 10, 1, 0.8), (200, 200, 10, 10, 2, 0.2)])
+    assert decode_predictions(output, 0.25).tolist() == [[40, 35, 60, 45, pytest.approx(0.8), 1]]
+    assert decode_predictions(output, 0.9).shape == (0, 6)
+
+
+def test_decode_nms_is_class_aware():
+    same_place = [(50, 50, 20, 20, 0, 0.9), (51, 51, 20, 20, 0, 0.8), (50, 50, 20, 20, 2, 0.7)]
+    data = decode_predictions(head_output(same_place), 0.25)
+    assert data[:, 5].tolist() == [0, 2]
+    assert decode_predictions(head_output(same_place), 0.25, max_det=1)[:, 5].tolist() == [0]
+
+
+def test_scale_boxes_undoes_the_letterbox():
+    # a 480x960 frame letterboxed to 640: scale 2/3, 80 px of padding above and below
+    data = np.array([[100, 100, 200, 140, 0.9, 1], [-10, 70, 700, 600, 0.5, 2]], dtype=np.float32)
+    scaled = scale_boxes(data, 2 / 3, (0, 80), (480, 960, 3))
+    assert scaled[0, :4] == pytest.approx([150, 30, 300, 90])
+    assert scaled[1, :4] == pytest.approx([0, 0, 960, 480])
+
+
+class BrightBoxHead(NumpyBackend):
+    # a model whose head reports the bright pixels of each letterboxed input as one class-1 box
+    def _forward(self, tensor):
+        outputs = np.zeros((len(tensor), 4 + 3, 8), dtype=np.float32)
+        for i, image in enumerate(tensor):
+            ys, xs = np.nonzero(image.max(axis=0) > 0.9)
+            x1, y1, x2, y2 = xs.min(), ys.min(), xs.max() + 1, ys.max() + 1
+            outputs[i, :4, 0] = (x1 + x2) / 2, (y1 + y2) / 2, x2 - x1, y2 - y1
+            outputs[i, 5, 0] = 0.8
+        return outputs
+
+
+def test_numpy_backend_reports_boxes_in_frame_coordinates():
+    backend = BrightBoxHead('fake', imgsz=640)
+    small = np.zeros((320, 640, 3), dtype=np.uint8)
+    small[100:140, 200:260] = 255
+    large = np.zeros((480, 960, 3), dtype=np.uint8)
+    large[300:360, 600:690] = 255
+
+    detections = backend.predict([small, large], 0.25)
+    assert detections[0].tolist() == [[200, 100, 260, 140, pytest.approx(0.8), 1]]
+    assert np.abs(detections[1][0, :4] - [600, 300, 690, 360]).max() <= 2
+    assert set(backend.last_speed) == {'preprocess', 'inference', 'postprocess'}
@@ -0,0 +1,54 @@
+import threading
+
+import cv2
+import numpy as np
+import pytest
+
+import batch_process
+from batch_process import FrameReader
+
+
+@pytest.fixture
+def image_dir(tmp_path):
+    for i in range(20):
+        cv2.imwrite(str(tmp_path / f"{i:03d}.png"), np.full((32, 32, 3), i, dtype=np.uint8))
+    return tmp_path
+
+
+def reader_threads():
+    return [thread for thread in threading.enumerate() if thread.name == "frame-reader"]
+
+
+def test_reader_yields_every_frame_in_order(image_dir):
+    reader = FrameReader(str(image_dir), max_queue=4).start()
+    indices = [index for batch in reader.batches(3) for index, _, _, _ in batch]
+    assert indices == list(range(20))
+
+
+def test_abandoned_reader_stops_instead_of_blocking(image_dir):
+    reader = FrameReader(str(image_dir), max_queue=2).start()
+    next(reader.batches(1))
+
+    reader.stop()
+
+    assert not reader.thread.is_alive()
+    assert reader.frames.qsize() == 0
+
+
+class FailingDetector:
+    tile_size = None
+    cache = None
+
+    def detect_batch(self, frames):
+        raise RuntimeError("inference failed")
+
+
+def test_failed_file_does_not_leak_its_reader(image_dir, tmp_path, monkeypatch):
+    monkeypatch.setattr(batch_process, '_detector', FailingDetector())
+    output_dir = tmp_path / "out"
+    output_dir.mkdir()
+
+    with pytest.raises(RuntimeError):
+        batch_process.process_file(str(image_dir), str(output_dir), batch_size=1)
+
+    assert reader_threads() == []
@@ -0,0 +1,72 @@
+import numpy as np
+
+from detection_cache import DetectionCache
+from records import DETECTION_DTYPE
+
+
+def frame(seed):
+    return np.random.default_rng(seed).integers(0, 256, (120, 160, 3), dtype=np.uint8)
+
+
+def detections(class_id, count=1):
+    array = np.zeros(count, dtype=DETECTION_DTYPE)
+    array['class_id'] = class_id
+    array['confidence'] = 0.9
+    array['box'] = (10, 10, 50, 50)
+    return array
+
+
+def test_returned_detections_are_copies():
+    cache = DetectionCache()
+    key = cache.key(frame(0), 'v1')
+    stored = detections(3)
+    cache.put(key, stored)
+    stored['class_id'] = 7  # the caller reusing its array must not change the cache
+
+    first = cache.get(key)
+    first['frame_id'] = 42  # neither must a caller stamping its own frame id
+    second = cache.get(key)
+
+    assert first['class_id'][0] == 3 and second['class_id'][0] == 3
+    assert second['frame_id'][0] == 0
+
+
+def test_version_change_invalidates_entries():
+    cache = DetectionCache(tolerance=4)
+    cache.put(cache.key(frame(0), 'model-a:640'), detections(3))
+
+    assert cache.get(cache.key(frame(0), 'model-a:640')) is not None
+    assert cache.get(cache.key(frame(0), 'model-a:320')) is None
+    assert cache.get(cache.key(frame(0), 'model-b:640')) is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = DetectionCache(max_entries=2)
+    keys = [cache.key(frame(seed), 'v') for seed in range(3)]
+    cache.put(keys[0], detections(0))
+    cache.put(keys[1], detections(1))
+    cache.get(keys[0])  # keys[1] is now the oldest
+    cache.put(keys[2], detections(2))
+
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0])['class_id'][0] == 0
+    assert cache.get(keys[2])['class_id'][0] == 2
+    assert cache.stats['evictions'] == 1
+
+
+def test_byte_budget_evicts_entries():
+    cache = DetectionCache(max_entries=100, max_bytes=1000)
+    for seed in range(10):
+        cache.put(cache.key(frame(seed), 'v'), detections(1, count=10))
+    assert cache.bytes <= 1000
+    assert len(cache.entries) < 10
+
+
+def test_saved_shards_load_in_a_new_cache(tmp_path):
+    cache = DetectionCache(path=str(tmp_path))
+    key = cache.key(frame(0), 'v')
+    cache.put(key, detections(5, count=2))
+    cache.save()
+
+    restored = DetectionCache(path=str(tmp_path))
+    assert restored.get(key)['class_id'].tolist() == [5, 5]
@@ -0,0 +1,36 @@
+import numpy as np
+
+from utils.motion import DEFAULT_SIGN_REGIONS, MotionGate
+
+
+def frame_with_sign(box, shape=(720, 1280, 3)):
+    frame = np.zeros(shape, dtype=np.uint8)
+    x1, y1, x2, y2 = box
+    frame[y1:y2, x1:x2] = 255
+    return frame
+
+
+def test_detect_regions_reports_a_sign_in_overlapping_regions_once(marker_detector):
+    # the default regions overlap over the upper right of the frame
+    gate = MotionGate(regions=DEFAULT_SIGN_REGIONS)
+    gate.check(np.zeros((720, 1280, 3), dtype=np.uint8))
+    frame = frame_with_sign((900, 100, 960, 160))
+    # dim enough for the marker backend to ignore, but a change in both regions for the gate
+    frame[0:288, 640:1280][frame[0:288, 640:1280] == 0] = 100
+    _, regions = gate.check(frame)
+    assert regions == [(640, 0, 1280, 540), (0, 0, 1280, 288)]
+
+    detections = marker_detector.detect_regions(frame, regions, as_array=True)
+
+    assert len(detections) == 1
+    assert detections['box'][0].tolist() == [900, 100, 960, 160]
+
+
+def test_detect_regions_keeps_signs_in_separate_regions(marker_detector):
+    frame = frame_with_sign((100, 100, 140, 140))
+    frame[600:640, 1100:1140] = 255
+    regions = [(0, 0, 640, 360), (640, 360, 1280, 720)]
+
+    detections = marker_detector.detect_regions(frame, regions, as_array=True)
+
+    assert sorted(detections['box'].tolist()) == [[100, 100, 140, 140], [1100, 600, 1140, 640]]
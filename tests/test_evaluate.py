@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from evaluate import evaluate
+
+
+class FrameDataset:
+    # the parts of DatasetCache that evaluate() uses, over in-memory frames and [class, x1, y1, x2, y2] targets
+    def __init__(self, images, targets):
+        self.images = images
+        self.labels = [np.array(rows, dtype=np.float32).reshape(-1, 5) for rows in targets]
+
+    def __len__(self):
+        return len(self.images)
+
+    def batches(self, batch_size=16):
+        for start in range(0, len(self.images), batch_size):
+            indices = np.arange(start, min(start + batch_size, len(self.images)))
+            yield indices, [self.images[i] for i in indices]
+
+    def targets(self, index):
+        return self.labels[index]
+
+    def to_original(self, boxes, index):
+        return boxes.astype(np.float32)
+
+
+def test_empty_dataset_is_rejected(marker_detector):
+    with pytest.raises(ValueError, match="no images"):
+        evaluate(marker_detector, FrameDataset([], []))
+    assert marker_detector.backend.calls == []
+
+
+def test_perfect_predictions(marker_detector):
+    frame = np.zeros((120, 160, 3), dtype=np.uint8)
+    frame[20:60, 40:80] = 255
+    results = evaluate(marker_detector, FrameDataset([frame, np.zeros_like(frame)], [[[2, 40, 20, 80, 60]], []]))
+
+    assert results['images'] == 2
+    assert results['instances'] == 1
+    assert results['metrics/mAP50(B)'] == pytest.approx(1.0, abs=0.01)
+    assert results['per_class'][2]['images'] == 1
+    assert results['images_per_s'] is not None
+
+
+def test_tiled_evaluation(marker_detector):
+    marker_detector.enable_tiling(640, 0.2, full_frame=False)
+    frame = np.zeros((1280, 1280, 3), dtype=np.uint8)
+    frame[100:140, 600:700] = 255
+    results = evaluate(marker_detector, FrameDataset([frame], [[[2, 600, 100, 700, 140]]]))
+
+    assert results['metrics/precision(B)'] == pytest.approx(1.0, abs=0.01)
+    assert results['metrics/mAP50-95(B)'] == pytest.approx(1.0, abs=0.01)
@@ -0,0 +1,63 @@
+import glob
+import os
+import time
+
+import numpy as np
+import pytest
+
+from event_log import DetectionLog, class_counts, query_counts
+from records import DETECTION_DTYPE
+
+
+def detections(class_ids, frame_id=1):
+    array = np.zeros(len(class_ids), dtype=DETECTION_DTYPE)
+    array['frame_id'] = frame_id
+    array['class_id'] = class_ids
+    array['confidence'] = 0.9
+    array['box'] = (10, 10, 50, 50)
+    return array
+
+
+@pytest.mark.parametrize('format', ['sqlite', 'columnar'])
+def test_counts_per_class_and_bucket(tmp_path, format):
+    log = DetectionLog(str(tmp_path), format=format, batch_size=4, flush_interval=0.05).start()
+    log.submit(detections([2, 2, 14]), frame_id=1, timestamp=1000.0)
+    log.submit(detections([2]), frame_id=2, timestamp=1010.0)
+    log.submit(detections([25]), frame_id=3, timestamp=4000.0)
+    log.stop()
+
+    assert log.stats['written'] == 5 and log.stats['dropped'] == 0
+    assert query_counts(str(tmp_path), bucket=3600) == {(0, 2): 3, (0, 14): 1, (3600, 25): 1}
+    assert class_counts(str(tmp_path), start=0, end=2000) == {2: 3, 14: 1}
+
+
+def wait_for_flushes(log, count, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while log.stats['flushes'] < count and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert log.stats['flushes'] >= count
+
+
+@pytest.mark.parametrize('format', ['sqlite', 'columnar'])
+def test_segments_rotate_by_size(tmp_path, format):
+    log = DetectionLog(str(tmp_path), format=format, batch_size=1, flush_interval=0.05, rotate_bytes=1).start()
+    for frame_id in range(3):
+        log.submit(detections([2], frame_id), frame_id=frame_id, timestamp=1000.0 + frame_id)
+        wait_for_flushes(log, frame_id + 1)
+    log.stop()
+
+    extension = '.db' if format == 'sqlite' else '.cols'
+    assert len(glob.glob(os.path.join(str(tmp_path), '*' + extension))) == 3
+    assert log.stats['rotations'] == 2
+    assert class_counts(str(tmp_path)) == {2: 3}
+
+
+def test_submit_drops_records_when_the_writer_falls_behind(tmp_path):
+    log = DetectionLog(str(tmp_path), max_pending=5)  # not started: nothing drains the queue
+
+    assert log.submit(detections([1, 2, 3]))
+    assert not log.submit(detections([4, 5, 6]))
+    assert log.submit(detections([7, 8]))
+
+    assert log.pending_count == 5
+    assert log.stats['submitted'] == 5 and log.stats['dropped'] == 3
@@ -0,0 +1,120 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+from inference_worker import ProcessDetector, SharedFrameRing
+from records import DETECTION_DTYPE
+
+
+def fake_worker(conn, ring_name, slots, max_shape, backend, model_path, conf_threshold, input_order='bgr'):
+    # stands in for _worker_main without a model: reports the bright pixels as one sign, or hangs when asked to
+    ring = SharedFrameRing(slots, max_shape, name=ring_name)
+    try:
+        conn.send(('ready', os.getpid(), {}))
+        while True:
+            message = conn.recv()
+            if message is None:
+                break
+            if message[0] == 'ping':
+                conn.send(('pong', message[1]))
+                continue
+            if model_path == 'hang':
+                time.sleep(60)
+
+            _, request_id, slot, shape, regions = message
+            ys, xs = np.nonzero(ring.view(slot, shape).max(axis=2) > 127)
+            detections = np.zeros(1 if len(xs) else 0, dtype=DETECTION_DTYPE)
+            if len(xs):
+                detections['box'] = (xs.min(), ys.min(), xs.max() + 1, ys.max() + 1)
+                detections['confidence'] = 0.9
+                detections['class_id'] = 2
+            conn.send(('result', request_id, detections, {}))
+    except EOFError:
+        pass
+    finally:
+        ring.close()
+
+
+def sign_frame(height=120, width=160):
+    frame = np.zeros((height, width, 3), dtype=np.uint8)
+    frame[20:60, 40:80] = 255
+    return frame
+
+
+@pytest.fixture
+def make_process_detector(marker_detector):
+    detectors = []
+
+    def make(model_path='marker', **kwargs):
+        detector = ProcessDetector(marker_detector, model_path=model_path, **kwargs)
+        detector.worker_main = fake_worker
+        detectors.append(detector)
+        return detector
+
+    yield make
+    for detector in detectors:
+        detector.close()
+
+
+def test_ring_round_trip():
+    ring = SharedFrameRing(2, (4, 6, 3))
+    try:
+        small = np.arange(2 * 3 * 3, dtype=np.uint8).reshape(2, 3, 3)
+        full = np.full((4, 6, 3), 7, dtype=np.uint8)
+        shapes = [ring.write(0, small), ring.write(1, full)]
+
+        reader = SharedFrameRing(2, (4, 6, 3), name=ring.name)
+        assert np.array_equal(reader.view(0, shapes[0]), small)
+        assert np.array_equal(reader.view(1, shapes[1]), full)
+        reader.close()
+
+        with pytest.raises(ValueError):
+            ring.write(0, np.zeros((5, 6, 3), dtype=np.uint8))
+    finally:
+        ring.close()
+
+
+def test_detections_come_back_from_the_worker(make_process_detector):
+    detector = make_process_detector(max_frame_shape=(120, 160, 3))
+    detections = detector.detect_signs(sign_frame(), as_array=True, frame_id=7)
+    assert detections['box'].tolist() == [[40, 20, 80, 60]]
+    assert detections['frame_id'].tolist() == [7]
+
+
+def test_oversize_frames_are_shrunk_to_fit(make_process_detector):
+    # sized from a source that reported 0x0, then fed frames larger than the default ring slot
+    detector = make_process_detector(max_frame_shape=(0, 0, 3))
+    assert detector.max_frame_shape == (1080, 1920, 3)
+    frame = np.zeros((2160, 3840, 3), dtype=np.uint8)
+    frame[400:800, 1000:1400] = 255
+
+    detections = detector.detect_signs(frame, as_array=True)
+    assert detector.stats['resized'] == 1
+    assert np.abs(detections['box'][0] - [1000, 400, 1400, 800]).max() <= 2
+    assert detector.stats['errors'] == 0
+
+
+def test_unresponsive_worker_times_out_and_is_restarted(make_process_detector):
+    detector = make_process_detector(model_path='hang', max_frame_shape=(120, 160, 3), timeout=0.5)
+    detector.load()
+    pid = detector.workers[0].pid
+
+    assert detector.detect_signs(sign_frame()) == []
+    assert detector.stats['timeouts'] == 1 and detector.stats['restarts'] == 1
+    assert detector.workers[0].pid != pid
+
+
+def test_health_check_restarts_a_dead_worker(make_process_detector):
+    detector = make_process_detector(max_frame_shape=(120, 160, 3), health_interval=0.1)
+    detector.load()
+    worker = detector.workers[0]
+    pid = worker.pid
+    worker.process.kill()
+
+    deadline = time.monotonic() + 30
+    while worker.pid == pid and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert detector.stats['restarts'] == 1
+    assert len(detector.detect_signs(sign_frame())) == 1
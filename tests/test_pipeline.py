@@ -0,0 +1,133 @@
+import numpy as np
+
+import sign_state
+from conftest import MarkerBackend
+from detection_cache import DetectionCache
+from pipeline import DetectionPipeline
+from sign_state import RoadRules
+from tracker import SignTracker
+
+
+class GovernorProbe:
+    def __init__(self):
+        self.samples = []
+
+    def observe(self, latency):
+        self.samples.append(latency)
+
+
+class RegionGate:
+    def __init__(self, regions):
+        self.regions = regions
+
+    def check(self, frame):
+        return True, self.regions
+
+
+def sign_frame(offset=0):
+    frame = np.zeros((360, 640, 3), dtype=np.uint8)
+    frame[100:140, 200 + offset:240 + offset] = 255
+    return frame
+
+
+def test_governor_ignores_cache_hits(marker_detector):
+    marker_detector.cache = DetectionCache(max_entries=16)
+    governor = GovernorProbe()
+    pipeline = DetectionPipeline(None, marker_detector, governor=governor)
+
+    pipeline._run_detector(sign_frame(), 1)
+    pipeline._run_detector(sign_frame(), 2)
+    assert len(governor.samples) == 1
+
+    pipeline._run_detector(sign_frame(offset=200), 3)
+    assert len(governor.samples) == 2
+
+
+def test_governor_ignores_region_runs(marker_detector):
+    governor = GovernorProbe()
+    pipeline = DetectionPipeline(None, marker_detector, governor=governor, gate=RegionGate([(0, 0, 320, 360)]))
+
+    detections, ran = pipeline._run_detector(sign_frame(), 1)
+
+    assert ran and len(detections) == 1
+    assert governor.samples == []
+
+
+class ScriptedGate:
+    def __init__(self, *results):
+        self.results = list(results)
+
+    def check(self, frame):
+        return self.results.pop(0)
+
+
+def test_region_runs_keep_signs_outside_the_changed_regions(marker_detector):
+    pipeline = DetectionPipeline(None, marker_detector, gate=ScriptedGate((True, None), (True, [(0, 0, 320, 360)])))
+    frame = np.zeros((360, 640, 3), dtype=np.uint8)
+    frame[100:140, 500:540] = 255
+    detections, _ = pipeline._run_detector(frame, 1)
+    assert [det['box'] for det in detections] == [(500, 100, 540, 140)]
+
+    # motion on the left only: the crop is blank, but the static sign on the right is still in view
+    detections, ran = pipeline._run_detector(frame, 2)
+    assert ran
+    assert [(det.box, det.frame_id) for det in detections] == [((500, 100, 540, 140), 2)]
+
+
+def test_region_runs_replace_signs_inside_the_changed_regions(marker_detector):
+    pipeline = DetectionPipeline(None, marker_detector, gate=ScriptedGate((True, None), (True, [(0, 0, 320, 360)])))
+    pipeline._run_detector(sign_frame(), 1)
+
+    moved = np.zeros((360, 640, 3), dtype=np.uint8)
+    moved[150:190, 100:140] = 255
+    detections, _ = pipeline._run_detector(moved, 2)
+    assert [det['box'] for det in detections] == [(100, 150, 140, 190)]
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+
+def test_tracked_hazards_lapse_after_the_last_sighting(marker_detector, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(sign_state, 'time', clock)
+    marker_detector.backend = MarkerBackend(class_id=18)
+    rules = RoadRules(min_hits=1, hazard_ttl=20.0, classes=marker_detector.classes)
+    pipeline = DetectionPipeline(None, marker_detector, tracker=SignTracker(min_hits=3), rules=rules)
+
+    for frame_id in range(1, 31):
+        clock.now = float(frame_id)
+        pipeline._detect(sign_frame(), frame_id)
+    assert rules.state()['hazards'] == [18]
+    changes = [pipeline.rule_changes.get_nowait() for _ in range(pipeline.rule_changes.qsize())]
+    assert [change['kind'] for change in changes] == ['hazard']
+
+    # still in view 20 s after confirmation, so the hazard holds until 20 s after the sign leaves
+    clock.now = 45.0
+    pipeline._detect(np.zeros((360, 640, 3), dtype=np.uint8), 31)
+    assert rules.state()['hazards'] == [18]
+    clock.now = 50.0
+    pipeline._detect(np.zeros((360, 640, 3), dtype=np.uint8), 32)
+    assert rules.state()['hazards'] == []
+
+
+def test_renderer_never_reuses_a_buffer_the_ui_still_holds(marker_detector):
+    pipeline = DetectionPipeline(None, marker_detector, display_size=(320, 180))
+    shown = pipeline.renderer.render(sign_frame(), [])
+    snapshot = shown.copy()
+
+    # the UI lags: several frames are rendered and queued, the older ones dropped by the output queue
+    for offset in (100, 200, 300, 400):
+        pipeline.output_queue.put((pipeline.renderer.render(sign_frame(offset), []), []))
+    assert np.array_equal(shown, snapshot)
+    assert pipeline.output_queue.dropped == 3
+    assert len(pipeline.renderer.buffers) == 3
+
+    queued, _ = pipeline.output_queue.get_nowait()
+    pipeline.release_frame(shown)
+    assert not any(queued is free for free in pipeline.renderer.free)
+    assert any(shown is free for free in pipeline.renderer.free)
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from utils.preprocessing import Preprocessor, letterbox, to_input_tensor
+
+# odd, portrait, already-square, upscaled and exactly-sized frames
+SHAPES = [(333, 517), (517, 333), (481, 641), (640, 640), (100, 75), (1080, 1920), (1, 1)]
+
+
+def random_frame(shape, seed=0):
+    return np.random.default_rng(seed).integers(0, 256, shape + (3,), dtype=np.uint8)
+
+
+def reference(frames, imgsz=640):
+    letterboxed = [letterbox(frame, (imgsz, imgsz)) for frame in frames]
+    tensor = to_input_tensor([image for image, _, _ in letterboxed])
+    return tensor, [scale for _, scale, _ in letterboxed], [pad for _, _, pad in letterboxed]
+
+
+def assert_identical(actual, expected):
+    tensor, scales, pads = actual
+    expected_tensor, expected_scales, expected_pads = expected
+    assert tensor.dtype == np.float32 and tensor.shape == expected_tensor.shape
+    assert tensor.tobytes() == expected_tensor.tobytes()
+    assert scales == expected_scales
+    assert pads == expected_pads
+
+
+@pytest.mark.parametrize('shape', SHAPES)
+def test_single_frame_matches_reference(shape):
+    frame = random_frame(shape)
+    assert_identical(Preprocessor(640)(frame), reference([frame]))
+
+
+def test_mixed_shape_batch_matches_reference():
+    frames = [random_frame(shape, seed) for seed, shape in enumerate(SHAPES)]
+    assert_identical(Preprocessor(640)(frames), reference(frames))
+
+
+def test_stacked_batch_matches_reference():
+    frames = np.stack([random_frame((360, 480), seed) for seed in range(4)])
+    assert_identical(Preprocessor(416)(frames), reference(list(frames), 416))
+
+
+def test_reused_buffers_do_not_leak_between_calls():
+    preprocessor = Preprocessor(320)
+    preprocessor([random_frame((480, 640), seed) for seed in range(4)])
+    frame = random_frame((200, 320), seed=9)
+    assert_identical(preprocessor([frame]), reference([frame], 320))
+
+
+@pytest.mark.parametrize('shape', [(333, 517), (640, 640)])
+def test_rgb_input_skips_the_channel_swap(shape):
+    bgr = random_frame(shape)
+    rgb = np.ascontiguousarray(bgr[..., ::-1])
+    assert_identical(Preprocessor(640, input_order='rgb')(rgb), reference([bgr]))
+
+
+@pytest.mark.parametrize('shape', [(333, 517), (1080, 1920)])
+def test_matches_ultralytics_fixed_shape_letterbox(shape):
+    # what an exported fixed-shape model was fed during validation; the .pt predictor uses auto=True instead
+    augment = pytest.importorskip('ultralytics.data.augment')
+    frame = random_frame(shape)
+    expected = augment.LetterBox(new_shape=(640, 640), auto=False, scaleup=True)(image=frame)
+    tensor, _, _ = Preprocessor(640)(frame)
+    assert tensor.tobytes() == to_input_tensor([expected]).tobytes()
@@ -0,0 +1,196 @@
+import asyncio
+import json
+import struct
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from service import DetectionService
+
+
+def encoded_frame():
+    frame = np.zeros((120, 160, 3), dtype=np.uint8)
+    frame[20:60, 40:80] = 255
+    return cv2.imencode('.png', frame)[1].tobytes()
+
+
+async def post(port, body, headers=()):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    head = ["POST /detect HTTP/1.1", "Host: 127.0.0.1", f"Content-Length: {len(body)}", "Connection: close",
+            *headers]
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode('latin-1') + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    status = int(response.split(b' ', 2)[1])
+    return status, json.loads(response.partition(b'\r\n\r\n')[2])
+
+
+class Connection:
+    # one keep-alive HTTP client
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def open(cls, port):
+        return cls(*await asyncio.open_connection('127.0.0.1', port))
+
+    async def post(self, body, headers=()):
+        head = ["POST /detect HTTP/1.1", "Host: 127.0.0.1", f"Content-Length: {len(body)}", *headers]
+        self.writer.write(("\r\n".join(head) + "\r\n\r\n").encode('latin-1') + body)
+        await self.writer.drain()
+        status_line, *lines = (await self.reader.readuntil(b"\r\n\r\n")).decode('latin-1').split("\r\n")
+        length = next(int(line.split(':')[1]) for line in lines if line.lower().startswith('content-length'))
+        await self.reader.readexactly(length)
+        return int(status_line.split(' ')[1])
+
+    def close(self):
+        self.writer.close()
+
+
+async def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+def run_service(detector, scenario, **kwargs):
+    async def main():
+        service = DetectionService(detector, port=0, **kwargs)
+        await service.start()
+        try:
+            return await scenario(service)
+        finally:
+            await service.stop()
+    return asyncio.run(main())
+
+
+def test_concurrent_requests_share_one_batch(marker_detector):
+    body = encoded_frame()
+
+    async def scenario(service):
+        return await asyncio.gather(*(post(service.port, body) for _ in range(4)))
+
+    responses = run_service(marker_detector, scenario, window=0.2, max_batch=8)
+    assert [status for status, _ in responses] == [200] * 4
+    assert all(result['detections'][0]['box'] == [40, 20, 80, 60] for _, result in responses)
+    assert marker_detector.backend.calls == [4]
+
+
+def test_rate_limit_is_per_client(marker_detector):
+    body = encoded_frame()
+
+    async def scenario(service):
+        first = await Connection.open(service.port)
+        second = await Connection.open(service.port)
+        statuses = [await first.post(body) for _ in range(3)]
+        # a made-up client id does not buy a fresh bucket
+        statuses.append(await first.post(body, ["X-Client-Id: someone-else"]))
+        statuses.append(await second.post(body))
+        first.close()
+        second.close()
+        return statuses
+
+    assert run_service(marker_detector, scenario, rate=0.001, burst=2) == [200, 200, 429, 429, 200]
+
+
+def test_global_rate_limit_caps_all_clients(marker_detector):
+    body = encoded_frame()
+
+    async def scenario(service):
+        return [(await post(service.port, body))[0] for _ in range(4)]
+
+    assert run_service(marker_detector, scenario, rate=0.001, burst=2, global_rate=0.001,
+                       global_burst=3) == [200, 200, 200, 429]
+
+
+def test_unix_clients_keep_their_bucket_across_reconnects(marker_detector, tmp_path):
+    body = encoded_frame()
+    path = str(tmp_path / 'service.sock')
+
+    async def send(count):
+        reader, writer = await asyncio.open_unix_connection(path)
+        results = []
+        for _ in range(count):
+            writer.write(struct.pack('!I', len(body)) + body)
+            length = struct.unpack('!I', await reader.readexactly(4))[0]
+            results.append(json.loads(await reader.readexactly(length)).get('status', 200))
+        writer.close()
+        return results
+
+    async def scenario(service):
+        return await send(2) + await send(1)
+
+    assert run_service(marker_detector, scenario, unix_path=path, rate=0.001, burst=2) == [200, 200, 429]
+
+
+def test_websocket_upgrade_without_key_is_rejected(marker_detector):
+    async def scenario(service):
+        reader, writer = await asyncio.open_connection('127.0.0.1', service.port)
+        writer.write(b"GET /ws HTTP/1.1\r\nHost: 127.0.0.1\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n\r\n")
+        response = await reader.read()
+        writer.close()
+        return response
+
+    assert run_service(marker_detector, scenario).startswith(b"HTTP/1.1 400")
+
+
+def test_fragmented_websocket_messages_are_capped(marker_detector):
+    async def scenario(service):
+        reader, writer = await asyncio.open_connection('127.0.0.1', service.port)
+        writer.write(b"GET /ws HTTP/1.1\r\nHost: 127.0.0.1\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                     b"Sec-WebSocket-Key: dGhlIHNhbXBsZSBub25jZQ==\r\n\r\n")
+        await reader.readuntil(b"\r\n\r\n")
+        # three 600-byte fragments of one message, each under the 1000-byte limit on its own
+        for opcode in (0x2, 0x0, 0x0):
+            writer.write(struct.pack('!BB', opcode, 126) + struct.pack('!H', 600) + bytes(600))
+        await writer.drain()
+        first, _ = await reader.readexactly(2)
+        code = struct.unpack('!H', await reader.readexactly(2))[0]
+        writer.close()
+        return first & 0x0F, code
+
+    assert run_service(marker_detector, scenario, max_frame_bytes=1000) == (0x8, 1009)
+
+
+def test_rejects_when_pending_queue_is_full(marker_detector):
+    body = encoded_frame()
+    entered, release = threading.Event(), threading.Event()
+    predict = marker_detector.backend.predict
+
+    def blocked_predict(frames, conf_threshold):
+        entered.set()
+        release.wait(5)
+        return predict(frames, conf_threshold)
+
+    marker_detector.backend.predict = blocked_predict
+
+    async def scenario(service):
+        try:
+            running = asyncio.ensure_future(post(service.port, body))
+            await wait_until(entered.is_set)
+            queued = asyncio.ensure_future(post(service.port, body))
+            await wait_until(lambda: service.batcher.queue.qsize() == 1)
+            rejected = await post(service.port, body)
+        finally:
+            release.set()
+        return rejected, await running, await queued, service.batcher.stats
+
+    rejected, running, queued, stats = run_service(marker_detector, scenario, window=0, max_batch=1,
+                                                   max_pending=1)
+    assert rejected[0] == 503
+    assert running[0] == queued[0] == 200
+    assert stats['rejected'] == 1
+
+
+def test_idle_buckets_are_evicted(marker_detector):
+    service = DetectionService(marker_detector, rate=100.0, burst=1)
+    assert service._allow('a') and service._allow('b')
+    assert not service._allow('a')
+    time.sleep(0.05)
+    assert service._allow('c')
+    assert set(service.buckets) == {'c'}
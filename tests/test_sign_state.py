@@ -0,0 +1,63 @@
+from sign_state import RoadRules
+
+
+class ClassNames:
+    def name(self, class_id):
+        return f"class {class_id}"
+
+
+def sighting(class_id, confidence=0.9):
+    return {'class_id': class_id, 'confidence': confidence}
+
+
+def make_rules(**kwargs):
+    return RoadRules(min_hits=1, classes=ClassNames(), **kwargs)
+
+
+def test_speed_limit_changes_are_reported_once():
+    rules = make_rules()
+    changes = rules.update([sighting(2)], timestamp=0.0)
+    assert [(change['kind'], change['value']) for change in changes] == [('speed_limit', 50)]
+    assert rules.update([sighting(2)], timestamp=0.1) == []
+    assert rules.speed_limit == 50
+
+
+def test_unconfirmed_sightings_are_ignored():
+    rules = RoadRules(min_hits=3, confirm_window=1.0, classes=ClassNames())
+    assert rules.update([sighting(3)], timestamp=0.0) == []
+    assert rules.update([sighting(3)], timestamp=2.0) == []
+    assert rules.update([sighting(3, confidence=0.2)], timestamp=2.1) == []
+    assert rules.speed_limit is None
+
+
+def test_end_of_80_lifts_only_an_80_limit():
+    rules = make_rules()
+    rules.update([sighting(5)], timestamp=0.0)
+    changes = rules.update([sighting(6)], timestamp=1.0)
+    assert [(change['kind'], change['value'], change['previous']) for change in changes] == \
+        [('speed_limit', None, 80)]
+    assert rules.speed_limit is None
+
+
+def test_end_of_80_keeps_a_different_limit():
+    rules = make_rules()
+    rules.update([sighting(2)], timestamp=0.0)
+    assert rules.update([sighting(6)], timestamp=1.0) == []
+    assert rules.speed_limit == 50
+
+
+def test_end_of_all_limits_clears_speed_and_passing():
+    rules = make_rules()
+    rules.update([sighting(2), sighting(9)], timestamp=0.0)
+    changes = rules.update([sighting(32)], timestamp=1.0)
+    assert {change['kind'] for change in changes} == {'speed_limit', 'no_passing'}
+    assert rules.state() == {'speed_limit': None, 'no_passing': False, 'no_passing_heavy': False, 'hazards': []}
+
+
+def test_hazards_lapse_after_ttl():
+    rules = make_rules(hazard_ttl=5.0)
+    assert [change['kind'] for change in rules.update([sighting(18)], timestamp=0.0)] == ['hazard']
+    assert rules.update([], timestamp=4.0) == []
+    changes = rules.update([], timestamp=5.0)
+    assert [(change['kind'], change['speak']) for change in changes] == [('hazard_cleared', False)]
+    assert rules.state()['hazards'] == []
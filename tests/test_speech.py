@@ -0,0 +1,65 @@
+import types
+
+from speech import HIGH_PRIORITY, NORMAL_PRIORITY, SpeechScheduler, WinsoundPlayer
+
+
+class Recorder:
+    def __init__(self):
+        self.stopped = 0
+
+    def stop(self):
+        self.stopped += 1
+
+
+def busy_scheduler(live):
+    scheduler = SpeechScheduler(prerender=False)
+    scheduler.player = Recorder()
+    scheduler.engine = Recorder()
+    scheduler.current_priority = NORMAL_PRIORITY
+    scheduler.speaking_live = live
+    return scheduler
+
+
+def test_priority_announcement_stops_cached_playback():
+    scheduler = busy_scheduler(live=False)
+    assert scheduler.say("Stop", key=14, priority=HIGH_PRIORITY)
+    assert scheduler.player.stopped == 1 and scheduler.engine.stopped == 0
+    assert scheduler.stats['preempted'] == 1
+
+
+def test_priority_announcement_stops_live_synthesis():
+    scheduler = busy_scheduler(live=True)
+    assert scheduler.say("Stop", key=14, priority=HIGH_PRIORITY)
+    assert scheduler.engine.stopped == 1 and scheduler.player.stopped == 0
+
+
+def test_normal_announcement_waits_for_the_current_one():
+    scheduler = busy_scheduler(live=True)
+    assert scheduler.say("Road work", key=25)
+    assert scheduler.engine.stopped == 0 and scheduler.player.stopped == 0
+
+
+def test_winsound_stop_purges_playback():
+    calls = []
+    player = WinsoundPlayer.__new__(WinsoundPlayer)
+    player.winsound = types.SimpleNamespace(PlaySound=lambda sound, flags: calls.append((sound, flags)))
+    player.stop()
+    assert calls == [(None, 0)]
+
+
+def test_rule_announcement_replaces_the_queued_one():
+    scheduler = SpeechScheduler(prerender=False)
+    assert scheduler.say("Road work", key=25)
+    assert scheduler.announce('speed_limit', "Speed limit 50 kilometers per hour", force=True, replace=True)
+    assert scheduler.announce('speed_limit', "Speed limit 80 kilometers per hour", force=True, replace=True)
+
+    assert [(item[3], item[4]) for item in sorted(scheduler.pending)] == [
+        (25, "Road work"), ('speed_limit', "Speed limit 80 kilometers per hour")]
+    assert scheduler.stats['replaced'] == 1
+
+
+def test_repeated_announcement_is_deduplicated():
+    scheduler = SpeechScheduler(prerender=False)
+    assert scheduler.say("Road work", key=25)
+    assert not scheduler.say("Road work again", key=25)
+    assert [item[4] for item in scheduler.pending] == ["Road work"]
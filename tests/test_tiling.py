@@ -0,0 +1,50 @@
+import numpy as np
+
+from utils.tiling import tile_count, tile_grid, uncut_boxes
+
+
+def test_tiles_cover_the_frame_at_full_size():
+    tiles = tile_grid(1920, 1080, 640, 0.2)
+    covered = np.zeros((1080, 1920), dtype=bool)
+    for x1, y1, x2, y2 in tiles:
+        assert (x2 - x1, y2 - y1) == (640, 640)
+        covered[y1:y2, x1:x2] = True
+    assert covered.all()
+    assert max(x2 for _, _, x2, _ in tiles) == 1920 and max(y2 for _, _, _, y2 in tiles) == 1080
+    assert len(set(tiles)) == len(tiles)
+
+
+def test_regions_limit_the_tiles():
+    regions = [(0.5, 0.0, 1.0, 0.5)]
+    tiles = tile_grid(1920, 1080, 640, 0.2, regions)
+    assert all(x1 >= 960 - 640 and y2 <= 640 for x1, _, _, y2 in tiles)
+    assert tile_count((1080, 1920, 3), 640, 0.2, regions) == len(tiles) < tile_count((1080, 1920, 3), 640, 0.2)
+
+
+def test_small_frames_get_one_tile():
+    assert tile_grid(500, 400, 640) == [(0, 0, 500, 400)]
+
+
+def test_boxes_cut_by_an_internal_edge_are_dropped():
+    tiles = [(0, 0, 1280, 720), (0, 0, 640, 640), (512, 0, 1152, 640), (640, 0, 1280, 640)]
+    # the same sign at x 600..700 as seen by each tile
+    assert uncut_boxes([[600, 100, 640, 140]], tiles[1], tiles, 1280, 720).tolist() == [False]
+    assert uncut_boxes([[600, 100, 700, 140]], tiles[2], tiles, 1280, 720).tolist() == [True]
+    assert uncut_boxes([[640, 100, 700, 140]], tiles[3], tiles, 1280, 720).tolist() == [False]
+    # the full frame has no internal edges, and frame borders never count as cuts
+    assert uncut_boxes([[600, 100, 700, 140]], tiles[0], tiles, 1280, 720).tolist() == [True]
+    assert uncut_boxes([[0, 100, 40, 140]], tiles[1], tiles, 1280, 720).tolist() == [True]
+
+
+def test_edge_boxes_are_kept_when_no_tile_reaches_past_the_edge():
+    tiles = [(0, 0, 640, 640), (640, 0, 1280, 640)]
+    assert uncut_boxes([[600, 100, 640, 140]], tiles[0], tiles, 1280, 640).tolist() == [True]
+
+
+def test_tiled_detection_reports_a_sign_across_a_tile_edge_once(marker_detector):
+    marker_detector.enable_tiling(640, 0.2, full_frame=False)
+    frame = np.zeros((720, 1280, 3), dtype=np.uint8)
+    frame[100:140, 600:700] = 255
+
+    detections = marker_detector.detect_signs(frame, as_array=True)
+    assert detections['box'].tolist() == [[600, 100, 700, 140]]
@@ -0,0 +1,55 @@
+from tracker import SignTracker
+
+
+def detection(box, class_id=2, confidence=0.9):
+    return {'box': box, 'name': f"class {class_id}", 'description': "", 'confidence': confidence,
+            'class_id': class_id}
+
+
+def test_track_is_reported_once_after_min_hits():
+    tracker = SignTracker(min_hits=3)
+    box = (100, 100, 140, 140)
+
+    active, events = tracker.update([detection(box)])
+    assert active == [] and events == []
+    active, events = tracker.update([detection(box)])
+    assert active == [] and events == []
+
+    active, events = tracker.update([detection(box)])
+    assert len(events) == 1 and events[0]['class_id'] == 2
+    assert [det['track_id'] for det in active] == [events[0]['track_id']]
+
+    _, events = tracker.update([detection(box)])
+    assert events == []
+    assert tracker.stats['tracks_created'] == 1
+
+
+def test_moving_detection_keeps_its_track():
+    tracker = SignTracker(min_hits=1)
+    for step in range(5):
+        tracker.update([detection((100 + step * 4, 100, 140 + step * 4, 140))])
+    assert tracker.stats['tracks_created'] == 1
+
+
+def test_track_coasts_then_expires():
+    tracker = SignTracker(min_hits=1, max_misses=3, max_coast=1)
+    tracker.update([detection((100, 100, 140, 140))])
+
+    active, _ = tracker.update([])
+    assert len(active) == 1  # coasting through a single missed frame
+
+    active, _ = tracker.update([])
+    assert active == [] and len(tracker.tracks) == 1  # hidden, but not yet dropped
+
+    tracker.update([])
+    tracker.update([])
+    assert tracker.tracks == []
+
+
+def test_class_is_decided_by_confidence_weighted_votes():
+    tracker = SignTracker(min_hits=1)
+    box = (100, 100, 140, 140)
+    tracker.update([detection(box, class_id=2, confidence=0.9)])
+    tracker.update([detection(box, class_id=5, confidence=0.6)])
+    active, _ = tracker.update([detection(box, class_id=2, confidence=0.8)])
+    assert active[0]['class_id'] == 2
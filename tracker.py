@@ -0,0 +1,149 @@
+import numpy as np
+
+
+def box_iou(boxes_a, boxes_b):
+    boxes_a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 4)
+    boxes_b = np.asarray(boxes_b, dtype=np.float32).reshape(-1, 4)
+
+    x1 = np.maximum(boxes_a[:, None, 0], boxes_b[None, :, 0])
+    y1 = np.maximum(boxes_a[:, None, 1], boxes_b[None, :, 1])
+    x2 = np.minimum(boxes_a[:, None, 2], boxes_b[None, :, 2])
+    y2 = np.minimum(boxes_a[:, None, 3], boxes_b[None, :, 3])
+
+    inter = (x2 - x1).clip(0) * (y2 - y1).clip(0)
+    area_a = (boxes_a[:, 2] - boxes_a[:, 0]) * (boxes_a[:, 3] - boxes_a[:, 1])
+    area_b = (boxes_b[:, 2] - boxes_b[:, 0]) * (boxes_b[:, 3] - boxes_b[:, 1])
+
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+class Track:
+    def __init__(self, track_id, detection):
+        self.track_id = track_id
+        self.box = np.array(detection['box'], dtype=np.float32)
+        self.velocity = np.zeros(4, dtype=np.float32)
+        self.confidence = detection['confidence']
+        self.class_votes = {}
+        self.class_info = {}
+        self.hits = 1
+        self.misses = 0
+        self.steps = 0
+        self.reported = False
+        self._vote(detection)
+
+    def _vote(self, detection):
+        class_id = detection.get('class_id', detection['name'])
+        self.class_votes[class_id] = self.class_votes.get(class_id, 0.0) + detection['confidence']
+        self.class_info[class_id] = (detection['name'], detection['description'])
+
+    @property
+    def class_id(self):
+        return max(self.class_votes, key=self.class_votes.get)
+
+    def predict(self):
+        self.box = self.box + self.velocity
+        self.steps += 1
+
+    def update(self, detection, box_smoothing, velocity_smoothing, confidence_smoothing):
+        measured = np.array(detection['box'], dtype=np.float32)
+        residual = measured - self.box
+
+        self.box = self.box + box_smoothing * residual
+        self.velocity = self.velocity + velocity_smoothing * residual / max(self.steps, 1)
+        self.steps = 0
+        self.confidence += confidence_smoothing * (detection['confidence'] - self.confidence)
+
+        self.hits += 1
+        self.misses = 0
+        self._vote(detection)
+
+    def as_detection(self):
+        class_id = self.class_id
+        name, description = self.class_info[class_id]
+        return {
+            'box': tuple(int(v) for v in self.box),
+            'name': name,
+            'description': description,
+            'confidence': float(self.confidence),
+            'class_id': class_id,
+            'track_id': self.track_id
+        }
+
+
+class SignTracker:
+    def __init__(self, iou_threshold=0.3, min_hits=3, max_misses=10, max_coast=2,
+                 box_smoothing=0.6, velocity_smoothing=0.2, confidence_smoothing=0.3):
+        self.iou_threshold = iou_threshold
+        self.min_hits = min_hits
+        self.max_misses = max_misses
+        self.max_coast = max_coast
+        self.box_smoothing = box_smoothing
+        self.velocity_smoothing = velocity_smoothing
+        self.confidence_smoothing = confidence_smoothing
+
+        self.tracks = []
+        self.next_track_id = 1
+        self.stats = {'updates': 0, 'predictions': 0, 'tracks_created': 0, 'events': 0}
+
+    def update(self, detections):
+        for track in self.tracks:
+            track.predict()
+
+        unmatched = list(range(len(detections)))
+        if self.tracks and detections:
+            iou = box_iou([track.box for track in self.tracks], [det['box'] for det in detections])
+            matched_tracks = set()
+            matched_detections = set()
+            # greedy association, best overlaps first
+            for flat_index in np.argsort(iou, axis=None)[::-1]:
+                t, d = np.unravel_index(flat_index, iou.shape)
+                if iou[t, d] < self.iou_threshold:
+                    break
+                if t in matched_tracks or d in matched_detections:
+                    continue
+                self.tracks[t].update(detections[d], self.box_smoothing,
+                                      self.velocity_smoothing, self.confidence_smoothing)
+                matched_tracks.add(t)
+                matched_detections.add(d)
+            for t, track in enumerate(self.tracks):
+                if t not in matched_tracks:
+                    track.misses += 1
+            unmatched = [d for d in unmatched if d not in matched_detections]
+        else:
+            for track in self.tracks:
+                track.misses += 1
+
+        for d in unmatched:
+            self.tracks.append(Track(self.next_track_id, detections[d]))
+            self.next_track_id += 1
+            self.stats['tracks_created'] += 1
+
+        self.tracks = [track for track in self.tracks if track.misses <= self.max_misses]
+        self.stats['updates'] += 1
+
+        events = []
+        for track in self.tracks:
+            if not track.reported and track.hits >= self.min_hits:
+                track.reported = True
+                events.append(track.as_detection())
+        self.stats['events'] += len(events)
+
+        return self.active_detections(), events
+
+    def predict(self):
+        for track in self.tracks:
+            track.predict()
+        self.stats['predictions'] += 1
+
+        return self.active_detections()
+
+    def active_detections(self):
+        return [track.as_detection() for track in self.tracks
+                if track.reported and track.misses <= self.max_coast]
+
+    def sightings(self):
+        # confirmed tracks matched by the latest update, leaving out those coasting on prediction
+        return [track.as_detection() for track in self.tracks if track.reported and track.misses == 0]
+
+    def reset(self):
+        self.tracks = []
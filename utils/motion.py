@@ -0,0 +1,103 @@
+import cv2
+import numpy as np
+
+# fractional (x1, y1, x2, y2) regions where signs usually appear for right-hand traffic
+DEFAULT_SIGN_REGIONS = [
+    (0.5, 0.0, 1.0, 0.75),
+    (0.0, 0.0, 1.0, 0.4),
+]
+
+DEFAULT_THRESHOLDS = {
+    'absdiff': 0.02,
+    'dhash': 0.1,
+}
+
+
+def difference_hash(gray):
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    return (small[:, 1:] > small[:, :-1]).ravel()
+
+
+def region_slices(regions, width, height):
+    slices = []
+    for x1, y1, x2, y2 in regions:
+        slices.append((slice(int(y1 * height), max(int(y2 * height), int(y1 * height) + 1)),
+                       slice(int(x1 * width), max(int(x2 * width), int(x1 * width) + 1))))
+    return slices
+
+
+class MotionGate:
+    def __init__(self, method='absdiff', threshold=None, pixel_threshold=25, size=(96, 54),
+                 max_skip=30, regions=None):
+        if method not in DEFAULT_THRESHOLDS:
+            raise ValueError(f"Unknown motion gate method '{method}'")
+
+        self.method = method
+        self.threshold = threshold if threshold is not None else DEFAULT_THRESHOLDS[method]
+        self.pixel_threshold = pixel_threshold
+        self.size = size
+        self.max_skip = max_skip
+        self.regions = list(regions) if regions else None
+
+        self.reference = None
+        self.consecutive_skips = 0
+        self.stats = {'runs': 0, 'skips': 0, 'region_runs': 0, 'forced_runs': 0}
+
+    def _thumbnail(self, frame):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        return cv2.resize(gray, self.size, interpolation=cv2.INTER_AREA)
+
+    def _change(self, current, reference):
+        if self.method == 'dhash':
+            return float(np.count_nonzero(difference_hash(current) != difference_hash(reference))) / 64
+        diff = cv2.absdiff(current, reference)
+        return float(np.count_nonzero(diff > self.pixel_threshold)) / diff.size
+
+    def check(self, frame):
+        thumbnail = self._thumbnail(frame)
+
+        if self.reference is None or self.consecutive_skips >= self.max_skip:
+            if self.reference is not None:
+                self.stats['forced_runs'] += 1
+            return self._run(thumbnail, None)
+
+        if self._change(thumbnail, self.reference) <= self.threshold:
+            return self._skip()
+
+        if self.regions is None:
+            return self._run(thumbnail, None)
+
+        height, width = thumbnail.shape[:2]
+        changed = [region for region, (rows, cols) in zip(self.regions, region_slices(self.regions, width, height))
+                   if self._change(thumbnail[rows, cols], self.reference[rows, cols]) > self.threshold]
+        if not changed:
+            return self._skip()
+
+        self.stats['region_runs'] += 1
+        frame_height, frame_width = frame.shape[:2]
+        return self._run(thumbnail, [
+            (int(x1 * frame_width), int(y1 * frame_height), int(x2 * frame_width), int(y2 * frame_height))
+            for x1, y1, x2, y2 in changed
+        ])
+
+    def _run(self, thumbnail, regions):
+        self.reference = thumbnail
+        self.consecutive_skips = 0
+        self.stats['runs'] += 1
+        return True, regions
+
+    def _skip(self):
+        self.consecutive_skips += 1
+        self.stats['skips'] += 1
+        return False, None
+
+    def skip_ratio(self):
+        total = self.stats['runs'] + self.stats['skips']
+        return self.stats['skips'] / total if total else 0.0
+
+    def report(self):
+        return {**self.stats, 'skip_ratio': self.skip_ratio()}
+
+    def reset(self):
+        self.reference = None
+        self.consecutive_skips = 0
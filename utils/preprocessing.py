@@ -6,7 +6,7 @@ def preprocess_image(image, target_size=(640, 640)):
 
     rgb = cv2.cvtColor(resized, cv2.COLOR_BGR2RGB)
     
-    normalized = rgb.astype(float) / 255.0
+    normalized = np.divide(rgb, np.float32(255.0), dtype=np.float32)
     
     return normalized
 
@@ -21,22 +21,19 @@ def resize_maintain_aspect(image, target_size):
 
     height, width = image.shape[:2]
 
-    aspect = width / height
-    
-    if aspect > 1:
+    # fit whichever side is the tighter constraint, so non-square targets never overflow
+    if target_size[0] / width <= target_size[1] / height:
         new_width = target_size[0]
-        new_height = int(new_width / aspect)
+        new_height = int(height * target_size[0] / width)
     else:
         new_height = target_size[1]
-        new_width = int(new_height * aspect)
+        new_width = int(width * target_size[1] / height)
         
     resized = cv2.resize(image, (new_width, new_height))
     
     return resized
 
-def create_letterbox(image, target_size=(640, 640)):
-    letterboxed = np.full((target_size[1], target_size[0], 3), 114, dtype=np.uint8)
-
+def create_letterbox(image, target_size=(640, 640), out=None):
     resized = resize_maintain_aspect(image, target_size)
 
     pad_height = target_size[1] - resized.shape[0]
@@ -44,8 +41,97 @@ def create_letterbox(image, target_size=(640, 640)):
     
     start_h = pad_height // 2
     start_w = pad_width // 2
-    
-    letterboxed[start_h:start_h+resized.shape[0], 
-                start_w:start_w+resized.shape[1]] = resized
-    
-    return letterboxed
\ No newline at end of file
+
+    # pass out= to reuse a (height, width, 3) uint8 canvas between calls
+    return cv2.copyMakeBorder(resized, start_h, pad_height - start_h, start_w, pad_width - start_w,
+                              cv2.BORDER_CONSTANT, dst=out, value=(114, 114, 114))
+
+def letterbox_params(shape, target_size=(640, 640)):
+    # same rounding as the ultralytics LetterBox transform (auto=False, scaleup=True)
+    height, width = shape[:2]
+    target_width, target_height = target_size
+
+    scale = min(target_width / width, target_height / height)
+    new_width, new_height = int(round(width * scale)), int(round(height * scale))
+
+    pad_w = (target_width - new_width) / 2
+    pad_h = (target_height - new_height) / 2
+    top, bottom = int(round(pad_h - 0.1)), int(round(pad_h + 0.1))
+    left, right = int(round(pad_w - 0.1)), int(round(pad_w + 0.1))
+
+    return (new_width, new_height), scale, (left, top, right, bottom)
+
+def letterbox(image, target_size=(640, 640), color=(114, 114, 114)):
+    height, width = image.shape[:2]
+    (new_width, new_height), scale, (left, top, right, bottom) = letterbox_params(image.shape, target_size)
+
+    if (width, height) != (new_width, new_height):
+        image = cv2.resize(image, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+
+    letterboxed = cv2.copyMakeBorder(image, top, bottom, left, right, cv2.BORDER_CONSTANT, value=color)
+
+    return letterboxed, scale, (left, top)
+
+def to_input_tensor(images):
+    batch = np.stack([image[..., ::-1] for image in images])
+    batch = batch.transpose(0, 3, 1, 2)
+
+    return np.ascontiguousarray(batch, dtype=np.float32) / 255.0
+
+
+class Preprocessor:
+    # Letterbox, BGR->RGB, HWC->CHW and /255 into buffers that are reused between calls, producing the same
+    # bytes as letterbox() + to_input_tensor(). The returned tensor is overwritten by the next call, so use
+    # one instance per thread and consume the result before calling again. With input_order='rgb' the frames
+    # are already RGB and the channel swap is skipped rather than undone.
+    # This matches what a fixed-shape ONNX/OpenVINO export expects (ultralytics LetterBox with auto=False).
+    # It does not reproduce the .pt predictor, which pads only to a multiple of the stride.
+    def __init__(self, imgsz=640, color=(114, 114, 114), input_order='bgr'):
+        self.target_size = (imgsz, imgsz) if isinstance(imgsz, int) else tuple(imgsz)
+        self.color = color
+        self.input_order = input_order
+        self.canvas = None
+        self.tensor = None
+        self.resized = {}
+
+    def _buffers(self, count):
+        width, height = self.target_size
+        if self.canvas is None or len(self.canvas) < count:
+            self.canvas = np.empty((count, height, width, 3), dtype=np.uint8)
+            self.tensor = np.empty((count, 3, height, width), dtype=np.float32)
+        return self.canvas[:count], self.tensor[:count]
+
+    def _resize(self, image, size):
+        buffer = self.resized.get(size)
+        if buffer is None:
+            buffer = self.resized[size] = np.empty((size[1], size[0], 3), dtype=np.uint8)
+        return cv2.resize(image, size, dst=buffer, interpolation=cv2.INTER_LINEAR)
+
+    def __call__(self, images):
+        # images is one HxWx3 frame, an NxHxWx3 array or a list of frames (sizes may differ)
+        if isinstance(images, np.ndarray) and images.ndim == 3:
+            images = images[None]
+
+        canvas, tensor = self._buffers(len(images))
+        scales, pads = [], []
+        cache = {}
+        for i, image in enumerate(images):
+            shape = image.shape[:2]
+            if shape not in cache:
+                cache[shape] = letterbox_params(shape, self.target_size)
+            size, scale, (left, top, right, bottom) = cache[shape]
+
+            if size != (shape[1], shape[0]):
+                image = self._resize(image, size)
+            cv2.copyMakeBorder(image, top, bottom, left, right, cv2.BORDER_CONSTANT, dst=canvas[i], value=self.color)
+
+            # one pass per channel does the channel swap, the transpose and the normalisation together;
+            # dividing in float32 (rather than multiplying by 1/255) keeps the result bit-identical
+            for channel in range(3):
+                source = 2 - channel if self.input_order == 'bgr' else channel
+                np.divide(canvas[i, :, :, source], np.float32(255.0), out=tensor[i, channel], dtype=np.float32)
+
+            scales.append(scale)
+            pads.append((left, top))
+
+        return tensor, scales, pads
@@ -0,0 +1,55 @@
+import numpy as np
+
+
+def _starts(start, end, tile_size, step, limit):
+    # tile origins covering [start, end) along one axis; the last tile is shifted back so it stays full size
+    if end - start <= tile_size:
+        return [max(0, min(start, limit - tile_size))]
+    starts = list(range(start, end - tile_size, step))
+    return starts + [end - tile_size]
+
+
+def tile_grid(width, height, tile_size=640, overlap=0.2, regions=None):
+    step = max(1, int(tile_size * (1 - overlap)))
+
+    if regions:
+        areas = [(int(x1 * width), int(y1 * height), int(x2 * width), int(y2 * height)) for x1, y1, x2, y2 in regions]
+    else:
+        areas = [(0, 0, width, height)]
+
+    tiles = []
+    for ax1, ay1, ax2, ay2 in areas:
+        for y in _starts(ay1, ay2, tile_size, step, height):
+            for x in _starts(ax1, ax2, tile_size, step, width):
+                tile = (x, y, min(x + tile_size, width), min(y + tile_size, height))
+                if tile not in tiles:
+                    tiles.append(tile)
+    return tiles
+
+
+def tile_count(shape, tile_size=640, overlap=0.2, regions=None):
+    height, width = shape[:2]
+    return len(tile_grid(width, height, tile_size, overlap, regions))
+
+
+def uncut_boxes(boxes, tile, tiles, width, height, margin=2):
+    # mask of boxes to keep from one tile. A box touching an edge of its tile that lies inside the frame is
+    # usually a sign cut in two; it is dropped when another tile reaches past that edge and holds the whole
+    # box, because that tile sees more of the sign. The full-frame tile never counts as the other tile.
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    others = np.array([other for other in tiles if other != tile and other != (0, 0, width, height)],
+                      dtype=np.float32).reshape(-1, 4)
+    if not len(boxes) or not len(others):
+        return np.ones(len(boxes), dtype=bool)
+
+    x1, y1, x2, y2 = tile
+    holds = ((others[None, :, 0] <= boxes[:, None, 0]) & (others[None, :, 1] <= boxes[:, None, 1])
+             & (others[None, :, 2] >= boxes[:, None, 2]) & (others[None, :, 3] >= boxes[:, None, 3]))
+    cut = np.zeros(len(boxes), dtype=bool)
+    for touches, reaches in (
+            ((boxes[:, 0] <= x1 + margin) & (x1 > 0), others[:, 0] < x1),
+            ((boxes[:, 1] <= y1 + margin) & (y1 > 0), others[:, 1] < y1),
+            ((boxes[:, 2] >= x2 - margin) & (x2 < width), others[:, 2] > x2),
+            ((boxes[:, 3] >= y2 - margin) & (y2 < height), others[:, 3] > y2)):
+        cut |= touches & (holds & reaches[None, :]).any(axis=1)
+    return ~cut